@@ -1,32 +1,65 @@
 import os
-import base64
+import sys
 import json
-from sign.digital_signer import DigitalSigner
-from sign.signature_verifier import SignatureVerifier
-from sign.key_generator import KeyGenerator
-from cipher.Cifrado_doc import DocumentEncryptor
-from cipher.Descifrado_doc import DocumentDecryptor
-from cipher.cifradollave import KeyEncryptor
-from cipher.decifradollave import KeyDecryptor
-from cryptography.hazmat.primitives import serialization
+import time
+import functools
+
+# Marca para --profile-startup: tiempo de importación de este módulo
+_INICIO_MODULO = time.perf_counter()
+
+# Los módulos de sign/ y cipher/ (y con ellos `cryptography`) se importan
+# dentro de cada componente, la primera vez que se usa; así el menú
+# aparece sin pagar el coste de cargar todas las primitivas.
+
 
 class ConsoleInterface:
     def __init__(self):
-        # Inicializar todos los sistemas
-        self.key_gen = KeyGenerator()
-        self.signer = DigitalSigner(self.key_gen)
-        self.verifier = SignatureVerifier(self.key_gen)
-        self.encryptor = DocumentEncryptor()
-        self.decryptor = DocumentDecryptor()
-        self.key_encryptor = KeyEncryptor()
-        self.key_decryptor = KeyDecryptor()
-        
         self.current_user = "Director"
-        
-        # Cargar configuración automáticamente al iniciar
+        # Los subsistemas se construyen al primer uso (ver las propiedades de abajo);
+        # la configuración del equipo y la llave privada se cargan junto con key_gen
+    
+    @functools.cached_property
+    def key_gen(self):
+        from sign.key_generator import KeyGenerator
+        key_gen = KeyGenerator()
+        # Al construir el generador se cargan la configuración y la llave del usuario
+        self.__dict__['key_gen'] = key_gen
         self.load_configuration()
-        # Intentar cargar llave privada del usuario actual automáticamente
         self.load_current_user_private_key()
+        return key_gen
+    
+    @functools.cached_property
+    def signer(self):
+        from sign.digital_signer import DigitalSigner
+        return DigitalSigner(self.key_gen)
+    
+    @functools.cached_property
+    def verifier(self):
+        from sign.signature_verifier import SignatureVerifier
+        return SignatureVerifier(self.key_gen)
+    
+    @functools.cached_property
+    def encryptor(self):
+        from cipher.Cifrado_doc import DocumentEncryptor
+        return DocumentEncryptor()
+    
+    @functools.cached_property
+    def decryptor(self):
+        from cipher.Descifrado_doc import DocumentDecryptor
+        return DocumentDecryptor()
+    
+    @functools.cached_property
+    def key_encryptor(self):
+        from cipher.cifradollave import KeyEncryptor
+        return KeyEncryptor()
+    
+    @functools.cached_property
+    def key_decryptor(self):
+        from cipher.decifradollave import KeyDecryptor
+        return KeyDecryptor()
+    
+    def _key_gen_construido(self):
+        return 'key_gen' in self.__dict__
     
     def load_configuration(self):
         """Carga la configuración de llaves públicas del equipo"""
@@ -34,10 +67,18 @@ class ConsoleInterface:
             if self.key_gen.load_public_keys_from_file("team_public_keys.json"):
                 print("✓ Configuración de equipo cargada automáticamente")
     
+    def _load_private_key(self, user_id):
+        """Carga la llave privada; una llave ilegible o de algoritmo no soportado cuenta como fallo"""
+        try:
+            return self.key_gen.load_private_key(user_id)
+        except ValueError as e:
+            print(f"{e} (llave privada de {user_id})")
+            return False
+    
     def load_current_user_private_key(self):
         """Intenta cargar la llave privada del usuario actual"""
         if self.current_user:
-            if self.key_gen.load_private_key(self.current_user):
+            if self._load_private_key(self.current_user):
                 print(f"✓ Llave privada de {self.current_user} cargada automáticamente")
             else:
                 print(f"⚠️  No se pudo cargar llave privada de {self.current_user}")
@@ -52,24 +93,31 @@ class ConsoleInterface:
         print("=" * 60)
         print(f"Usuario: {self.current_user}")
         
-        # Mostrar estado de las llaves en el header
-        if self.key_gen.private_key:
+        # Mostrar estado de las llaves en el header (sin forzar su carga)
+        if not self._key_gen_construido():
+            if os.path.isfile(f"private_key_{self.current_user}.pem"):
+                print("Estado: 🔑 LLAVE DISPONIBLE - Se carga en la primera operación")
+            else:
+                print("Estado: ❌ SIN LLAVES - Configure primero")
+        elif self.key_gen.private_key:
             print("Estado: ✅ LLAVES CARGADAS - Listo para operaciones")
         else:
             print("Estado: ❌ SIN LLAVES - Configure primero")
         print()
     
+    def show_main_menu(self):
+        self.clear_screen()
+        self.print_header()
+        print("1. 🔑 Gestión de Llaves")
+        print("2. 📝 Operaciones de Firma Digital")
+        print("3. 🔒 Operaciones de Cifrado/Descifrado")
+        print("4. ⚙️  Configuración del Sistema")
+        print("0. 🚪 Salir")
+        print()
+    
     def main_menu(self):
         while True:
-            self.clear_screen()
-            self.print_header()
-            print("1. 🔑 Gestión de Llaves")
-            print("2. 📝 Operaciones de Firma Digital")
-            print("3. 🔒 Operaciones de Cifrado/Descifrado")
-            print("4. ⚙️  Configuración del Sistema")
-            print("0. 🚪 Salir")
-            print()
-            
+            self.show_main_menu()
             choice = input("Seleccione una opción: ").strip()
             
             if choice == "1":
@@ -152,6 +200,7 @@ class ConsoleInterface:
             print("2. Descifrar documento")
             print("3. Cifrar documento con llave de equipo")
             print("4. Descifrar documento con llave de equipo")
+            print("5. Cifrar carpeta completa (lote)")
             print("0. Volver al menú principal")
             print()
             
@@ -165,6 +214,8 @@ class ConsoleInterface:
                 self.encrypt_document_team()
             elif choice == "4":
                 self.decrypt_document_team()
+            elif choice == "5":
+                self.encrypt_batch()
             elif choice == "0":
                 break
             else:
@@ -202,7 +253,7 @@ class ConsoleInterface:
                 if not user_id:
                     user_id = self.current_user
                 
-                if self.key_gen.load_private_key(user_id):
+                if self._load_private_key(user_id):
                     self.current_user = user_id
                     self.key_gen.user_id = user_id
                     print(f"✅ Llave privada de {user_id} cargada exitosamente")
@@ -232,6 +283,18 @@ class ConsoleInterface:
                 input("\nPresione Enter para continuar...")
                 return
         
+        print("\nAlgoritmo de firma:")
+        print("1. RSA-2048 PSS (compatible con cifrado de llaves)")
+        print("2. Ed25519 (firmas compactas y rápidas)")
+        print("3. ECDSA P-256")
+        from sign.algorithms import ALG_RSA_PSS, ALG_ED25519, ALG_ECDSA_P256
+        algoritmos = {"1": ALG_RSA_PSS, "2": ALG_ED25519, "3": ALG_ECDSA_P256}
+        self.key_gen.algorithm = algoritmos.get(input("Seleccione [Enter para RSA]: ").strip(), ALG_RSA_PSS)
+        if self.key_gen.algorithm != ALG_RSA_PSS:
+            # Los sobres de equipo envuelven la clave con RSA-OAEP: estas llaves quedan fuera
+            print("⚠️  Con llaves Ed25519/ECDSA solo puede firmar: los sobres cifrados de equipo")
+            print("   (RSA-OAEP) lo omitirán como destinatario.")
+        
         self.key_gen.user_id = self.current_user
         public_key_pem = self.key_gen.generate_key_pair()
         
@@ -372,6 +435,8 @@ class ConsoleInterface:
             return
         
         try:
+            from cryptography.hazmat.primitives import serialization
+            
             # Serializar llave privada
             private_pem = self.key_gen.private_key.private_bytes(
                 encoding=serialization.Encoding.PEM,
@@ -424,7 +489,7 @@ class ConsoleInterface:
                 print(f"   📄 Archivo descifrado: {result['decrypted_file']}")
                 
                 # Cargar la llave descifrada
-                if self.key_gen.load_private_key(self.current_user):
+                if self._load_private_key(self.current_user):
                     print("✅ Llave privada cargada automáticamente")
             else:
                 print(f"❌ Error descifrando llave: {result.get('error', 'Error desconocido')}")
@@ -557,16 +622,16 @@ class ConsoleInterface:
         self.print_header()
         print("📦 RECOLECCIÓN DE FIRMAS")
         
-        output_file = input("Nombre del archivo de salida (default: todas_firmas.json): ").strip()
+        output_file = input("Nombre del archivo de salida (default: todas_firmas.jsonl): ").strip()
         if not output_file:
-            output_file = "todas_firmas.json"
+            output_file = "todas_firmas.jsonl"
         
-        if not output_file.endswith('.json'):
-            output_file += '.json'
+        if not output_file.endswith('.jsonl'):
+            output_file += '.jsonl'
         
-        # Usar la colección interactiva del sistema
+        # Usar la colección interactiva del sistema (las firmas se añaden al final)
         try:
-            result_file = self.signer.collect_signatures_interactive()
+            result_file = self.signer.collect_signatures_interactive(output_file)
             print(f"\n✅ Firmas recolectadas en: {result_file}")
         except Exception as e:
             print(f"❌ Error recolectando firmas: {e}")
@@ -673,6 +738,52 @@ class ConsoleInterface:
         
         input("\nPresione Enter para continuar...")
     
+    def encrypt_batch(self):
+        self.clear_screen()
+        self.print_header()
+        print("🗂️  CIFRADO DE CARPETA COMPLETA")
+        
+        origen = input("Carpeta o patrón glob (ej. casos/ o casos/**/*.pdf): ").strip()
+        if not origen:
+            print("❌ Debe especificar una carpeta o patrón")
+            input("\nPresione Enter para continuar...")
+            return
+        
+        password = input("Contraseña para cifrado: ").strip()
+        if not password:
+            print("❌ La contraseña no puede estar vacía")
+            input("\nPresione Enter para continuar...")
+            return
+        
+        salida = input("Carpeta de salida (documentos_cifrados): ").strip() or "documentos_cifrados"
+        workers_texto = input(f"Número de procesos [Enter para {os.cpu_count()}]: ").strip()
+        try:
+            workers = int(workers_texto) if workers_texto else None
+        except ValueError:
+            print("Número inválido")
+            input("\nPresione Enter para continuar...")
+            return
+        
+        def mostrar_progreso(hechos, total, resultado):
+            print(f"\r   Progreso: {hechos}/{total}", end="", flush=True)
+        
+        try:
+            resultados = self.encryptor.encrypt_batch(origen, password, salida, workers, mostrar_progreso)
+            print()
+            
+            cifrados = sum(1 for r in resultados if r['success'] and not r.get('skipped'))
+            omitidos = sum(1 for r in resultados if r.get('skipped'))
+            fallidos = [r for r in resultados if not r['success']]
+            print(f"\n✅ Archivos cifrados: {cifrados}")
+            print(f"⏭️  Sin cambios (omitidos): {omitidos}")
+            print(f"❌ Errores: {len(fallidos)}")
+            for r in fallidos:
+                print(f"   ❌ {r['document_path']}: {r.get('error', 'Error desconocido')}")
+        except Exception as e:
+            print(f"❌ Error: {e}")
+        
+        input("\nPresione Enter para continuar...")
+    
     def decrypt_document_team(self):
         self.clear_screen()
         self.print_header()
@@ -713,17 +824,63 @@ class ConsoleInterface:
         new_user = input("Nuevo nombre de usuario: ").strip()
         if new_user:
             self.current_user = new_user
+            if not self._key_gen_construido():
+                # Las llaves del nuevo usuario se cargarán al primer uso
+                print(f"Usuario cambiado a: {new_user}")
+                if not os.path.isfile(f"private_key_{new_user}.pem"):
+                    print(f"⚠️  No se encontró llave privada existente para {new_user}")
+                    print(f"   Use 'Generar mis llaves' o 'Cargar mi llave privada'")
+                input("Presione Enter para continuar...")
+                return
             self.key_gen.user_id = new_user
             print(f"Usuario cambiado a: {new_user}")
             
             # Intentar cargar llave privada del nuevo usuario automáticamente
-            if self.key_gen.load_private_key(new_user):
+            if self._load_private_key(new_user):
                 print(f"✅ Llave privada de {new_user} cargada automáticamente")
             else:
                 print(f"⚠️  No se encontró llave privada existente para {new_user}")
                 print(f"   Use 'Generar mis llaves' o 'Cargar mi llave privada'")
         input("Presione Enter para continuar...")
 
-if __name__ == "__main__":
+COMPONENTES_DIFERIDOS = ("key_gen", "signer", "verifier", "encryptor", "decryptor", "key_encryptor", "key_decryptor")
+
+
+def profile_startup():
+    """Mide cada fase del arranque hasta el primer menú y el coste diferido de cada componente"""
+    fases = [("importar app_console", _FIN_MODULO - _INICIO_MODULO)]
+    
+    inicio = time.perf_counter()
     app = ConsoleInterface()
-    app.main_menu()
\ No newline at end of file
+    fases.append(("ConsoleInterface()", time.perf_counter() - inicio))
+    
+    inicio = time.perf_counter()
+    app.show_main_menu()
+    fases.append(("dibujar menú principal", time.perf_counter() - inicio))
+    total_menu = sum(segundos for _, segundos in fases)
+    
+    # Lo que antes se pagaba en __init__ ahora se paga en el primer uso
+    diferidas = []
+    for nombre in COMPONENTES_DIFERIDOS:
+        inicio = time.perf_counter()
+        getattr(app, nombre)
+        diferidas.append((nombre, time.perf_counter() - inicio))
+    
+    print("\n⏱️  PERFIL DE ARRANQUE")
+    for nombre, segundos in fases:
+        print(f"   {nombre:<28} {segundos * 1000:8.2f} ms")
+    print(f"   {'total hasta el menú':<28} {total_menu * 1000:8.2f} ms")
+    print("\n   Primer uso de cada componente (diferido):")
+    for nombre, segundos in diferidas:
+        print(f"   {nombre:<28} {segundos * 1000:8.2f} ms")
+    print(f"   {'total diferido':<28} {sum(s for _, s in diferidas) * 1000:8.2f} ms")
+
+
+_FIN_MODULO = time.perf_counter()
+
+if __name__ == "__main__":
+    if "--profile-startup" in sys.argv[1:]:
+        profile_startup()
+    else:
+        app = ConsoleInterface()
+        app.main_menu()
\ No newline at end of file
@@ -1,9 +1,23 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
 from sign.mainhearth import signverify
-from mock_data import load_employee_data, update_employee_public_key, update_employee_signature
+from sign.key_generator import KeyGenerator, enable_key_pool, key_pool_stats
+from sign.digital_signer import DigitalSigner
+from sign.key_registry import public_key_fingerprint
+from sign.algorithms import get_backend
+from sign.verification_cache import get_verification_cache, signature_digest
+from cipher.Cifrado_doc import DocumentEncryptor, CifradorIncremental
+from document_store import get_document_store, DocumentTooLargeError
+from publish_queue import PublishQueue
+from metrics import enable_metrics, install_flask_metrics
+from mock_data import load_employee_data, find_employee, update_employee_public_key, update_employee_signature
 import json
 import os
-import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 app.secret_key = 'director-secret-key-2024'
@@ -15,9 +29,108 @@ GITHUB_CONFIG = {
     'repo_name': 'documentos-legales'
 }
 
+# Concurrencia de la verificación de firmas (RSA verify libera el GIL)
+VERIFY_CONFIG = {
+    'max_workers': 16,
+    # Cuánto se reutiliza el conjunto de firmas descargado entre sondeos del panel
+    'signatures_ttl_seconds': 30
+}
+
+# Métricas por operación en /metrics (formato Prometheus); apagadas no cuestan nada.
+# Son opcionales: se activan con OFICINA_METRICS=1. El endpoint no pide
+# autenticación, así que solo debe quedar expuesto a la red de monitorización.
+METRICS_CONFIG = {
+    'enabled': os.environ.get('OFICINA_METRICS', '0') == '1'
+}
+
+if METRICS_CONFIG['enabled']:
+    enable_metrics()
+install_flask_metrics(app)
+
+# Pool de llaves RSA pre-generadas (evita generar en línea dentro de la petición).
+# Opcional (OFICINA_KEY_POOL=1); sus hilos arrancan en init_app()
+KEY_POOL_CONFIG = {
+    'enabled': os.environ.get('OFICINA_KEY_POOL', '0') == '1',
+    'depth': 4,
+    'threads': 1
+}
+
+# Veredictos de verificación persistentes entre sondeos del panel
+verification_cache = get_verification_cache()
+
+# Almacén de documentos direccionado por hash (las subidas repetidas no duplican bytes)
+DOCUMENT_STORE_CONFIG = {
+    'root': os.environ.get('DOCUMENT_STORE', 'document_store')
+}
+document_store = get_document_store(DOCUMENT_STORE_CONFIG['root'])
+
+# Límites de subida: se comprueban mientras llegan los bytes, no al final
+UPLOAD_CONFIG = {
+    'max_document_bytes': 2 * 1024 ** 3,
+    'max_form_overhead': 1024 * 1024
+}
+document_encryptor = DocumentEncryptor()
+
+# Cola duradera para las llamadas a GitHub (publicar y descargar firmas)
+PUBLISH_QUEUE_CONFIG = {
+    'db_path': os.environ.get('PUBLISH_QUEUE_DB', 'publish_queue.db'),
+    'workers': 2,
+    'max_attempts': 5
+}
+
 # Almacenamiento en memoria
 director_system = signverify("director", GITHUB_CONFIG['token'], GITHUB_CONFIG)
 
+def _trabajo_publicar(payload):
+    """Publica en GitHub un documento del almacén (se ejecuta en la cola)"""
+    stored_hash = payload['stored_hash']
+    team_name = payload['team_name']
+    temp_path = document_store.named_link(stored_hash, payload['file_name'])
+    try:
+        result = director_system.publish_to_github(temp_path, team_name)
+    finally:
+        # Quitar el enlace con nombre; el contenido sigue en el almacén
+        document_store.release_link(temp_path)
+    
+    # Registrar llaves públicas de los miembros del equipo
+    employees_data = load_employee_data()
+    if team_name in employees_data:
+        for member in employees_data[team_name]:
+            if member['public_key']:
+                director_system.add_team_member_public_key(member['id'], member['public_key'])
+    
+    return {
+        'document_hash': result['document_hash'],
+        'github_url': result['github_url'],
+        'team': team_name
+    }
+
+def _trabajo_descargar_firmas(payload):
+    """Descarga y verifica las firmas de un documento (se ejecuta en la cola)"""
+    # Se pidió explícitamente: ignorar el conjunto de firmas en caché
+    return _verificar_firmas_documento(payload['document_hash'], refrescar=True)
+
+publish_queue = PublishQueue(
+    PUBLISH_QUEUE_CONFIG['db_path'],
+    workers=PUBLISH_QUEUE_CONFIG['workers'],
+    max_attempts=PUBLISH_QUEUE_CONFIG['max_attempts']
+)
+publish_queue.register_handler('publish', _trabajo_publicar)
+publish_queue.register_handler('download_signatures', _trabajo_descargar_firmas)
+
+def init_app():
+    """Arranca los hilos de fondo en el proceso que atiende peticiones
+
+    No se hace al importar el módulo: los trabajos de la cola escriben en el
+    estado en memoria de director_system, así que solo debe drenarla el
+    proceso que sirve la API (no el padre del reloader ni otro proceso que
+    importe), y el pool de llaves solo tiene sentido donde se generan llaves.
+    """
+    if KEY_POOL_CONFIG['enabled']:
+        enable_key_pool(KEY_POOL_CONFIG['depth'], KEY_POOL_CONFIG['threads'])
+    publish_queue.start()
+    return app
+
 @app.route('/')
 def index():
     if 'user_role' not in session or session['user_role'] != 'director':
@@ -115,6 +228,89 @@ def get_celula(celula_name):
 
 # ========== NUEVOS ENDPOINTS PARA GITHUB ==========
 
+def _descartar_subida(writer):
+    writer.abort()
+    cifrado = getattr(writer, 'cifrado', None)
+    if cifrado:
+        cifrado['file'].close()
+        if os.path.exists(cifrado['path']):
+            os.remove(cifrado['path'])
+
+def _confirmar_subida(writer):
+    """Publica en el almacén lo recibido; devuelve (document_hash, tamaño, ruta cifrada o None)"""
+    document_hash, tamano = writer.commit()
+    cifrado = getattr(writer, 'cifrado', None)
+    if not cifrado:
+        return document_hash, tamano, None
+    
+    cifrado['cifrador'].finalizar()
+    cifrado['file'].flush()
+    os.fsync(cifrado['file'].fileno())
+    cifrado['file'].close()
+    # Una versión cifrada existente (quizá con otra contraseña) no se reemplaza:
+    # publish_derived lanza FileExistsError y elimina el temporal
+    encrypted_path = document_store.publish_derived(cifrado['path'], document_hash, '.enc')
+    ruta_meta = document_store.temp_path(".meta_")
+    with open(ruta_meta, 'wb') as f:
+        f.write(cifrado['salt'])
+    os.replace(ruta_meta, encrypted_path + '.meta')
+    return document_hash, tamano, encrypted_path
+
+def recibir_subida_documento(validar_form=None):
+    """Procesa el multipart en streaming: hash, cifrado opcional y almacén en una sola pasada
+
+    Cada parte de archivo se escribe directamente en el almacén por
+    contenido mientras llega; si viene la cabecera X-Document-Password se
+    cifra a la vez (mismo formato y .meta que encrypt_document).
+    `validar_form(form)` se llama antes de publicar nada en el almacén y
+    devuelve un mensaje de error o None; si hay error lo recibido se
+    descarta. Devuelve (form, subida, error) con subida = {'document_hash',
+    'size', 'filename', 'encrypted_path'} o None si no se publicó nada.
+    """
+    password = request.headers.get('X-Document-Password')
+    escritores = []
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        cifrado = None
+        on_chunk = None
+        if password:
+            salt = document_encryptor.generar_salt_lote()
+            ruta = document_store.temp_path(".cifrado_")
+            file_out = open(ruta, 'wb')
+            cifrador = CifradorIncremental(file_out, document_encryptor.derivar_clave_desde_password(password, salt))
+            cifrado = {'path': ruta, 'file': file_out, 'cifrador': cifrador, 'salt': salt}
+            on_chunk = cifrador.update
+        writer = document_store.open_writer(UPLOAD_CONFIG['max_document_bytes'], on_chunk)
+        writer.cifrado = cifrado
+        escritores.append(writer)
+        return writer
+    
+    try:
+        _, form, files = parse_form_data(
+            request.environ,
+            stream_factory=stream_factory,
+            max_content_length=UPLOAD_CONFIG['max_document_bytes'] + UPLOAD_CONFIG['max_form_overhead'],
+            silent=False
+        )
+        file = files.get('document')
+        if not file:
+            return form, None, 'No se proporcionó archivo'
+        error = validar_form(form) if validar_form else None
+        if error:
+            return form, None, error
+        document_hash, tamano, encrypted_path = _confirmar_subida(file.stream)
+        subida = {
+            'document_hash': document_hash,
+            'size': tamano,
+            'filename': file.filename,
+            'encrypted_path': encrypted_path
+        }
+        return form, subida, None
+    finally:
+        for writer in escritores:
+            if writer.document_hash is None:
+                _descartar_subida(writer)
+
 @app.route('/api/publish-document', methods=['POST'])
 def publish_document():
     """Publica un documento en GitHub para un equipo específico"""
@@ -126,53 +322,148 @@ def publish_document():
         if not director_system.private_key:
             return jsonify({'error': 'El director debe generar sus llaves primero'}), 400
         
-        file = request.files.get('document')
-        team_name = request.form.get('team_name')
-        document_name = request.form.get('document_name', file.filename if file else 'documento')
+        def validar_equipo(form):
+            # Antes de publicar en el almacén: un equipo inválido no deja blobs huérfanos
+            team_name = form.get('team_name')
+            if not team_name:
+                return 'No se especificó equipo'
+            if team_name not in director_system.get_available_teams('director'):
+                return f'Equipo no válido: {team_name}'
+            return None
         
-        if not file:
-            return jsonify({'error': 'No se proporcionó archivo'}), 400
+        try:
+            form, subida, error = recibir_subida_documento(validar_equipo)
+        except (DocumentTooLargeError, RequestEntityTooLarge) as e:
+            return jsonify({'error': f'Documento demasiado grande: {str(e)}'}), 413
+        except FileExistsError:
+            return jsonify({'error': 'El documento ya tiene una versión cifrada en el almacén'}), 409
+        except ValueError as e:
+            return jsonify({'error': f'Solicitud inválida: {str(e)}'}), 400
         
-        if not team_name:
-            return jsonify({'error': 'No se especificó equipo'}), 400
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Verificar que el equipo existe
-        available_teams = director_system.get_available_teams('director')
-        if team_name not in available_teams:
-            return jsonify({'error': f'Equipo no válido: {team_name}'}), 400
+        team_name = form.get('team_name')
         
-        # Guardar archivo temporal
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, file.filename)
-        file.save(temp_path)
+        # El documento ya está en el almacén: la publicación en GitHub va a la
+        # cola y la petición responde sin esperar a la API remota. La clave de
+        # idempotencia evita publicar dos veces el mismo contenido al mismo equipo.
+        stored_hash = subida['document_hash']
+        # Un trabajo 'done' solo sirve si este proceso conserva la publicación
+        # (published_documents vive en memoria y se pierde al reiniciar)
+        publicado = director_system.published_documents.get(stored_hash)
+        ya_publicado = publicado is not None and publicado.get('team') == team_name
+        job = publish_queue.enqueue(
+            'publish',
+            f"publish:{team_name}:{stored_hash}",
+            {
+                'stored_hash': stored_hash,
+                'file_name': secure_filename(subida['filename'] or '') or stored_hash,
+                'team_name': team_name
+            },
+            requeue_finished=not ya_publicado
+        )
         
-        try:
-            # Publicar en GitHub
-            result = director_system.publish_to_github(temp_path, team_name)
-            
-            # Registrar llaves públicas de los miembros del equipo
-            employees_data = load_employee_data()
-            if team_name in employees_data:
-                for member in employees_data[team_name]:
-                    if member['public_key']:
-                        director_system.add_team_member_public_key(member['id'], member['public_key'])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Documento publicado exitosamente en GitHub',
-                'document_hash': result['document_hash'],
-                'github_url': result['github_url'],
-                'team': team_name
-            })
-            
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return jsonify({
+            'success': True,
+            'message': 'Documento recibido; publicación en GitHub en cola',
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': url_for('get_publish_job', job_id=job['id']),
+            'stored_hash': stored_hash,
+            'size': subida['size'],
+            'encrypted': subida['encrypted_path'] is not None,
+            'team': team_name
+        }), 202
                 
     except Exception as e:
         return jsonify({'error': f'Error publicando documento: {str(e)}'}), 500
 
+@app.route('/api/publish-jobs/<int:job_id>', methods=['GET'])
+def get_publish_job(job_id):
+    """Estado de un trabajo de la cola de publicación"""
+    if 'user_role' not in session or session['user_role'] != 'director':
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    job = publish_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'next_run_at': job['next_run_at'],
+        'last_error': job['last_error'],
+        'result': job['result'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    })
+
+@app.route('/api/publish-queue-status', methods=['GET'])
+def get_publish_queue_status():
+    """Conteo de trabajos por estado en la cola de publicación"""
+    if 'user_role' not in session or session['user_role'] != 'director':
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    return jsonify(publish_queue.estadisticas())
+
+def _firmante_director():
+    """DigitalSigner con la llave del director (parseada una vez por PrivateKeyCache)"""
+    key_gen = KeyGenerator('director')
+    if not key_gen.load_private_key('director'):
+        return None
+    return DigitalSigner(key_gen)
+
+@app.route('/api/stored-documents/<document_hash>/sign', methods=['POST'])
+def sign_stored_document(document_hash):
+    """Firma un documento del almacén por su hash, sin volver a leer el contenido"""
+    if 'user_role' not in session or session['user_role'] != 'director':
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        if not document_store.exists(document_hash):
+            return jsonify({'error': 'Documento no encontrado en el almacén'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    signer = _firmante_director()
+    if signer is None:
+        return jsonify({'error': 'El director debe generar sus llaves primero'}), 400
+    
+    return jsonify({
+        'success': True,
+        'signature_package': signer.sign_stored_document(document_store, document_hash)
+    })
+
+@app.route('/api/stored-documents/<document_hash>/encrypt', methods=['POST'])
+def encrypt_stored_document(document_hash):
+    """Cifra con contraseña un documento ya subido al almacén (<hash>.enc junto al blob)"""
+    if 'user_role' not in session or session['user_role'] != 'director':
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    password = (request.get_json(silent=True) or {}).get('password')
+    if not password:
+        return jsonify({'error': 'Contraseña no proporcionada'}), 400
+    
+    try:
+        if not document_store.exists(document_hash):
+            return jsonify({'error': 'Documento no encontrado en el almacén'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = document_encryptor.encrypt_stored_document(document_store, document_hash, password)
+    if not result['success']:
+        cifrado_existente = os.path.exists(document_store.derived_path(document_hash, '.enc'))
+        return jsonify({'error': result['error']}), 409 if cifrado_existente else 500
+    
+    return jsonify({
+        'success': True,
+        'document_hash': document_hash.lower(),
+        'encrypted': True
+    })
+
 @app.route('/api/get-published-documents', methods=['GET'])
 def get_published_documents():
     """Obtiene documentos publicados disponibles para el director"""
@@ -209,10 +500,10 @@ def get_available_teams():
     try:
         teams = director_system.get_available_teams('director')
         
+        employees_data = load_employee_data()
         teams_info = []
         for team in teams:
             # Contar miembros del equipo
-            employees_data = load_employee_data()
             member_count = len(employees_data.get(team, []))
             
             teams_info.append({
@@ -246,57 +537,135 @@ def verify_document_signatures():
         if document_hash not in director_system.published_documents:
             return jsonify({'error': 'Documento no encontrado'}), 404
         
-        doc_info = director_system.published_documents[document_hash]
-        team_name = doc_info['team']
+        # Con 'async' la descarga de firmas va a la cola y se consulta en /api/publish-jobs
+        if data.get('async'):
+            job = publish_queue.enqueue(
+                'download_signatures',
+                f"signatures:{document_hash}",
+                {'document_hash': document_hash},
+                requeue_finished=True
+            )
+            return jsonify({
+                'success': True,
+                'job_id': job['id'],
+                'status': job['status'],
+                'status_url': url_for('get_publish_job', job_id=job['id'])
+            }), 202
         
-        # Descargar firmas desde GitHub
-        if director_system.github_enabled:
-            signatures = director_system.github_mgr.download_signatures(document_hash, team_name)
-        else:
-            signatures = []
+        return jsonify(_verificar_firmas_documento(document_hash))
         
-        # Verificar cada firma
+    except Exception as e:
+        return jsonify({'error': f'Error verificando firmas: {str(e)}'}), 500
+
+# Firmas descargadas por (document_hash, equipo): {clave: (expira, firmas)}
+_firmas_descargadas = {}
+_firmas_descargadas_lock = threading.Lock()
+
+def _descargar_firmas(document_hash, team_name, refrescar=False):
+    """Firmas del documento desde GitHub, reutilizando la descarga reciente
+
+    Los sondeos del panel dentro de `signatures_ttl_seconds` no vuelven a
+    llamar a GitHub; las firmas nuevas aparecen al caducar la entrada o
+    con `refrescar`.
+    """
+    clave = (document_hash, team_name)
+    ahora = time.monotonic()
+    if not refrescar:
+        with _firmas_descargadas_lock:
+            entrada = _firmas_descargadas.get(clave)
+        if entrada is not None and entrada[0] > ahora:
+            return entrada[1]
+    
+    signatures = director_system.github_mgr.download_signatures(document_hash, team_name)
+    with _firmas_descargadas_lock:
+        _firmas_descargadas[clave] = (ahora + VERIFY_CONFIG['signatures_ttl_seconds'], signatures)
+    return signatures
+
+def _verificar_firmas_documento(document_hash, refrescar=False):
+    """Descarga desde GitHub y verifica las firmas de un documento publicado"""
+    doc_info = director_system.published_documents[document_hash]
+    team_name = doc_info['team']
+    
+    # Descargar firmas desde GitHub
+    if director_system.github_enabled:
+        signatures = _descargar_firmas(document_hash, team_name, refrescar)
+    else:
+        signatures = []
+    
+    # Verificar las firmas en paralelo; el orden de los resultados se conserva
+    if signatures:
+        workers = min(VERIFY_CONFIG['max_workers'], len(signatures))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            verification_results = list(executor.map(
+                lambda signature_data: _verificar_firma_hash(document_hash, signature_data),
+                signatures
+            ))
+    else:
         verification_results = []
-        valid_signatures = 0
-        
-        for signature_data in signatures:
-            user_id = signature_data.get('user_id')
-            try:
-                # Verificar firma del hash
-                is_valid = director_system.verify_hash_signature(
-                    user_id, 
-                    document_hash, 
-                    signature_data['signature']
-                )
-                
-                verification_results.append({
-                    'user_id': user_id,
-                    'valid': is_valid,
-                    'timestamp': signature_data.get('timestamp', '')
-                })
-                
-                if is_valid:
-                    valid_signatures += 1
-                    
-            except Exception as e:
-                verification_results.append({
+    valid_signatures = sum(1 for r in verification_results if r['valid'])
+    
+    return {
+        'success': True,
+        'document_hash': document_hash,
+        'file_name': doc_info['file_name'],
+        'team': team_name,
+        'total_signatures': len(signatures),
+        'valid_signatures': valid_signatures,
+        'verification_results': verification_results
+    }
+
+def _verificar_firma_hash(document_hash, signature_data):
+    """Verifica una firma descargada y devuelve su resultado con tiempo"""
+    user_id = signature_data.get('user_id')
+    inicio = time.perf_counter()
+    try:
+        # Las firmas son inmutables: reutilizar el veredicto si ya se verificó
+        # con la misma llave (la caché se invalida al rotar/revocar la llave)
+        public_key = director_system.team_public_keys.get(user_id)
+        clave_cache = None
+        if public_key is not None:
+            clave_cache = (
+                document_hash,
+                public_key_fingerprint(public_key),
+                # Mismo identificador que SignatureVerifier: nombre del backend
+                # (las firmas antiguas sin 'alg' son RSA-PSS)
+                signature_digest(signature_data['signature'], get_backend(signature_data.get('alg')).name, 'hash_only')
+            )
+            previo = verification_cache.get(*clave_cache)
+            if previo is not None:
+                return {
                     'user_id': user_id,
-                    'valid': False,
-                    'error': str(e)
-                })
+                    'valid': previo['valid'],
+                    'timestamp': signature_data.get('timestamp', ''),
+                    'cached': True,
+                    'verified_at': previo['verified_at'],
+                    'duration_ms': (time.perf_counter() - inicio) * 1000
+                }
         
-        return jsonify({
-            'success': True,
-            'document_hash': document_hash,
-            'file_name': doc_info['file_name'],
-            'team': team_name,
-            'total_signatures': len(signatures),
-            'valid_signatures': valid_signatures,
-            'verification_results': verification_results
-        })
+        # Verificar firma del hash
+        is_valid = director_system.verify_hash_signature(
+            user_id, 
+            document_hash, 
+            signature_data['signature']
+        )
+        if clave_cache is not None:
+            verification_cache.put(*clave_cache, is_valid)
         
+        return {
+            'user_id': user_id,
+            'valid': is_valid,
+            'timestamp': signature_data.get('timestamp', ''),
+            'cached': False,
+            'duration_ms': (time.perf_counter() - inicio) * 1000
+        }
+            
     except Exception as e:
-        return jsonify({'error': f'Error verificando firmas: {str(e)}'}), 500
+        return {
+            'user_id': user_id,
+            'valid': False,
+            'error': str(e),
+            'duration_ms': (time.perf_counter() - inicio) * 1000
+        }
 
 @app.route('/api/director-status', methods=['GET'])
 def get_director_status():
@@ -378,18 +747,10 @@ def verify_signature():
     employee_id = data.get('employee_id')
     message = data.get('message', 'Mensaje de verificación')
     
-    employees_data = load_employee_data()
-    
     # Buscar empleado y su llave pública
-    employee_public_key = None
-    employee_signature = None
-    
-    for celula in employees_data.values():
-        for employee in celula:
-            if employee['id'] == employee_id:
-                employee_public_key = employee['public_key']
-                employee_signature = employee['firma']
-                break
+    _, employee = find_employee(employee_id)
+    employee_public_key = employee['public_key'] if employee else None
+    employee_signature = employee['firma'] if employee else None
     
     if not employee_public_key or not employee_signature:
         return jsonify({'error': 'Empleado no encontrado o sin firma'}), 404
@@ -412,6 +773,17 @@ def get_director_keys():
         'github_enabled': director_system.github_enabled
     })
 
+@app.route('/api/key-pool-status', methods=['GET'])
+def get_key_pool_status():
+    """Métricas del pool de llaves pre-generadas"""
+    if 'user_role' not in session or session['user_role'] != 'director':
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    return jsonify({
+        'enabled': KEY_POOL_CONFIG['enabled'],
+        'pool': key_pool_stats()
+    })
+
 @app.route('/api/logout', methods=['POST'])
 def logout():
     """Cierra la sesión del director"""
@@ -419,8 +791,8 @@ def logout():
     return jsonify({'success': True, 'message': 'Sesión cerrada'})
 
 if __name__ == '__main__':
-    from mock_data import load_employee_data
-    load_employee_data()
+    from mock_data import seed_demo_employees
+    seed_demo_employees()
     
     print("=== Sistema del Director ===")
     print("URL: http://localhost:5001")
@@ -428,4 +800,9 @@ if __name__ == '__main__':
     print("GitHub: " + ("✅ Configurado" if director_system.github_enabled else "❌ No configurado"))
     print("=============================")
     
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Con debug=True el reloader relanza el script: el padre solo vigila
+    # archivos y no debe tomar trabajos; el hijo lleva WERKZEUG_RUN_MAIN
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_app()
+    app.run(debug=debug, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -1,6 +1,8 @@
 from flask import Flask, render_template, request, jsonify, session
 from sign.mainhearth import signverify
-from mock_data import load_employee_data, update_employee_public_key, update_employee_signature
+from sign.key_generator import private_key_exists, private_key_filename, private_key_cache, enable_key_pool, key_pool_stats
+from metrics import enable_metrics, install_flask_metrics
+from mock_data import find_employee, update_employee_public_key, update_employee_signature
 import json
 import os
 import base64
@@ -8,6 +10,31 @@ import base64
 app = Flask(__name__)
 app.secret_key = 'empleado-secret-key-2024'
 
+# Métricas por operación en /metrics (formato Prometheus); apagadas no cuestan nada.
+# Son opcionales: se activan con OFICINA_METRICS=1. El endpoint no pide
+# autenticación, así que solo debe quedar expuesto a la red de monitorización.
+METRICS_CONFIG = {
+    'enabled': os.environ.get('OFICINA_METRICS', '0') == '1'
+}
+
+if METRICS_CONFIG['enabled']:
+    enable_metrics()
+install_flask_metrics(app)
+
+# Pool de llaves RSA pre-generadas: absorbe los picos de altas de empleados.
+# Opcional (OFICINA_KEY_POOL=1); sus hilos arrancan en init_app()
+KEY_POOL_CONFIG = {
+    'enabled': os.environ.get('OFICINA_KEY_POOL', '0') == '1',
+    'depth': 16,
+    'threads': 2
+}
+
+def init_app():
+    """Arranca el pool de llaves (si está activo) en el proceso que atiende peticiones"""
+    if KEY_POOL_CONFIG['enabled']:
+        enable_key_pool(KEY_POOL_CONFIG['depth'], KEY_POOL_CONFIG['threads'])
+    return app
+
 @app.route('/')
 def index():
     return render_template('empleado.html')
@@ -19,18 +46,9 @@ def login_empleado():
     password = data.get('password')
     
     # Verificar credenciales del empleado
-    employees_data = load_employee_data()
-    empleado_encontrado = None
-    celula_empleado = None
-    
-    for celula_name, miembros in employees_data.items():
-        for empleado in miembros:
-            if empleado['id'] == empleado_id and empleado['password'] == password:
-                empleado_encontrado = empleado
-                celula_empleado = celula_name
-                break
-    
-    if empleado_encontrado:
+    celula_empleado, empleado_encontrado = find_employee(empleado_id)
+    
+    if empleado_encontrado and empleado_encontrado['password'] == password:
         session['user_role'] = 'empleado'
         session['user_id'] = empleado_id
         session['empleado_info'] = {
@@ -40,11 +58,8 @@ def login_empleado():
             'celula': celula_empleado
         }
         
-        # Inicializar sistema de llaves para este empleado
-        empleado_system = signverify(empleado_id)
-        
-        # Intentar cargar llave privada si existe
-        if empleado_system.load_privk(empleado_id):
+        # Dejar la llave privada en caché (si existe) para las operaciones siguientes
+        if _cargar_sistema_empleado(empleado_id):
             print(f"✓ Llave privada cargada para {empleado_id}")
         
         return jsonify({
@@ -55,6 +70,21 @@ def login_empleado():
     
     return jsonify({'success': False, 'error': 'ID de empleado o contraseña incorrectos'})
 
+def _cargar_sistema_empleado(empleado_id):
+    """Sistema de llaves del empleado con su llave privada tomada de PrivateKeyCache.
+
+    Evita parsear el PEM en cada petición: solo se relee cuando el archivo
+    cambia. Devuelve None si el empleado aún no tiene llave privada local.
+    """
+    try:
+        private_key = private_key_cache.obtener(empleado_id, private_key_filename(empleado_id))
+    except (FileNotFoundError, ValueError):
+        return None
+    empleado_system = signverify(empleado_id)
+    empleado_system.private_key = private_key
+    empleado_system.public_key = private_key.public_key()
+    return empleado_system
+
 @app.route('/api/generate-empleado-keys', methods=['POST'])
 def generate_empleado_keys():
     """Genera llaves para el empleado y guarda la pública en el sistema"""
@@ -90,10 +120,10 @@ def create_signature():
     if not empleado_id:
         return jsonify({'error': 'Empleado no autenticado'}), 401
     
-    # Cargar sistema de llaves del empleado
-    empleado_system = signverify(empleado_id)
+    # Cargar sistema de llaves del empleado (llave tomada de la caché)
+    empleado_system = _cargar_sistema_empleado(empleado_id)
     
-    if not empleado_system.load_privk(empleado_id):
+    if empleado_system is None:
         return jsonify({'error': 'Debes generar tus llaves primero'}), 400
     
     try:
@@ -124,14 +154,7 @@ def get_empleado_info():
         return jsonify({'error': 'Empleado no autenticado'}), 401
     
     # Cargar datos actualizados del empleado
-    employees_data = load_employee_data()
-    empleado_actualizado = None
-    
-    for celula in employees_data.values():
-        for empleado in celula:
-            if empleado['id'] == empleado_id:
-                empleado_actualizado = empleado
-                break
+    _, empleado_actualizado = find_employee(empleado_id)
     
     if empleado_actualizado:
         info = {
@@ -145,9 +168,8 @@ def get_empleado_info():
             'firma': empleado_actualizado['firma']
         }
         
-        # Verificar si tiene llave privada local
-        empleado_system = signverify(empleado_id)
-        tiene_llave_privada = empleado_system.load_privk(empleado_id)
+        # Verificar si tiene llave privada local (stat, sin cargar la llave)
+        tiene_llave_privada = private_key_exists(empleado_id)
         
         return jsonify({
             'success': True,
@@ -170,10 +192,10 @@ def decrypt_key():
     if not encrypted_key_b64:
         return jsonify({'error': 'Llave encriptada requerida'}), 400
     
-    # Cargar sistema de llaves del empleado
-    empleado_system = signverify(empleado_id)
+    # Cargar sistema de llaves del empleado (llave tomada de la caché)
+    empleado_system = _cargar_sistema_empleado(empleado_id)
     
-    if not empleado_system.load_privk(empleado_id):
+    if empleado_system is None:
         return jsonify({'error': 'Debes generar tus llaves primero'}), 400
     
     try:
@@ -190,6 +212,17 @@ def decrypt_key():
     except Exception as e:
         return jsonify({'error': f'Error desencriptando llave: {str(e)}'}), 500
 
+@app.route('/api/key-pool-status', methods=['GET'])
+def get_key_pool_status():
+    """Métricas del pool de llaves pre-generadas"""
+    if not session.get('user_id'):
+        return jsonify({'error': 'Empleado no autenticado'}), 401
+    
+    return jsonify({
+        'enabled': KEY_POOL_CONFIG['enabled'],
+        'pool': key_pool_stats()
+    })
+
 @app.route('/api/logout', methods=['POST'])
 def logout_empleado():
     """Cierra la sesión del empleado"""
@@ -198,8 +231,8 @@ def logout_empleado():
 
 if __name__ == '__main__':
     # Asegurarse de que los datos de empleados existan
-    from mock_data import load_employee_data
-    load_employee_data()
+    from mock_data import seed_demo_employees
+    seed_demo_employees()
     
     print("=== Sistema de Empleados ===")
     print("URL: http://localhost:5002")
@@ -208,4 +241,8 @@ if __name__ == '__main__':
     print("  Contraseña: password")
     print("=============================")
     
-    app.run(debug=True, host='0.0.0.0', port=5002)
\ No newline at end of file
+    # Igual que aw_dir: el padre del reloader no arranca hilos de fondo
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_app()
+    app.run(debug=debug, host='0.0.0.0', port=5002)
\ No newline at end of file
@@ -0,0 +1,304 @@
+import os
+import io
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage no se reporta RSS
+    resource = None
+
+# Benchmarks reproducibles de las rutas críticas de cipher/ y sign/.
+# Cada caso corre en un proceso nuevo (spawn) para que el pico de RSS sea
+# solo suyo. Ejemplos:
+#   python bench_crypto.py                              # 4 KB .. 256 MB + doc1.pdf
+#   python bench_crypto.py --full                       # hasta 4 GB
+#   python bench_crypto.py --output actual.json --baseline base.json
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+TAMANOS_RAPIDOS = [4 * KB, 64 * KB, 1 * MB, 16 * MB, 256 * MB]
+TAMANOS_COMPLETOS = TAMANOS_RAPIDOS + [1 * GB, 4 * GB]
+DOCUMENTO_INCLUIDO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "doc1.pdf")
+
+# Casos que dependen del tamaño del documento y casos de coste fijo
+CASOS_POR_TAMANO = ['cifrar_archivo', 'descifrar_archivo', 'sign_document', 'verify_signature']
+CASOS_FIJOS = ['sign_document_hash_only', 'generate_key_pair', 'cifrar_clave']
+
+
+def etiqueta_tamano(tamano):
+    for unidad, nombre in ((GB, 'GB'), (MB, 'MB'), (KB, 'KB')):
+        if tamano >= unidad and tamano % unidad == 0:
+            return f"{tamano // unidad}{nombre}"
+    return f"{tamano}B"
+
+
+def parsear_tamano(texto):
+    texto = texto.strip().upper().rstrip('B')
+    for sufijo, factor in (('G', GB), ('M', MB), ('K', KB)):
+        if texto.endswith(sufijo):
+            return int(float(texto[:-1]) * factor)
+    return int(texto)
+
+
+def crear_documento(ruta, tamano):
+    """Escribe un documento de prueba repitiendo un bloque aleatorio (rápido incluso a 4 GB)"""
+    bloque = os.urandom(MB)
+    with open(ruta, 'wb') as f:
+        restante = tamano
+        while restante > 0:
+            f.write(bloque[:min(restante, MB)])
+            restante -= MB
+
+
+def pico_rss_bytes():
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return maximo if sys.platform == 'darwin' else maximo * 1024
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _preparar_caso(caso, ruta_documento, directorio):
+    """Prepara (sin medir) lo que necesita el caso y devuelve la función a cronometrar"""
+    from cipher.Cifrado_doc import DocumentEncryptor
+    from cipher.Descifrado_doc import DocumentDecryptor
+    from cipher.cifradollave import KeyEncryptor
+    from sign.key_generator import KeyGenerator
+    from sign.digital_signer import DigitalSigner
+    from sign.signature_verifier import SignatureVerifier
+
+    encryptor = DocumentEncryptor()
+    salida = os.path.join(directorio, "salida.bin")
+
+    if caso == 'cifrar_archivo':
+        clave = encryptor.generar_clave_aes()
+        return lambda: encryptor.cifrar_archivo(ruta_documento, salida, clave)
+
+    if caso == 'descifrar_archivo':
+        clave = encryptor.generar_clave_aes()
+        cifrado = os.path.join(directorio, "cifrado.bin")
+        encryptor.cifrar_archivo(ruta_documento, cifrado, clave)
+        decryptor = DocumentDecryptor()
+        return lambda: decryptor.descifrar_archivo(cifrado, salida, clave)
+
+    if caso == 'generate_key_pair':
+        key_gen = KeyGenerator('bench')
+        return key_gen.generate_key_pair
+
+    key_gen = KeyGenerator('bench')
+    key_gen.generate_key_pair()
+    signer = DigitalSigner(key_gen)
+
+    if caso == 'sign_document':
+        return lambda: signer.sign_document(ruta_documento)
+
+    if caso == 'sign_document_hash_only':
+        document_hash = "ab" * 32
+        return lambda: signer.sign_document_hash_only(document_hash)
+
+    if caso == 'verify_signature':
+        key_gen.team_public_keys['bench'] = key_gen.public_key
+        signature_package = signer.sign_document(ruta_documento)
+        # Sin caché de veredictos: se mide la verificación completa
+        verifier = SignatureVerifier(key_gen)
+        return lambda: verifier.verify_signature(signature_package, ruta_documento)
+
+    if caso == 'cifrar_clave':
+        key_encryptor = KeyEncryptor()
+        clave_aes = encryptor.generar_clave_aes()
+        return lambda: key_encryptor.cifrar_clave(clave_aes, key_gen.public_key)
+
+    raise ValueError(f"Caso desconocido: {caso}")
+
+
+def _comprobar_resultado(caso, resultado):
+    # Cifrado y verificación señalan el fallo devolviendo False/None en lugar
+    # de lanzar: sin esta comprobación un camino roto se mediría como rápido
+    if not resultado:
+        raise RuntimeError(f"El caso '{caso}' falló (devolvió {resultado!r}); no se registra la muestra")
+
+
+def _ejecutar_caso(caso, ruta_documento, iteraciones, calentamiento):
+    """Se ejecuta en un proceso nuevo; devuelve latencias (s) y pico de RSS"""
+    directorio = tempfile.mkdtemp(prefix="bench_")
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    if raiz not in sys.path:
+        sys.path.insert(0, raiz)
+    anterior = os.getcwd()
+    os.chdir(directorio)
+    try:
+        # Los métodos medidos imprimen mensajes de progreso: se descartan
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcion = _preparar_caso(caso, ruta_documento, directorio)
+            for _ in range(calentamiento):
+                _comprobar_resultado(caso, funcion())
+            latencias = []
+            for _ in range(iteraciones):
+                inicio = time.perf_counter()
+                resultado = funcion()
+                duracion = time.perf_counter() - inicio
+                _comprobar_resultado(caso, resultado)
+                latencias.append(duracion)
+        return {'latencias': latencias, 'peak_rss_bytes': pico_rss_bytes()}
+    finally:
+        os.chdir(anterior)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def medir(caso, ruta_documento, tamano, etiqueta, iteraciones, calentamiento):
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        crudo = executor.submit(_ejecutar_caso, caso, ruta_documento, iteraciones, calentamiento).result()
+
+    latencias = crudo['latencias']
+    p50 = percentil(latencias, 50)
+    resultado = {
+        'case': caso,
+        'size': etiqueta,
+        'size_bytes': tamano,
+        'iterations': len(latencias),
+        'p50_ms': p50 * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+        'mean_ms': sum(latencias) / len(latencias) * 1000,
+        'min_ms': min(latencias) * 1000,
+        'ops_per_s': 1 / p50 if p50 > 0 else None,
+        'throughput_mb_s': (tamano / MB) / p50 if tamano and p50 > 0 else None,
+        'peak_rss_mb': crudo['peak_rss_bytes'] / MB if crudo['peak_rss_bytes'] else None
+    }
+    return resultado
+
+
+def iteraciones_para(tamano, iteraciones, presupuesto_bytes):
+    """Menos repeticiones para archivos grandes: acota los bytes procesados por caso"""
+    if not tamano:
+        return iteraciones
+    return max(1, min(iteraciones, presupuesto_bytes // tamano))
+
+
+def metadatos():
+    import cryptography
+    return {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'cryptography': cryptography.__version__
+    }
+
+
+def comparar_con_baseline(resultados, baseline, tolerancia):
+    """Devuelve [(caso, tamaño, p50 base, p50 actual, cambio)] de los casos que empeoraron"""
+    base = {(r['case'], r['size']): r for r in baseline.get('results', [])}
+    regresiones = []
+    for r in resultados:
+        anterior = base.get((r['case'], r['size']))
+        if anterior is None or not anterior['p50_ms']:
+            continue
+        cambio = r['p50_ms'] / anterior['p50_ms'] - 1
+        r['baseline_p50_ms'] = anterior['p50_ms']
+        r['change'] = cambio
+        if cambio > tolerancia:
+            regresiones.append((r['case'], r['size'], anterior['p50_ms'], r['p50_ms'], cambio))
+    return regresiones
+
+
+def imprimir_tabla(resultados):
+    print(f"{'caso':<26}{'tamaño':>10}{'iter':>6}{'p50 ms':>12}{'p99 ms':>12}{'MB/s':>10}{'RSS MB':>9}{'cambio':>9}")
+    for r in resultados:
+        mb_s = f"{r['throughput_mb_s']:.1f}" if r['throughput_mb_s'] else '-'
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] else '-'
+        cambio = f"{r['change'] * 100:+.1f}%" if 'change' in r else ''
+        print(f"{r['case']:<26}{r['size']:>10}{r['iterations']:>6}{r['p50_ms']:>12.3f}"
+              f"{r['p99_ms']:>12.3f}{mb_s:>10}{rss:>9}{cambio:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de cifrado y firma")
+    parser.add_argument('--sizes', help="Tamaños separados por comas (p. ej. 4K,1M,1G)")
+    parser.add_argument('--full', action='store_true', help="Incluir 1 GB y 4 GB")
+    parser.add_argument('--no-doc1', action='store_true', help="No incluir doc1.pdf")
+    parser.add_argument('--cases', help="Casos a ejecutar separados por comas")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--budget', default='1G', help="Bytes máximos procesados por caso y tamaño")
+    parser.add_argument('--workdir', help="Directorio para los documentos generados")
+    parser.add_argument('--output', help="Archivo JSON de resultados")
+    parser.add_argument('--baseline', help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Empeoramiento de p50 permitido (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        tamanos = [parsear_tamano(t) for t in args.sizes.split(',')]
+    else:
+        tamanos = TAMANOS_COMPLETOS if args.full else TAMANOS_RAPIDOS
+    casos = args.cases.split(',') if args.cases else CASOS_POR_TAMANO + CASOS_FIJOS
+    presupuesto = parsear_tamano(args.budget)
+
+    directorio = args.workdir or tempfile.mkdtemp(prefix="bench_docs_")
+    os.makedirs(directorio, exist_ok=True)
+    documentos = []
+    for tamano in tamanos:
+        ruta = os.path.join(directorio, f"doc_{etiqueta_tamano(tamano)}.bin")
+        if not os.path.exists(ruta) or os.path.getsize(ruta) != tamano:
+            crear_documento(ruta, tamano)
+        documentos.append((ruta, tamano, etiqueta_tamano(tamano)))
+    if not args.no_doc1 and os.path.exists(DOCUMENTO_INCLUIDO):
+        documentos.append((DOCUMENTO_INCLUIDO, os.path.getsize(DOCUMENTO_INCLUIDO), 'doc1.pdf'))
+
+    resultados = []
+    try:
+        for caso in casos:
+            if caso in CASOS_FIJOS:
+                print(f"⏱️  {caso}...", file=sys.stderr)
+                resultados.append(medir(caso, None, 0, '-', args.iterations, args.warmup))
+                continue
+            for ruta, tamano, etiqueta in documentos:
+                print(f"⏱️  {caso} ({etiqueta})...", file=sys.stderr)
+                iteraciones = iteraciones_para(tamano, args.iterations, presupuesto)
+                calentamiento = args.warmup if tamano <= 64 * MB else 0
+                resultados.append(medir(caso, ruta, tamano, etiqueta, iteraciones, calentamiento))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    regresiones = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regresiones = comparar_con_baseline(resultados, json.load(f), args.tolerance)
+
+    imprimir_tabla(resultados)
+    informe = {'meta': metadatos(), 'results': resultados}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print(f"\n📝 Resultados guardados en: {args.output}")
+
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} casos empeoraron más de {args.tolerance * 100:.0f}%:")
+        for caso, tamano, base, actual, cambio in regresiones:
+            print(f"   {caso} ({tamano}): {base:.3f} ms -> {actual:.3f} ms ({cambio * 100:+.1f}%)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
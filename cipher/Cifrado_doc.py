@@ -1,36 +1,82 @@
 import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import base64
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cipher import formato_stream
+from cipher.cache_claves import cache_sesion
+from metrics import instrumented, tamano_archivo
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+class CifradorIncremental:
+    """Cifrado por chunks alimentado desde fuera (mismo formato que cifrar_stream)
+
+    Sirve cuando los datos llegan en bloques de tamaño arbitrario, p. ej.
+    mientras se recibe una subida HTTP: `update(datos)` emite los chunks que
+    ya están completos y `finalizar()` emite el último con la bandera final.
+    """
+
+    def __init__(self, file_out, clave, tamano_chunk=formato_stream.TAMANO_CHUNK_DEFECTO):
+        self.file_out = file_out
+        self.tamano_chunk = tamano_chunk
+        self._aesgcm = AESGCM(formato_stream.derivar_clave_stream(clave))
+        self._prefijo_nonce = os.urandom(formato_stream.TAMANO_PREFIJO_NONCE)
+        self._cabecera = formato_stream.empaquetar_cabecera(tamano_chunk, self._prefijo_nonce)
+        self._pendiente = bytearray()
+        self._contador = 0
+        self.finalizado = False
+        file_out.write(self._cabecera)
+
+    def _emitir(self, datos, final):
+        nonce = formato_stream.construir_nonce(self._prefijo_nonce, self._contador, final)
+        chunk_cifrado = self._aesgcm.encrypt(nonce, bytes(datos), self._cabecera)
+        self.file_out.write(formato_stream.empaquetar_longitud(len(chunk_cifrado)))
+        self.file_out.write(chunk_cifrado)
+        self._contador += 1
+
+    def update(self, datos):
+        self._pendiente += datos
+        # Solo se emite un chunk cuando hay más datos detrás: así el último
+        # siempre queda para finalizar() y lleva la bandera final
+        while len(self._pendiente) > self.tamano_chunk:
+            self._emitir(self._pendiente[:self.tamano_chunk], False)
+            del self._pendiente[:self.tamano_chunk]
+
+    def finalizar(self):
+        if not self.finalizado:
+            self._emitir(self._pendiente, True)
+            self._pendiente = bytearray()
+            self.finalizado = True
+
 
 class DocumentEncryptor:
-    def __init__(self):
+    def __init__(self, cache_claves=None):
         self.ruta_base = os.path.dirname(os.path.abspath(__file__))
+        self.cache_claves = cache_claves or cache_sesion
 
     def generar_clave_aes(self):
         """Genera una nueva clave AES"""
         return Fernet.generate_key()
 
+    @instrumented('cipher.derivar_clave')
     def derivar_clave_desde_password(self, password, salt):
-        """Deriva una clave AES desde una contraseña usando PBKDF2"""
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        clave = kdf.derive(password.encode())
-        return base64.urlsafe_b64encode(clave)
+        """Deriva una clave AES desde una contraseña usando PBKDF2 (con caché de sesión)"""
+        return self.cache_claves.obtener(password, salt)
+
+    def generar_salt_lote(self):
+        """Genera un salt para reutilizar en un lote de archivos con la misma contraseña"""
+        return os.urandom(16)
 
     def guardar_clave_aes(self, clave, archivo_salida_completo):
         """Guarda la clave AES en un archivo"""
         try:
             with open(archivo_salida_completo, "wb") as f:
                 f.write(clave)
-            print(f"Clave AES guardada exitosamente en: {archivo_salida_completo}")
+            log.info("Clave AES guardada exitosamente en: %s", archivo_salida_completo)
         except IOError as e:
-            print(f"Error al guardar la clave en {archivo_salida_completo}: {e}")
+            log.error("Error al guardar la clave en %s: %s", archivo_salida_completo, e)
 
     def cargar_clave_aes(self, archivo_clave_completo):
         """Carga la clave AES desde un archivo"""
@@ -38,35 +84,65 @@ class DocumentEncryptor:
             with open(archivo_clave_completo, "rb") as f:
                 return f.read()
         except IOError as e:
-            print(f"Error al cargar la clave desde {archivo_clave_completo}: {e}")
+            log.error("Error al cargar la clave desde %s: %s", archivo_clave_completo, e)
             return None
 
+    def cifrar_stream(self, file_in, file_out, clave, tamano_chunk=formato_stream.TAMANO_CHUNK_DEFECTO,
+                      datos_asociados=b""):
+        """Cifra de un objeto archivo a otro por chunks autenticados (memoria constante)
+
+        `datos_asociados` se autentica junto a la cabecera en cada chunk sin
+        escribirse (p. ej. el índice de un sobre que precede al payload).
+        """
+        aesgcm = AESGCM(formato_stream.derivar_clave_stream(clave))
+        prefijo_nonce = os.urandom(formato_stream.TAMANO_PREFIJO_NONCE)
+        cabecera = formato_stream.empaquetar_cabecera(tamano_chunk, prefijo_nonce)
+        file_out.write(cabecera)
+        aad = cabecera + datos_asociados
+
+        contador = 0
+        actual = file_in.read(tamano_chunk)
+        while True:
+            # Leer un chunk por adelantado para saber si el actual es el último
+            siguiente = file_in.read(tamano_chunk)
+            final = not siguiente
+            nonce = formato_stream.construir_nonce(prefijo_nonce, contador, final)
+            chunk_cifrado = aesgcm.encrypt(nonce, actual, aad)
+            file_out.write(formato_stream.empaquetar_longitud(len(chunk_cifrado)))
+            file_out.write(chunk_cifrado)
+            if final:
+                break
+            actual = siguiente
+            contador += 1
+
+    @instrumented('cipher.cifrar_archivo', tamano_archivo(1))
     def cifrar_archivo(self, plaintext, cifrado, clave):
-        """Cifra un archivo usando Fernet"""
-        f = Fernet(clave)
+        """Cifra un archivo por chunks con AES-256-GCM"""
         try:
-            with open(plaintext, "rb") as file_in:
-                datos_originales = file_in.read()
-            
-            datos_cifrados = f.encrypt(datos_originales)
-            
-            with open(cifrado, "wb") as file_out:
-                file_out.write(datos_cifrados)
+            with open(plaintext, "rb") as file_in, open(cifrado, "wb") as file_out:
+                self.cifrar_stream(file_in, file_out, clave)
                 
-            print(f"Archivo '{plaintext}' cifrado exitosamente en: {cifrado}")
+            log.debug("Archivo '%s' cifrado exitosamente en: %s", plaintext, cifrado)
             return True
         except Exception as e:
-            print(f"Error durante el cifrado: {e}")
+            log.error("Error durante el cifrado de %s: %s", plaintext, e)
             return False
 
-    def encrypt_document(self, document_path, password, output_path=None):
-        """Método unificado para cifrar documentos - compatible con app_console"""
+    @instrumented('cipher.encrypt_document', tamano_archivo(1))
+    def encrypt_document(self, document_path, password, output_path=None, salt=None):
+        """Método unificado para cifrar documentos - compatible con app_console
+
+        Si se pasa `salt` (ver generar_salt_lote) la clave derivada se reutiliza
+        desde la caché para todo el lote; cada archivo sigue llevando su propio
+        nonce aleatorio en la cabecera.
+        """
         try:
             if not os.path.exists(document_path):
                 return {'success': False, 'error': 'Archivo no encontrado'}
             
-            # Generar salt y derivar clave desde password
-            salt = os.urandom(16)
+            # Generar salt (si no se comparte en lote) y derivar clave desde password
+            if salt is None:
+                salt = os.urandom(16)
             clave = self.derivar_clave_desde_password(password, salt)
             
             # Generar nombres de archivo
@@ -94,6 +170,117 @@ class DocumentEncryptor:
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    @instrumented('cipher.encrypt_stored_document')
+    def encrypt_stored_document(self, store, document_hash, password, salt=None):
+        """Cifra un documento del almacén por contenido (document_store) junto a él
+
+        Lee el blob directamente del almacén (sin copiarlo antes) y publica
+        `<hash>.enc` y `<hash>.enc.meta` como artefactos derivados. Una versión
+        cifrada existente no se reemplaza.
+        """
+        try:
+            document_path = store.path(document_hash)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        
+        if salt is None:
+            salt = os.urandom(16)
+        ruta_temporal = store.temp_path(".cifrado_")
+        if not self.cifrar_archivo(document_path, ruta_temporal, self.derivar_clave_desde_password(password, salt)):
+            os.remove(ruta_temporal)
+            return {'success': False, 'error': 'Error en el cifrado'}
+        try:
+            encrypted_path = store.publish_derived(ruta_temporal, document_hash, '.enc')
+        except FileExistsError:
+            return {'success': False, 'error': 'El documento ya tiene una versión cifrada'}
+        
+        ruta_meta = store.temp_path(".meta_")
+        with open(ruta_meta, 'wb') as f:
+            f.write(salt)
+        os.replace(ruta_meta, encrypted_path + '.meta')
+        return {
+            'success': True,
+            'encrypted_path': encrypted_path,
+            'metadata_path': encrypted_path + '.meta'
+        }
+
+    def listar_archivos_lote(self, origen, directorio_salida):
+        """Devuelve [(ruta_origen, ruta_cifrada)] para un directorio o un patrón glob"""
+        if os.path.isdir(origen):
+            base = os.path.abspath(origen)
+            rutas = [os.path.join(raiz, nombre)
+                     for raiz, _, nombres in os.walk(base) for nombre in nombres]
+        else:
+            rutas = [os.path.abspath(r) for r in glob.glob(origen, recursive=True) if os.path.isfile(r)]
+            if not rutas:
+                return []
+            base = os.path.commonpath([os.path.dirname(r) for r in rutas])
+
+        salida = os.path.abspath(directorio_salida)
+        tareas = []
+        for ruta in sorted(rutas):
+            # No volver a cifrar lo que ya está en la carpeta de salida
+            if os.path.commonpath([ruta, salida]) == salida:
+                continue
+            relativo = os.path.relpath(os.path.dirname(ruta), base)
+            nombre = f"encrypted_{os.path.basename(ruta)}.enc"
+            tareas.append((ruta, os.path.normpath(os.path.join(salida, relativo, nombre))))
+        return tareas
+
+    def esta_actualizado(self, document_path, encrypted_path):
+        """Indica si el cifrado existente es más reciente y del tamaño esperado"""
+        try:
+            origen = os.stat(document_path)
+            cifrado = os.stat(encrypted_path)
+        except FileNotFoundError:
+            return False
+        return (os.path.exists(encrypted_path + '.meta')
+                and cifrado.st_mtime >= origen.st_mtime
+                and cifrado.st_size == formato_stream.tamano_cifrado_esperado(origen.st_size))
+
+    @instrumented('cipher.encrypt_batch')
+    def encrypt_batch(self, origen, password, directorio_salida="documentos_cifrados",
+                      workers=None, progreso=None):
+        """Cifra todos los archivos de un directorio o patrón glob en paralelo
+
+        La clave se deriva una sola vez (salt compartido del lote) y los
+        archivos se reparten en un ProcessPoolExecutor de `workers` procesos.
+        `progreso(hechos, total, resultado)` se llama tras cada archivo.
+        Devuelve una lista de dicts como los de encrypt_document.
+        """
+        tareas = self.listar_archivos_lote(origen, directorio_salida)
+        total = len(tareas)
+        resultados = []
+
+        pendientes = []
+        for document_path, output_path in tareas:
+            if self.esta_actualizado(document_path, output_path):
+                resultados.append({
+                    'success': True,
+                    'encrypted_path': output_path,
+                    'metadata_path': output_path + '.meta',
+                    'document_path': document_path,
+                    'skipped': True
+                })
+                if progreso:
+                    progreso(len(resultados), total, resultados[-1])
+            else:
+                pendientes.append((document_path, output_path))
+
+        if pendientes:
+            salt = self.generar_salt_lote()
+            clave = self.derivar_clave_desde_password(password, salt)
+            argumentos = [(doc, out, clave, salt) for doc, out in pendientes]
+            # Agrupar tareas para que el coste de IPC no domine con archivos pequeños
+            chunksize = max(1, min(64, len(argumentos) // ((workers or os.cpu_count() or 1) * 4)))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for resultado in executor.map(_cifrar_archivo_lote, argumentos, chunksize=chunksize):
+                    resultados.append(resultado)
+                    if progreso:
+                        progreso(len(resultados), total, resultado)
+
+        return resultados
+
     def main(self):
         """Función principal para uso independiente"""
         while True:
@@ -123,14 +310,35 @@ class DocumentEncryptor:
 
                 if os.path.exists(ruta_in) and os.path.exists(ruta_clave):
                     clave = self.cargar_clave_aes(ruta_clave)
-                    if clave:
-                        self.cifrar_archivo(ruta_in, ruta_out, clave)
+                    # El resultado se muestra siempre aquí (el log de la librería va en DEBUG)
+                    if clave and self.cifrar_archivo(ruta_in, ruta_out, clave):
+                        print(f"Archivo '{ruta_in}' cifrado exitosamente en: {ruta_out}")
                 else:
                     print("Error: No se encuentra el archivo de entrada o la clave.")
 
             elif opcion == '3':
                 break
 
+def _cifrar_archivo_lote(argumentos):
+    """Cifra un archivo dentro de un proceso del pool de encrypt_batch"""
+    document_path, output_path, clave, salt = argumentos
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        metadata_path = output_path + '.meta'
+        if DocumentEncryptor().cifrar_archivo(document_path, output_path, clave):
+            with open(metadata_path, 'wb') as f:
+                f.write(salt)
+            return {
+                'success': True,
+                'encrypted_path': output_path,
+                'metadata_path': metadata_path,
+                'document_path': document_path,
+                'skipped': False
+            }
+        return {'success': False, 'error': 'Error en el cifrado', 'document_path': document_path}
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'document_path': document_path}
+
 if __name__ == "__main__":
     encryptor = DocumentEncryptor()
     encryptor.main()
\ No newline at end of file
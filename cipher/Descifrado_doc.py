@@ -1,9 +1,27 @@
 import os
-from cryptography.fernet import Fernet, InvalidToken
+import base64
+import tempfile
+from cryptography.fernet import InvalidToken
+from cryptography.exceptions import InvalidSignature, InvalidTag
+from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cipher import formato_stream
+from cipher.cache_claves import cache_sesion
+from metrics import instrumented, tamano_archivo
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# Tamaño de lectura para tokens Fernet heredados (múltiplo de 4 para base64)
+TAMANO_BLOQUE_BASE64 = 1024 * 1024
+TAMANO_HMAC_FERNET = 32
+TAMANO_CABECERA_FERNET = 1 + 8 + 16
 
 class DocumentDecryptor:
-    def __init__(self):
+    def __init__(self, cache_claves=None):
         self.ruta_base = os.path.dirname(os.path.abspath(__file__))
+        self.cache_claves = cache_claves or cache_sesion
 
     def cargar_clave_aes(self, archivo_clave_completo):
         """Carga la clave AES desde un archivo"""
@@ -11,42 +29,165 @@ class DocumentDecryptor:
             with open(archivo_clave_completo, "rb") as f:
                 return f.read()
         except IOError as e:
-            print(f"Error al cargar la clave desde {archivo_clave_completo}: {e}")
+            log.error("Error al cargar la clave desde %s: %s", archivo_clave_completo, e)
             return None
 
+    @instrumented('decipher.derivar_clave')
+    def derivar_clave_desde_password(self, password, salt):
+        """Deriva la clave AES desde una contraseña usando PBKDF2 (con caché de sesión)"""
+        return self.cache_claves.obtener(password, salt)
+
+    def descifrar_stream(self, file_in, file_out, clave, datos_asociados=b""):
+        """Descifra el formato por chunks de un objeto archivo a otro
+
+        `datos_asociados` debe coincidir con los usados al cifrar.
+        """
+        aesgcm = AESGCM(formato_stream.derivar_clave_stream(clave))
+        cabecera, tamano_chunk, prefijo_nonce = formato_stream.leer_cabecera(file_in)
+        aad = cabecera + datos_asociados
+
+        contador = 0
+        longitud = formato_stream.leer_longitud(file_in)
+        while True:
+            if longitud is None:
+                # Se acabó el archivo sin ver el chunk final: truncado
+                raise InvalidToken
+            if longitud < formato_stream.TAMANO_TAG or longitud > tamano_chunk + formato_stream.TAMANO_TAG:
+                raise InvalidToken
+            chunk_cifrado = file_in.read(longitud)
+            if len(chunk_cifrado) != longitud:
+                raise InvalidToken
+
+            # El chunk es el último si no le sigue otro prefijo de longitud
+            siguiente_longitud = formato_stream.leer_longitud(file_in)
+            final = siguiente_longitud is None
+            nonce = formato_stream.construir_nonce(prefijo_nonce, contador, final)
+            try:
+                file_out.write(aesgcm.decrypt(nonce, chunk_cifrado, aad))
+            except InvalidTag:
+                raise InvalidToken
+            if final:
+                return
+            longitud = siguiente_longitud
+            contador += 1
+
+    def _bloques_base64(self, file_in):
+        """Decodifica un archivo base64 (urlsafe) por bloques"""
+        resto = b""
+        for bloque in iter(lambda: file_in.read(TAMANO_BLOQUE_BASE64), b""):
+            bloque = resto + bloque.translate(None, b" \t\r\n")
+            corte = len(bloque) - len(bloque) % 4
+            resto = bloque[corte:]
+            if corte:
+                yield base64.urlsafe_b64decode(bloque[:corte])
+        if resto:
+            raise InvalidToken
+
+    def _descifrar_fernet_stream(self, file_in, file_out, clave):
+        """Descifra un token Fernet heredado sin cargarlo entero en memoria.
+
+        Primera pasada: verifica el HMAC. Segunda pasada: descifra AES-CBC.
+        Así nunca se escribe texto plano que no haya sido autenticado.
+        """
+        clave_bytes = base64.urlsafe_b64decode(clave)
+        if len(clave_bytes) != 32:
+            raise ValueError("La clave Fernet debe ser de 32 bytes codificada en base64")
+        clave_firma, clave_cifrado = clave_bytes[:16], clave_bytes[16:]
+
+        # Pasada 1: HMAC-SHA256 sobre todo el token excepto los últimos 32 bytes
+        h = hmac.HMAC(clave_firma, hashes.SHA256())
+        cola = b""
+        total = 0
+        for datos in self._bloques_base64(file_in):
+            total += len(datos)
+            cola += datos
+            if len(cola) > TAMANO_HMAC_FERNET:
+                h.update(cola[:-TAMANO_HMAC_FERNET])
+                cola = cola[-TAMANO_HMAC_FERNET:]
+        if total < TAMANO_CABECERA_FERNET + TAMANO_HMAC_FERNET:
+            raise InvalidToken
+        try:
+            h.verify(cola)
+        except InvalidSignature:
+            raise InvalidToken
+
+        # Pasada 2: descifrado AES-128-CBC con quitado de relleno PKCS7
+        file_in.seek(0)
+        cabecera = b""
+        pendientes = total - TAMANO_CABECERA_FERNET - TAMANO_HMAC_FERNET
+        descifrador = None
+        desrelleno = padding.PKCS7(algorithms.AES.block_size).unpadder()
+        for datos in self._bloques_base64(file_in):
+            if descifrador is None:
+                cabecera += datos
+                if len(cabecera) < TAMANO_CABECERA_FERNET:
+                    continue
+                if cabecera[0] != 0x80:
+                    raise InvalidToken
+                iv = cabecera[9:TAMANO_CABECERA_FERNET]
+                datos = cabecera[TAMANO_CABECERA_FERNET:]
+                descifrador = Cipher(algorithms.AES(clave_cifrado), modes.CBC(iv)).decryptor()
+            datos = datos[:pendientes]
+            pendientes -= len(datos)
+            if datos:
+                file_out.write(desrelleno.update(descifrador.update(datos)))
+        try:
+            file_out.write(desrelleno.update(descifrador.finalize()) + desrelleno.finalize())
+        except ValueError:
+            raise InvalidToken
+
+    @instrumented('decipher.descifrar_archivo', tamano_archivo(1))
     def descifrar_archivo(self, archivo_entrada_cifrado_completo, archivo_salida_descifrado_completo, clave):
-        """Descifra un archivo usando Fernet"""
-        f = Fernet(clave)
+        """Descifra un archivo (formato por chunks o Fernet heredado) con memoria constante.
+
+        El texto plano se escribe en un temporal junto al destino y solo se
+        renombra cuando el último chunk ha sido verificado.
+        """
+        directorio_salida = os.path.dirname(os.path.abspath(archivo_salida_descifrado_completo))
+        ruta_temporal = None
         try:
+            # La entrada se abre antes de crear el temporal: si no existe no queda
+            # ni descriptor abierto ni archivo huérfano
             with open(archivo_entrada_cifrado_completo, "rb") as file_in:
-                datos_cifrados = file_in.read()
-                
-            datos_descifrados = f.decrypt(datos_cifrados)
+                fd, ruta_temporal = tempfile.mkstemp(prefix=".descifrando_", dir=directorio_salida)
+                with os.fdopen(fd, "wb") as file_out:
+                    es_stream = formato_stream.es_formato_stream(file_in.read(len(formato_stream.MAGIC)))
+                    file_in.seek(0)
+                    
+                    if es_stream:
+                        self.descifrar_stream(file_in, file_out, clave)
+                    else:
+                        # Archivos .enc antiguos: un único token Fernet
+                        self._descifrar_fernet_stream(file_in, file_out, clave)
+                    file_out.flush()
+                    os.fsync(file_out.fileno())
             
-            with open(archivo_salida_descifrado_completo, "wb") as file_out:
-                file_out.write(datos_descifrados)
-                
-            print(f"Archivo descifrado exitosamente en: {archivo_salida_descifrado_completo}")
+            os.replace(ruta_temporal, archivo_salida_descifrado_completo)
+            log.debug("Archivo descifrado exitosamente en: %s", archivo_salida_descifrado_completo)
             return True
             
         except InvalidToken:
-            print("ERROR CRÍTICO: La clave es incorrecta o el archivo ha sido manipulado.")
+            log.error("ERROR CRÍTICO: La clave es incorrecta o el archivo ha sido manipulado.", archivo=archivo_entrada_cifrado_completo)
             return False
         except Exception as e:
-            print(f"Error inesperado: {e}")
+            log.error("Error inesperado descifrando %s: %s", archivo_entrada_cifrado_completo, e)
             return False
+        finally:
+            if ruta_temporal is not None and os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
 
+    @instrumented('decipher.decrypt_document', tamano_archivo(1))
     def decrypt_document(self, encrypted_path, metadata_path, password):
         """Método unificado para descifrar documentos - compatible con app_console"""
         try:
-            # Para compatibilidad con el sistema principal
-            # En este caso simple, usamos la contraseña directamente
-            clave = Fernet.generate_key()  # Esto no es seguro, solo para demo
-            # En un sistema real, deberías derivar una clave de la contraseña
-            
             if not os.path.exists(encrypted_path):
                 return {'success': False, 'error': 'Archivo cifrado no encontrado'}
             
+            # Derivar la clave desde la contraseña y el salt guardado en los metadatos
+            with open(metadata_path, 'rb') as f:
+                salt = f.read()
+            clave = self.derivar_clave_desde_password(password, salt)
+            
             # Generar nombre de salida
             output_path = f"decrypted_{os.path.basename(encrypted_path).replace('.enc', '')}"
             
@@ -80,8 +221,9 @@ class DocumentDecryptor:
         
         if os.path.exists(ruta_in) and os.path.exists(ruta_clave):
             clave = self.cargar_clave_aes(ruta_clave)
-            if clave:
-                self.descifrar_archivo(ruta_in, ruta_out, clave)
+            # El resultado se muestra siempre aquí (el log de la librería va en DEBUG)
+            if clave and self.descifrar_archivo(ruta_in, ruta_out, clave):
+                print(f"Archivo descifrado exitosamente en: {ruta_out}")
         else:
             print("Error: Falta el archivo cifrado o la clave.")
 
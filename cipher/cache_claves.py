@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from metrics import instrumented
+
+ITERACIONES_PBKDF2 = 100000
+LONGITUD_CLAVE = 32
+
+
+class DerivedKeyCache:
+    """Caché de sesión para claves derivadas con PBKDF2.
+
+    Las entradas se indexan por un hash de (password, salt, parámetros), así
+    que la contraseña nunca se guarda. Al expulsar una entrada (por TTL, por
+    capacidad o al vaciar) su clave se sobrescribe con ceros.
+    """
+
+    def __init__(self, max_entradas=32, ttl_segundos=900):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _clave_cache(self, password, salt, iteraciones, longitud):
+        h = hashlib.sha256()
+        for parte in (b"pbkdf2-sha256", password.encode(), salt,
+                      str(iteraciones).encode(), str(longitud).encode()):
+            h.update(len(parte).to_bytes(4, "big"))
+            h.update(parte)
+        return h.digest()
+
+    def _borrar(self, clave_cache):
+        clave, _ = self._entradas.pop(clave_cache)
+        for i in range(len(clave)):
+            clave[i] = 0
+
+    def _expulsar_caducadas(self, ahora):
+        caducadas = [k for k, (_, expira) in self._entradas.items() if expira <= ahora]
+        for k in caducadas:
+            self._borrar(k)
+
+    def obtener(self, password, salt, iteraciones=ITERACIONES_PBKDF2, longitud=LONGITUD_CLAVE):
+        """Devuelve la clave derivada (base64 urlsafe), derivándola solo si no está en caché"""
+        clave_cache = self._clave_cache(password, salt, iteraciones, longitud)
+        ahora = time.monotonic()
+        with self._lock:
+            self._expulsar_caducadas(ahora)
+            entrada = self._entradas.get(clave_cache)
+            if entrada is not None:
+                self._entradas.move_to_end(clave_cache)
+                self.aciertos += 1
+                return base64.urlsafe_b64encode(bytes(entrada[0]))
+            self.fallos += 1
+
+        # La derivación se hace fuera del lock para no bloquear otros hilos
+        clave = bytearray(derivar_clave_pbkdf2(password, salt, iteraciones, longitud))
+        with self._lock:
+            if clave_cache in self._entradas:
+                self._borrar(clave_cache)
+            self._entradas[clave_cache] = (clave, ahora + self.ttl_segundos)
+            while len(self._entradas) > self.max_entradas:
+                self._borrar(next(iter(self._entradas)))
+            return base64.urlsafe_b64encode(bytes(clave))
+
+    def vaciar(self):
+        """Elimina (y pone a cero) todas las claves de la caché"""
+        with self._lock:
+            for k in list(self._entradas):
+                self._borrar(k)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._entradas)
+            }
+
+
+@instrumented('kdf.pbkdf2')
+def derivar_clave_pbkdf2(password, salt, iteraciones=ITERACIONES_PBKDF2, longitud=LONGITUD_CLAVE):
+    """Deriva una clave en bruto desde una contraseña usando PBKDF2-HMAC-SHA256"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=longitud,
+        salt=salt,
+        iterations=iteraciones,
+    )
+    return kdf.derive(password.encode())
+
+
+# Caché compartida por todo el proceso (una sesión de consola o un worker)
+cache_sesion = DerivedKeyCache()
@@ -1,7 +1,17 @@
 import os
 import base64
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cipher import formato_sobre
+from cipher.Cifrado_doc import DocumentEncryptor
+from sign.key_registry import public_key_registry, public_key_fingerprint
+from metrics import instrumented, tamano_archivo, longitud_argumento
+from structured_logging import get_logger
+
+log = get_logger(__name__)
 
 class KeyEncryptor:
     def __init__(self):
@@ -13,11 +23,11 @@ class KeyEncryptor:
             with open(archivo_publico_completo, "rb") as f:
                 clave_publica = serialization.load_pem_public_key(f.read())
             if not isinstance(clave_publica, rsa.RSAPublicKey):
-                print(f"Error: El archivo {archivo_publico_completo} no contiene una clave pública RSA válida.")
+                log.error("Error: El archivo %s no contiene una clave pública RSA válida.", archivo_publico_completo)
                 return None
             return clave_publica
         except Exception as e:
-            print(f"Error al cargar la clave pública RSA desde {archivo_publico_completo}: {e}")
+            log.error("Error al cargar la clave pública RSA desde %s: %s", archivo_publico_completo, e)
             return None
 
     def cargar_clave_aes(self, archivo_clave_completo):
@@ -26,25 +36,31 @@ class KeyEncryptor:
             with open(archivo_clave_completo, "rb") as f:
                 return f.read()
         except IOError as e:
-            print(f"Error al cargar la clave AES desde {archivo_clave_completo}: {e}")
+            log.error("Error al cargar la clave AES desde %s: %s", archivo_clave_completo, e)
             return None
 
+    @instrumented('keywrap.envolver_clave')
+    def _envolver_clave(self, clave_aes_bytes, clave_publica_rsa):
+        """RSA-OAEP (SHA-256) sin salida por consola, para uso en lote"""
+        return clave_publica_rsa.encrypt(
+            clave_aes_bytes,
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        )
+
+    @instrumented('keywrap.cifrar_clave', longitud_argumento(1))
     def cifrar_clave(self, clave_aes_bytes, clave_publica_rsa):
         """Cifra una clave AES usando RSA-OAEP"""
-        print("Cifrando clave AES con RSA-OAEP...")
+        log.debug("Cifrando clave AES con RSA-OAEP...")
         try:
-            ciphertext_bytes = clave_publica_rsa.encrypt(
-                clave_aes_bytes,
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
-            print("Cifrado RSA-OAEP exitoso.")
+            ciphertext_bytes = self._envolver_clave(clave_aes_bytes, clave_publica_rsa)
+            log.debug("Cifrado RSA-OAEP exitoso.")
             return ciphertext_bytes
         except Exception as e:
-            print(f"Error durante el cifrado RSA-OAEP: {e}")
+            log.error("Error durante el cifrado RSA-OAEP: %s", e)
             return None
 
     def guardar_clave(self, datos_cifrados_bytes, archivo_salida_completo):
@@ -55,9 +71,88 @@ class KeyEncryptor:
             
             with open(archivo_salida_completo, "w") as f:
                 f.write(ciphertext_b64)
-            print(f"Clave cifrada (en Base64) guardada en: {archivo_salida_completo}")
+            log.info("Clave cifrada (en Base64) guardada en: %s", archivo_salida_completo)
         except IOError as e:
-            print(f"Error al guardar el archivo de clave cifrada: {e}")
+            log.error("Error al guardar el archivo de clave cifrada: %s", e)
+
+    @instrumented('keywrap.crear_sobre', tamano_archivo(1))
+    def crear_sobre(self, document_path, output_path, destinatarios, max_workers=8):
+        """Cifra un documento una vez y envuelve su clave para N destinatarios
+
+        `destinatarios` es {user_id: llave pública (objeto o PEM)}. Las
+        llaves que no son RSA se omiten (no admiten OAEP) y se devuelven en
+        'skipped'. El resultado es un único archivo con un índice de
+        destinatarios por huella SHA-256.
+        """
+        try:
+            if not os.path.exists(document_path):
+                return {'success': False, 'error': 'Archivo no encontrado'}
+
+            llaves = {}
+            omitidos = []
+            for user_id, llave in destinatarios.items():
+                if not llave:
+                    omitidos.append(user_id)
+                    continue
+                if isinstance(llave, (str, bytes)):
+                    llave = public_key_registry.parse_pem(llave)[0]
+                if isinstance(llave, rsa.RSAPublicKey):
+                    llaves[user_id] = llave
+                else:
+                    omitidos.append(user_id)
+            if not llaves:
+                return {'success': False, 'error': 'No hay destinatarios con llave pública RSA'}
+            if omitidos:
+                log.warning("Destinatarios omitidos del sobre (sin llave pública RSA): %s", ", ".join(omitidos))
+
+            # Una sola clave de contenido, envuelta en paralelo para cada destinatario
+            clave_contenido = Fernet.generate_key()
+
+            def envolver(item):
+                user_id, llave = item
+                return public_key_fingerprint(llave), {
+                    'user_id': user_id,
+                    'wrapped_key': base64.b64encode(self._envolver_clave(clave_contenido, llave)).decode('utf-8')
+                }
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                recipients = dict(executor.map(envolver, llaves.items()))
+
+            directorio_salida = os.path.dirname(os.path.abspath(output_path))
+            ruta_temporal = None
+            try:
+                # Abrir el documento antes de crear el temporal (entrada inexistente: nada que limpiar)
+                with open(document_path, 'rb') as file_in:
+                    fd, ruta_temporal = tempfile.mkstemp(prefix=".sobre_", dir=directorio_salida)
+                    with os.fdopen(fd, 'wb') as file_out:
+                        datos_asociados = formato_sobre.escribir_indice(file_out, recipients)
+                        # El payload se cifra una sola vez, por chunks, autenticando el índice
+                        DocumentEncryptor().cifrar_stream(
+                            file_in, file_out, clave_contenido, datos_asociados=datos_asociados
+                        )
+                os.replace(ruta_temporal, output_path)
+            finally:
+                if ruta_temporal is not None and os.path.exists(ruta_temporal):
+                    os.remove(ruta_temporal)
+
+            return {
+                'success': True,
+                'envelope_path': output_path,
+                'recipients': sorted(r['user_id'] for r in recipients.values()),
+                'skipped': omitidos
+            }
+
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def crear_sobre_para_celula(self, document_path, output_path, celula_name, max_workers=8):
+        """Crea un sobre para todos los miembros de una célula del directorio de empleados"""
+        from mock_data import get_repository
+        miembros = get_repository().get_celula(celula_name)
+        if not miembros:
+            return {'success': False, 'error': f'Célula no encontrada: {celula_name}'}
+        destinatarios = {m['id']: m.get('public_key') for m in miembros}
+        return self.crear_sobre(document_path, output_path, destinatarios, max_workers)
 
     def encrypt_key(self, key_path, password):
         """Método unificado para cifrar llaves - compatible con app_console"""
@@ -1,7 +1,16 @@
 import os
 import base64
+import tempfile
+from cryptography.fernet import InvalidToken
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cipher import formato_sobre
+from cipher.Descifrado_doc import DocumentDecryptor
+from sign.key_registry import public_key_fingerprint
+from metrics import instrumented, tamano_archivo
+from structured_logging import get_logger
+
+log = get_logger(__name__)
 
 class KeyDecryptor:
     def __init__(self):
@@ -13,11 +22,11 @@ class KeyDecryptor:
             with open(archivo_privado_completo, "rb") as f:
                 clave_privada = serialization.load_pem_private_key(f.read(), password=None)
             if not isinstance(clave_privada, rsa.RSAPrivateKey):
-                print(f"Error: El archivo {archivo_privado_completo} no contiene una clave privada RSA válida.")
+                log.error("Error: El archivo %s no contiene una clave privada RSA válida.", archivo_privado_completo)
                 return None
             return clave_privada
         except Exception as e:
-            print(f"Error al cargar la clave privada RSA desde {archivo_privado_completo}: {e}")
+            log.error("Error al cargar la clave privada RSA desde %s: %s", archivo_privado_completo, e)
             return None
 
     def cargar_clave_cifrada(self, archivo_clave_cifrada_completo):
@@ -28,7 +37,7 @@ class KeyDecryptor:
             # Decodifica de Base64 a bytes brutos
             return base64.b64decode(ciphertext_b64)
         except Exception as e:
-            print(f"Error al cargar o decodificar la clave cifrada desde {archivo_clave_cifrada_completo}: {e}")
+            log.error("Error al cargar o decodificar la clave cifrada desde %s: %s", archivo_clave_cifrada_completo, e)
             return None
 
     def guardar_clave_aes(self, clave_bytes, archivo_salida_completo):
@@ -36,32 +45,83 @@ class KeyDecryptor:
         try:
             with open(archivo_salida_completo, "wb") as f:
                 f.write(clave_bytes)
-            print(f"Clave AES descifrada guardada exitosamente en: {archivo_salida_completo}")
+            log.info("Clave AES descifrada guardada exitosamente en: %s", archivo_salida_completo)
         except IOError as e:
-            print(f"Error al guardar la clave AES en {archivo_salida_completo}: {e}")
+            log.error("Error al guardar la clave AES en %s: %s", archivo_salida_completo, e)
 
+    @instrumented('keywrap.descifrar_clave')
     def descifrar_clave(self, clave_cifrada_bytes, clave_privada_rsa):
         """Descifra una clave AES usando RSA-OAEP"""
-        print("Descifrando clave AES con RSA-OAEP...")
+        log.debug("Descifrando clave AES con RSA-OAEP...")
         try:
-            # El padding DEBE ser idéntico al usado para cifrar
-            oaep_padding = padding.OAEP(
+            # Descifra usando la clave privada (mismo padding OAEP que al cifrar)
+            clave_aes_bytes = self._desenvolver_clave(clave_cifrada_bytes, clave_privada_rsa)
+            log.debug("Descifrado RSA-OAEP exitoso.")
+            return clave_aes_bytes
+        except Exception as e:
+            # Esto puede fallar si la clave privada es incorrecta o los datos están corruptos
+            log.error("Error durante el descifrado RSA-OAEP: %s. ¿Es la clave privada correcta?", e)
+            return None
+
+    @instrumented('keywrap.desenvolver_clave')
+    def _desenvolver_clave(self, clave_cifrada_bytes, clave_privada_rsa):
+        """RSA-OAEP (SHA-256) sin salida por consola"""
+        return clave_privada_rsa.decrypt(
+            clave_cifrada_bytes,
+            padding.OAEP(
                 mgf=padding.MGF1(algorithm=hashes.SHA256()),
                 algorithm=hashes.SHA256(),
                 label=None
             )
-            
-            # Descifra usando la clave privada
-            clave_aes_bytes = clave_privada_rsa.decrypt(
-                clave_cifrada_bytes,
-                oaep_padding
-            )
-            print("Descifrado RSA-OAEP exitoso.")
-            return clave_aes_bytes
+        )
+
+    def buscar_ranura(self, indice, clave_privada_rsa):
+        """Devuelve la entrada del índice del sobre que corresponde a esta llave (o None)"""
+        huella = public_key_fingerprint(clave_privada_rsa.public_key())
+        return indice.get('recipients', {}).get(huella)
+
+    def obtener_clave_de_sobre(self, file_in, clave_privada_rsa):
+        """Lee el índice de un sobre y desenvuelve solo la ranura propia.
+
+        Deja file_in al inicio del payload. Una sola operación RSA por
+        apertura, sin importar cuántos destinatarios tenga el sobre.
+        Devuelve (clave de contenido, datos asociados para el payload).
+        """
+        indice, datos_asociados = formato_sobre.leer_indice(file_in)
+        ranura = self.buscar_ranura(indice, clave_privada_rsa)
+        if ranura is None:
+            raise ValueError("❌ Esta llave no es destinataria del sobre")
+        clave = self._desenvolver_clave(base64.b64decode(ranura['wrapped_key']), clave_privada_rsa)
+        return clave, datos_asociados
+
+    @instrumented('keywrap.abrir_sobre', tamano_archivo(1))
+    def abrir_sobre(self, envelope_path, clave_privada_rsa, output_path):
+        """Descifra un sobre multi-destinatario con la llave privada del receptor"""
+        try:
+            directorio_salida = os.path.dirname(os.path.abspath(output_path))
+            ruta_temporal = None
+            try:
+                # Abrir el sobre antes de crear el temporal (entrada inexistente: nada que limpiar)
+                with open(envelope_path, 'rb') as file_in:
+                    fd, ruta_temporal = tempfile.mkstemp(prefix=".descifrando_", dir=directorio_salida)
+                    with os.fdopen(fd, 'wb') as file_out:
+                        clave_contenido, datos_asociados = self.obtener_clave_de_sobre(file_in, clave_privada_rsa)
+                        # El payload (y con él el índice) se verifica chunk a chunk;
+                        # se publica solo si todo es válido
+                        DocumentDecryptor().descifrar_stream(
+                            file_in, file_out, clave_contenido, datos_asociados=datos_asociados
+                        )
+                os.replace(ruta_temporal, output_path)
+            finally:
+                if ruta_temporal is not None and os.path.exists(ruta_temporal):
+                    os.remove(ruta_temporal)
+
+            return {'success': True, 'decrypted_path': output_path}
+
+        except InvalidToken:
+            return {'success': False, 'error': 'El sobre ha sido manipulado o la clave no corresponde'}
         except Exception as e:
-            # Esto puede fallar si la clave privada es incorrecta o los datos están corruptos
-            print(f"Error durante el descifrado RSA-OAEP: {e}. ¿Es la clave privada correcta?")
-            return None
+            return {'success': False, 'error': str(e)}
 
     def decrypt_key(self, encrypted_file, metadata_file, password):
         """Método unificado para descifrar llaves - compatible con app_console"""
@@ -0,0 +1,55 @@
+import json
+import struct
+
+# Sobre multi-destinatario en un solo archivo:
+#   MAGIC(4) | version(1) | longitud_indice(4) | indice JSON | payload
+# El índice es {'recipients': {huella_sha256_spki: {'user_id', 'wrapped_key'}}}
+# y el payload es el documento cifrado una sola vez en formato_stream con la
+# clave de contenido. Cada destinatario localiza su clave envuelta por huella.
+# Cabecera e índice van como datos asociados de cada chunk del payload, así
+# que quitar destinatarios o cambiar su user_id invalida el sobre.
+MAGIC = b"OFAE"
+VERSION = 2
+ALG_ENVOLTURA = 'RSA-OAEP-SHA256'
+
+_CABECERA = struct.Struct(">4sBI")
+TAMANO_CABECERA = _CABECERA.size
+
+
+def es_sobre(primeros_bytes):
+    """Indica si los bytes iniciales corresponden a un sobre multi-destinatario"""
+    return primeros_bytes[:len(MAGIC)] == MAGIC
+
+
+def escribir_indice(file_out, recipients):
+    """Escribe la cabecera y el índice de destinatarios; devuelve los bytes escritos
+
+    Esos bytes son los datos asociados con los que debe cifrarse el payload.
+    """
+    indice = json.dumps({
+        'alg': ALG_ENVOLTURA,
+        'recipients': recipients
+    }, separators=(',', ':')).encode('utf-8')
+    datos = _CABECERA.pack(MAGIC, VERSION, len(indice)) + indice
+    file_out.write(datos)
+    return datos
+
+
+def leer_indice(file_in):
+    """Lee cabecera e índice; deja file_in posicionado al inicio del payload
+
+    Devuelve (indice, datos_asociados): el índice aún no está autenticado
+    hasta que el payload se descifre con esos datos asociados.
+    """
+    cabecera = file_in.read(TAMANO_CABECERA)
+    if len(cabecera) != TAMANO_CABECERA:
+        raise ValueError("❌ Sobre truncado")
+    magic, version, longitud = _CABECERA.unpack(cabecera)
+    if magic != MAGIC:
+        raise ValueError("❌ El archivo no es un sobre multi-destinatario válido")
+    if version != VERSION:
+        raise ValueError(f"❌ Versión de sobre no soportada: {version}")
+    datos = file_in.read(longitud)
+    if len(datos) != longitud:
+        raise ValueError("❌ Sobre truncado")
+    return json.loads(datos.decode('utf-8')), cabecera + datos
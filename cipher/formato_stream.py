@@ -0,0 +1,85 @@
+import base64
+import struct
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Formato binario por chunks:
+#   cabecera = MAGIC(4) | version(1) | tamano_chunk(4) | prefijo_nonce(7)
+#   chunk    = longitud(4) | AES-256-GCM(chunk) + tag(16)
+# El nonce de cada chunk es prefijo(7) | contador(4) | bandera_final(1), y la
+# cabecera completa va como datos asociados, así que reordenar, truncar o
+# cambiar la cabecera invalida el tag.
+MAGIC = b"OFAC"
+VERSION = 1
+TAMANO_CHUNK_DEFECTO = 1024 * 1024
+TAMANO_TAG = 16
+TAMANO_PREFIJO_NONCE = 7
+MAX_CHUNKS = 2 ** 32
+
+_CABECERA = struct.Struct(">4sBI7s")
+_LONGITUD = struct.Struct(">I")
+TAMANO_CABECERA = _CABECERA.size
+TAMANO_LONGITUD = _LONGITUD.size
+
+
+def es_formato_stream(primeros_bytes):
+    """Indica si los bytes iniciales corresponden al formato por chunks"""
+    return primeros_bytes[:len(MAGIC)] == MAGIC
+
+
+def derivar_clave_stream(clave):
+    """Deriva la clave AES-256-GCM a partir de una clave estilo Fernet (base64 de 32 bytes)"""
+    clave_bytes = base64.urlsafe_b64decode(clave)
+    if len(clave_bytes) != 32:
+        raise ValueError("La clave debe ser de 32 bytes codificada en base64")
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"OFAC stream v1",
+    )
+    return hkdf.derive(clave_bytes)
+
+
+def empaquetar_cabecera(tamano_chunk, prefijo_nonce):
+    """Construye la cabecera fija del archivo cifrado"""
+    return _CABECERA.pack(MAGIC, VERSION, tamano_chunk, prefijo_nonce)
+
+
+def leer_cabecera(file_in):
+    """Lee y valida la cabecera; devuelve (cabecera, tamano_chunk, prefijo_nonce)"""
+    cabecera = file_in.read(TAMANO_CABECERA)
+    if len(cabecera) != TAMANO_CABECERA:
+        raise InvalidToken
+    magic, version, tamano_chunk, prefijo_nonce = _CABECERA.unpack(cabecera)
+    if magic != MAGIC or version != VERSION or tamano_chunk == 0:
+        raise InvalidToken
+    return cabecera, tamano_chunk, prefijo_nonce
+
+
+def construir_nonce(prefijo_nonce, contador, final):
+    """Nonce de 12 bytes para el chunk número `contador`"""
+    if contador >= MAX_CHUNKS:
+        raise ValueError("El archivo excede el número máximo de chunks")
+    return prefijo_nonce + contador.to_bytes(4, "big") + (b"\x01" if final else b"\x00")
+
+
+def empaquetar_longitud(longitud):
+    return _LONGITUD.pack(longitud)
+
+
+def leer_longitud(file_in):
+    """Lee el prefijo de longitud de un chunk; None si se llegó al final"""
+    datos = file_in.read(TAMANO_LONGITUD)
+    if not datos:
+        return None
+    if len(datos) != TAMANO_LONGITUD:
+        raise InvalidToken
+    return _LONGITUD.unpack(datos)[0]
+
+
+def tamano_cifrado_esperado(tamano_original, tamano_chunk=TAMANO_CHUNK_DEFECTO):
+    """Tamaño exacto que tendrá un archivo de `tamano_original` bytes una vez cifrado"""
+    num_chunks = max(1, -(-tamano_original // tamano_chunk))
+    return TAMANO_CABECERA + tamano_original + num_chunks * (TAMANO_LONGITUD + TAMANO_TAG)
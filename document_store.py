@@ -0,0 +1,226 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# Tamaño de lectura al copiar/hashear documentos hacia el almacén
+TAMANO_BUFFER = 1024 * 1024
+
+class DocumentTooLargeError(ValueError):
+    """El documento supera el tamaño máximo permitido al escribirlo en el almacén"""
+
+
+class DocumentStore:
+    """Almacén local de documentos direccionado por contenido (SHA-256).
+
+    Cada documento vive en <raiz>/<hh>/<hh>/<sha256>, así que buscarlo por
+    hash es O(1) y subir dos veces el mismo contenido no duplica bytes.
+    Las escrituras van a un temporal dentro del almacén, se sincronizan a
+    disco y se publican con un rename atómico.
+    """
+
+    def __init__(self, root="document_store"):
+        self.root = os.path.abspath(root)
+        self._tmp = os.path.join(self.root, "tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def path_for(self, document_hash):
+        """Ruta donde vive (o viviría) un documento con ese hash"""
+        document_hash = document_hash.lower()
+        if len(document_hash) != 64 or any(c not in "0123456789abcdef" for c in document_hash):
+            raise ValueError(f"❌ Hash SHA-256 inválido: {document_hash}")
+        return os.path.join(self.root, document_hash[:2], document_hash[2:4], document_hash)
+
+    def exists(self, document_hash):
+        return os.path.exists(self.path_for(document_hash))
+
+    def path(self, document_hash):
+        """Ruta del documento almacenado; ValueError si no existe"""
+        ruta = self.path_for(document_hash)
+        if not os.path.exists(ruta):
+            raise ValueError(f"❌ Documento no encontrado en el almacén: {document_hash}")
+        return ruta
+
+    def open(self, document_hash):
+        return open(self.path(document_hash), 'rb')
+
+    def open_writer(self, max_bytes=None, on_chunk=None):
+        """Escritor incremental hacia el almacén (ver StoreWriter)"""
+        return StoreWriter(self, max_bytes=max_bytes, on_chunk=on_chunk)
+
+    def put_stream(self, file_in, on_chunk=None, max_bytes=None):
+        """Copia un stream al almacén calculando el hash en la misma pasada.
+
+        `on_chunk(datos)` se llama con cada bloque (p. ej. para cifrar a la
+        vez). Si se supera `max_bytes` se aborta con DocumentTooLargeError sin dejar
+        nada en el almacén. Devuelve (document_hash, tamaño).
+        """
+        writer = self.open_writer(max_bytes=max_bytes, on_chunk=on_chunk)
+        try:
+            for datos in iter(lambda: file_in.read(TAMANO_BUFFER), b""):
+                writer.write(datos)
+            return writer.commit()
+        finally:
+            writer.abort()
+
+    def temp_path(self, prefix=".tmp_"):
+        """Ruta temporal dentro del almacén (mismo sistema de archivos que los documentos)"""
+        fd, ruta = tempfile.mkstemp(prefix=prefix, dir=self._tmp)
+        os.close(fd)
+        return ruta
+
+    def derived_path(self, document_hash, suffix):
+        """Ruta de un artefacto derivado del documento (p. ej. su versión cifrada)"""
+        ruta = self.path_for(document_hash) + suffix
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        return ruta
+
+    def publish_derived(self, ruta_temporal, document_hash, suffix):
+        """Publica un artefacto derivado ya escrito en `ruta_temporal` sin reemplazar uno existente
+
+        Lanza FileExistsError si el artefacto ya existe (p. ej. el mismo
+        contenido ya se cifró con otra contraseña). El temporal se elimina siempre.
+        """
+        destino = self.derived_path(document_hash, suffix)
+        try:
+            try:
+                # link() falla si el destino existe: publicación exclusiva y atómica
+                os.link(ruta_temporal, destino)
+            except FileExistsError:
+                raise
+            except OSError:
+                with open(ruta_temporal, 'rb') as origen, open(destino, 'xb') as copia:
+                    shutil.copyfileobj(origen, copia)
+                    copia.flush()
+                    os.fsync(copia.fileno())
+        finally:
+            os.remove(ruta_temporal)
+        self._fsync_dir(os.path.dirname(destino))
+        return destino
+
+    def _publicar(self, ruta_temporal, document_hash):
+        """Mueve un temporal ya sincronizado a su dirección definitiva (si no existe)"""
+        destino = self.path_for(document_hash)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(ruta_temporal, destino)
+            self._fsync_dir(os.path.dirname(destino))
+
+    def put_file(self, file_path):
+        """Guarda un archivo en el almacén y devuelve su hash"""
+        with open(file_path, 'rb') as file_in:
+            return self.put_stream(file_in)[0]
+
+    def put_bytes(self, datos):
+        return self.put_stream(io.BytesIO(datos))[0]
+
+    def named_link(self, document_hash, file_name):
+        """Crea un enlace con nombre legible al documento (sin copiar bytes).
+
+        Devuelve la ruta del enlace; quien la pide debe borrarla al terminar.
+        Si el sistema de archivos no admite enlaces duros se usa una copia.
+        """
+        origen = self.path(document_hash)
+        directorio = tempfile.mkdtemp(prefix=".nombre_", dir=self._tmp)
+        destino = os.path.join(directorio, os.path.basename(file_name) or document_hash)
+        try:
+            os.link(origen, destino)
+        except OSError:
+            shutil.copyfile(origen, destino)
+        return destino
+
+    def release_link(self, link_path):
+        """Elimina un enlace creado con named_link"""
+        if os.path.exists(link_path):
+            os.remove(link_path)
+        directorio = os.path.dirname(link_path)
+        if os.path.dirname(directorio) == self._tmp and os.path.isdir(directorio):
+            os.rmdir(directorio)
+
+    def _fsync_dir(self, directorio):
+        # Persistir la entrada del directorio tras el rename (no aplica en Windows)
+        if os.name == 'nt':
+            return
+        fd = os.open(directorio, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+
+class StoreWriter:
+    """Escritura incremental de un documento en el almacén.
+
+    Se comporta como un archivo de solo escritura: cada `write` actualiza el
+    hash, aplica el límite de tamaño y reenvía el bloque a `on_chunk`, así
+    que puede usarse directamente como destino del parser multipart de
+    werkzeug. `commit()` sincroniza y publica el documento bajo su hash;
+    `abort()` descarta lo escrito (no hace nada tras un commit).
+    """
+
+    def __init__(self, store, max_bytes=None, on_chunk=None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.on_chunk = on_chunk
+        self.tamano = 0
+        self.document_hash = None
+        self._sha256 = hashlib.sha256()
+        fd, self._ruta_temporal = tempfile.mkstemp(prefix=".subida_", dir=store._tmp)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, datos):
+        self.tamano += len(datos)
+        if self.max_bytes is not None and self.tamano > self.max_bytes:
+            raise DocumentTooLargeError(f"❌ El documento supera el tamaño máximo de {self.max_bytes} bytes")
+        self._sha256.update(datos)
+        self._file.write(datos)
+        if self.on_chunk:
+            self.on_chunk(datos)
+        return len(datos)
+
+    def seek(self, offset, whence=0):
+        # El parser multipart rebobina al terminar la parte; aquí no hay nada que releer
+        return self.tamano
+
+    def tell(self):
+        return self.tamano
+
+    def flush(self):
+        self._file.flush()
+
+    def commit(self):
+        """Publica el documento; devuelve (document_hash, tamaño)"""
+        if self.document_hash is None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self.document_hash = self._sha256.hexdigest()
+            self.store._publicar(self._ruta_temporal, self.document_hash)
+            self.abort()
+        return self.document_hash, self.tamano
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        # Si el contenido ya existía (o hubo error) el temporal sobra
+        if os.path.exists(self._ruta_temporal):
+            os.remove(self._ruta_temporal)
+
+    def close(self):
+        if self.document_hash is None:
+            self.abort()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_document_store(root="document_store"):
+    """Almacén compartido por proceso para un directorio raíz"""
+    ruta = os.path.abspath(root)
+    with _stores_lock:
+        if ruta not in _stores:
+            _stores[ruta] = DocumentStore(ruta)
+        return _stores[ruta]
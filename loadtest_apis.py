@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import time
+import logging
+import uuid
+import base64
+import random
+import argparse
+import tempfile
+import threading
+import types
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+from concurrent.futures import ThreadPoolExecutor
+
+# Prueba de carga de las APIs de aw_dir (director) y aw_emp (empleados).
+# Levanta ambas apps en hilos locales con un signverify/GitHub simulado
+# (criptografía real, latencia de red configurable) y las castiga con una
+# mezcla ponderada de peticiones. Ejemplos:
+#   python loadtest_apis.py --concurrency 32 --duration 20
+#   python loadtest_apis.py --mix dir:get-celulas=1,emp:create-signature=1 --output carga.json
+
+OPERACIONES = {
+    'emp:login': 2,
+    'dir:login': 1,
+    'dir:get-celulas': 4,
+    'emp:create-signature': 3,
+    'dir:publish-document': 1,
+    'dir:verify-document-signatures': 3
+}
+# Límites superiores (ms) de los cubos del histograma de latencia
+CUBOS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+
+class StubSignVerify:
+    """Sustituto de sign.mainhearth.signverify con la superficie que usan las apps
+
+    Usa las llaves y firmas reales de sign/ (el coste criptográfico es el de
+    producción) y simula GitHub en memoria con `github_latency` segundos de
+    espera por llamada. El estado publicado se comparte entre instancias,
+    como lo haría el repositorio remoto.
+    """
+
+    github_latency = 0.05
+    firmas_por_documento = 5
+    _publicados = {}
+    _firmantes = []
+    _lock = threading.Lock()
+
+    def __init__(self, user_id, token=None, github_config=None):
+        from sign.key_generator import KeyGenerator
+        self.user_id = user_id
+        self.github_enabled = github_config is not None
+        self.key_gen = KeyGenerator(user_id)
+        self.private_key = None
+        self.public_key = None
+        self.team_public_keys = self.key_gen.team_public_keys
+        self.symmetric_keys = {}
+        self.published_documents = StubSignVerify._publicados
+        self.github_mgr = self
+
+    def _sincronizar_llaves(self):
+        self.private_key = self.key_gen.private_key
+        self.public_key = self.key_gen.public_key
+
+    def load_privk(self, user_id):
+        cargada = self.key_gen.load_private_key(user_id)
+        self._sincronizar_llaves()
+        return cargada
+
+    def generate_key_pair(self):
+        public_key_pem = self.key_gen.generate_key_pair()
+        self._sincronizar_llaves()
+        return public_key_pem
+
+    gen_kpair = generate_key_pair
+
+    def get_public_key_pem(self):
+        return self.key_gen.get_public_key_pem()
+
+    def add_team_member_public_key(self, member_id, public_key_pem):
+        return self.key_gen.add_team_member_public_key(member_id, public_key_pem)
+
+    def create_signature(self, message):
+        from sign.algorithms import get_backend_for_key
+        backend = get_backend_for_key(self.private_key)
+        return base64.b64encode(backend.sign(self.private_key, message.encode('utf-8'))).decode('utf-8')
+
+    def get_available_teams(self, user_id):
+        from mock_data import load_employee_data
+        return list(load_employee_data().keys())
+
+    def get_published_documents(self, user_id):
+        return dict(self.published_documents)
+
+    @classmethod
+    def _obtener_firmantes(cls):
+        """Llaves de firmantes simulados (se generan una vez por proceso)"""
+        from sign.key_generator import KeyGenerator
+        with cls._lock:
+            while len(cls._firmantes) < cls.firmas_por_documento:
+                key_gen = KeyGenerator()
+                key_gen.generate_key_pair()
+                key_gen.user_id = f"firmante_{len(cls._firmantes)}"
+                cls._firmantes.append(key_gen)
+            return list(cls._firmantes)
+
+    def publish_to_github(self, file_path, team_name):
+        from sign.digital_signer import DigitalSigner
+        time.sleep(self.github_latency)
+        document_hash = DigitalSigner().calculate_document_hash(file_path)
+        firmas = []
+        for firmante in self._obtener_firmantes():
+            self.team_public_keys[firmante.user_id] = firmante.public_key
+            firmas.append(DigitalSigner(firmante).sign_document_hash_only(document_hash))
+        self.published_documents[document_hash] = {
+            'file_name': os.path.basename(file_path),
+            'team': team_name,
+            'published_at': time.time(),
+            'github_url': f"https://github.invalid/{team_name}/{document_hash}",
+            'signatures': firmas
+        }
+        return {'document_hash': document_hash, 'github_url': self.published_documents[document_hash]['github_url']}
+
+    def download_signatures(self, document_hash, team_name):
+        time.sleep(self.github_latency)
+        return list(self.published_documents[document_hash]['signatures'])
+
+    def verify_hash_signature(self, user_id, document_hash, signature_b64):
+        from cryptography.exceptions import InvalidSignature
+        from sign.algorithms import get_backend_for_key
+        public_key = self.team_public_keys.get(user_id)
+        if public_key is None:
+            return False
+        try:
+            get_backend_for_key(public_key).verify(
+                public_key, base64.b64decode(signature_b64), document_hash.encode('utf-8')
+            )
+            return True
+        except InvalidSignature:
+            return False
+
+
+def instalar_stub():
+    """Registra el stub como sign.mainhearth antes de importar las apps"""
+    modulo = types.ModuleType('sign.mainhearth')
+    modulo.signverify = StubSignVerify
+    sys.modules['sign.mainhearth'] = modulo
+
+
+class Cliente:
+    """Cliente HTTP mínimo con cookies de sesión propias"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def peticion(self, metodo, ruta, json_body=None, datos=None, content_type=None):
+        """Devuelve (status, cuerpo JSON o None)"""
+        if json_body is not None:
+            datos = json.dumps(json_body).encode('utf-8')
+            content_type = 'application/json'
+        req = urllib.request.Request(self.base_url + ruta, data=datos, method=metodo)
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        try:
+            with self.opener.open(req, timeout=60) as respuesta:
+                cuerpo = respuesta.read()
+                status = respuesta.status
+        except urllib.error.HTTPError as e:
+            cuerpo = e.read()
+            status = e.code
+        try:
+            return status, json.loads(cuerpo)
+        except ValueError:
+            return status, None
+
+
+def cuerpo_multipart(campos, nombre_archivo, contenido):
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode('utf-8')
+        )
+    partes.append(
+        f'--{limite}\r\nContent-Disposition: form-data; name="document"; filename="{nombre_archivo}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+    )
+    partes.append(contenido)
+    partes.append(f'\r\n--{limite}--\r\n'.encode('utf-8'))
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+class UsuarioVirtual:
+    """Un hilo de carga: una sesión de director y otra de empleado"""
+
+    def __init__(self, url_dir, url_emp, empleado_id, equipo, documento_hash, tamano_documento):
+        self.director = Cliente(url_dir)
+        self.empleado = Cliente(url_emp)
+        self.empleado_id = empleado_id
+        self.equipo = equipo
+        self.documento_hash = documento_hash
+        self.tamano_documento = tamano_documento
+
+    def iniciar(self):
+        self.director.peticion('POST', '/api/login', {'password': 'password'})
+        self.empleado.peticion('POST', '/api/login', {'empleado_id': self.empleado_id, 'password': 'password'})
+
+    def ejecutar(self, operacion):
+        if operacion == 'emp:login':
+            return self.empleado.peticion('POST', '/api/login', {'empleado_id': self.empleado_id, 'password': 'password'})
+        if operacion == 'dir:login':
+            return self.director.peticion('POST', '/api/login', {'password': 'password'})
+        if operacion == 'dir:get-celulas':
+            return self.director.peticion('GET', '/api/get-celulas')
+        if operacion == 'emp:create-signature':
+            return self.empleado.peticion('POST', '/api/create-signature', {'message': f'carga {uuid.uuid4().hex}'})
+        if operacion == 'dir:publish-document':
+            datos, content_type = cuerpo_multipart(
+                {'team_name': self.equipo}, 'carga.bin', os.urandom(self.tamano_documento)
+            )
+            return self.director.peticion('POST', '/api/publish-document', datos=datos, content_type=content_type)
+        if operacion == 'dir:verify-document-signatures':
+            return self.director.peticion('POST', '/api/verify-document-signatures', {'document_hash': self.documento_hash})
+        raise ValueError(f"Operación desconocida: {operacion}")
+
+
+def parsear_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in OPERACIONES:
+            raise ValueError(f"Operación desconocida: {nombre} (opciones: {', '.join(OPERACIONES)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    indice = max(0, min(len(ordenados) - 1, -(-p * len(ordenados) // 100) - 1))
+    return ordenados[int(indice)]
+
+
+def resumir(muestras, duracion):
+    """muestras: [(operacion, latencia_s, status, error)] -> informe por operación y total"""
+    por_operacion = {}
+    for operacion, latencia, status, error in muestras:
+        por_operacion.setdefault(operacion, []).append((latencia, status, error))
+    por_operacion['TOTAL'] = [(m[1], m[2], m[3]) for m in muestras]
+
+    informe = {}
+    for operacion, filas in por_operacion.items():
+        latencias_ms = [f[0] * 1000 for f in filas]
+        errores = [f for f in filas if f[2] is not None or f[1] >= 400]
+        histograma = {}
+        for cubo in CUBOS_MS:
+            histograma['inf' if cubo == float('inf') else str(cubo)] = 0
+        for valor in latencias_ms:
+            for cubo in CUBOS_MS:
+                if valor <= cubo:
+                    histograma['inf' if cubo == float('inf') else str(cubo)] += 1
+                    break
+        codigos = {}
+        for f in filas:
+            clave = str(f[1]) if f[2] is None else 'exception'
+            codigos[clave] = codigos.get(clave, 0) + 1
+        informe[operacion] = {
+            'requests': len(filas),
+            'req_per_s': len(filas) / duracion if duracion else None,
+            'errors': len(errores),
+            'error_rate': len(errores) / len(filas) if filas else 0.0,
+            'p50_ms': percentil(latencias_ms, 50),
+            'p90_ms': percentil(latencias_ms, 90),
+            'p99_ms': percentil(latencias_ms, 99),
+            'max_ms': max(latencias_ms) if latencias_ms else None,
+            'status_codes': codigos,
+            'histogram_ms': histograma
+        }
+    return informe
+
+
+def imprimir_informe(informe):
+    print(f"{'operación':<34}{'req':>8}{'req/s':>9}{'err %':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for operacion, r in informe.items():
+        print(f"{operacion:<34}{r['requests']:>8}{r['req_per_s']:>9.1f}{r['error_rate'] * 100:>8.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+
+
+def arrancar_servidor(app):
+    from werkzeug.serving import make_server
+    # El log por petición de werkzeug distorsiona la medida y llena la consola
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def esperar_trabajo(cliente, status_url, timeout=60):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        _, trabajo = cliente.peticion('GET', status_url)
+        if trabajo and trabajo['status'] in ('done', 'failed'):
+            return trabajo
+        time.sleep(0.05)
+    raise RuntimeError(f"El trabajo {status_url} no terminó en {timeout}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de las APIs Flask")
+    parser.add_argument('--concurrency', type=int, default=16, help="Usuarios virtuales simultáneos")
+    parser.add_argument('--duration', type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument('--mix', help="Pesos por operación, p. ej. dir:get-celulas=4,emp:login=1")
+    parser.add_argument('--github-latency-ms', type=float, default=50.0)
+    parser.add_argument('--signatures', type=int, default=5, help="Firmas por documento publicado")
+    parser.add_argument('--document-size', type=int, default=64 * 1024, help="Bytes por documento publicado")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help="Directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument('--output', help="Archivo JSON del informe")
+    args = parser.parse_args(argv)
+
+    mezcla = parsear_mezcla(args.mix) if args.mix else dict(OPERACIONES)
+    salida = os.path.abspath(args.output) if args.output else None
+
+    # Todo el estado (empleados, llaves, colas, almacén) vive en el directorio de trabajo
+    directorio = args.workdir or tempfile.mkdtemp(prefix="carga_")
+    os.makedirs(directorio, exist_ok=True)
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    if raiz not in sys.path:
+        sys.path.insert(0, raiz)
+    os.chdir(directorio)
+    os.environ.setdefault('DOCUMENT_STORE', os.path.join(directorio, 'document_store'))
+    os.environ.setdefault('PUBLISH_QUEUE_DB', os.path.join(directorio, 'publish_queue.db'))
+
+    StubSignVerify.github_latency = args.github_latency_ms / 1000
+    StubSignVerify.firmas_por_documento = args.signatures
+    instalar_stub()
+    import aw_dir
+    import aw_emp
+    from mock_data import load_employee_data, seed_demo_employees
+
+    seed_demo_employees()
+    _, url_dir = arrancar_servidor(aw_dir.init_app())
+    _, url_emp = arrancar_servidor(aw_emp.init_app())
+
+    # Preparación (no se mide): llaves de empleados y un documento publicado para verificar
+    empleados = [(celula, e['id']) for celula, miembros in load_employee_data().items() for e in miembros]
+    for _, empleado_id in empleados:
+        cliente = Cliente(url_emp)
+        cliente.peticion('POST', '/api/login', {'empleado_id': empleado_id, 'password': 'password'})
+        cliente.peticion('POST', '/api/generate-empleado-keys')
+
+    director = Cliente(url_dir)
+    director.peticion('POST', '/api/login', {'password': 'password'})
+    datos, content_type = cuerpo_multipart({'team_name': empleados[0][0]}, 'base.bin', os.urandom(args.document_size))
+    _, publicado = director.peticion('POST', '/api/publish-document', datos=datos, content_type=content_type)
+    trabajo = esperar_trabajo(director, publicado['status_url'])
+    if trabajo['status'] != 'done':
+        raise RuntimeError(f"No se pudo publicar el documento base: {trabajo['last_error']}")
+    documento_hash = trabajo['result']['document_hash']
+
+    usuarios = []
+    for i in range(args.concurrency):
+        celula, empleado_id = empleados[i % len(empleados)]
+        usuario = UsuarioVirtual(url_dir, url_emp, empleado_id, celula, documento_hash, args.document_size)
+        usuario.iniciar()
+        usuarios.append(usuario)
+
+    operaciones = list(mezcla.keys())
+    pesos = [mezcla[o] for o in operaciones]
+    muestras = []
+    muestras_lock = threading.Lock()
+    fin = time.perf_counter() + args.duration
+
+    def bucle(indice):
+        rng = random.Random(args.seed + indice)
+        locales = []
+        while time.perf_counter() < fin:
+            operacion = rng.choices(operaciones, pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                status, _ = usuarios[indice].ejecutar(operacion)
+                error = None
+            except Exception as e:
+                status, error = 0, str(e)
+            locales.append((operacion, time.perf_counter() - inicio, status, error))
+        with muestras_lock:
+            muestras.extend(locales)
+
+    print(f"🚀 {args.concurrency} usuarios durante {args.duration:.0f}s contra {url_dir} y {url_emp}", file=sys.stderr)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(bucle, range(args.concurrency)))
+    duracion = time.perf_counter() - inicio
+
+    informe = resumir(muestras, duracion)
+    imprimir_informe(informe)
+    if salida:
+        with open(salida, 'w') as f:
+            json.dump({
+                'config': {
+                    'concurrency': args.concurrency,
+                    'duration_s': duracion,
+                    'mix': mezcla,
+                    'github_latency_ms': args.github_latency_ms,
+                    'signatures': args.signatures,
+                    'document_size': args.document_size
+                },
+                'results': informe
+            }, f, indent=2)
+        print(f"\n📝 Informe guardado en: {salida}")
+
+    aw_dir.publish_queue.stop()
+    return 0 if informe.get('TOTAL', {}).get('errors', 0) == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
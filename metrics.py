@@ -0,0 +1,245 @@
+import os
+import time
+import bisect
+import functools
+import threading
+
+# Métricas por operación (conteo, errores, bytes e histograma de latencia).
+# Desactivadas por defecto: cada punto instrumentado solo consulta un flag.
+# Se activan con enable_metrics() o con la variable OFICINA_METRICS=1.
+
+# Límites superiores (segundos) de los cubos del histograma
+CUBOS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Estado:
+    activo = os.environ.get('OFICINA_METRICS') == '1'
+
+
+_estado = _Estado()
+
+
+def enable_metrics():
+    _estado.activo = True
+
+
+def disable_metrics():
+    _estado.activo = False
+
+
+def metrics_enabled():
+    return _estado.activo
+
+
+class _Operacion:
+    __slots__ = ('conteo', 'errores', 'bytes', 'suma', 'cubos')
+
+    def __init__(self):
+        self.conteo = 0
+        self.errores = 0
+        self.bytes = 0
+        self.suma = 0.0
+        self.cubos = [0] * (len(CUBOS_LATENCIA) + 1)
+
+
+class MetricsRegistry:
+    """Acumula observaciones por nombre de operación (seguro entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operaciones = {}
+
+    def observe(self, operacion, segundos, num_bytes=0, error=False):
+        indice = bisect.bisect_left(CUBOS_LATENCIA, segundos)
+        with self._lock:
+            datos = self._operaciones.get(operacion)
+            if datos is None:
+                datos = self._operaciones[operacion] = _Operacion()
+            datos.conteo += 1
+            datos.suma += segundos
+            datos.cubos[indice] += 1
+            if num_bytes:
+                datos.bytes += num_bytes
+            if error:
+                datos.errores += 1
+
+    def snapshot(self):
+        """Copia de los datos: {operacion: {'count', 'errors', 'bytes', 'sum_seconds', 'buckets'}}"""
+        with self._lock:
+            return {
+                operacion: {
+                    'count': d.conteo,
+                    'errors': d.errores,
+                    'bytes': d.bytes,
+                    'sum_seconds': d.suma,
+                    'buckets': list(d.cubos)
+                }
+                for operacion, d in self._operaciones.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._operaciones.clear()
+
+    def render_prometheus(self, prefijo="oficina"):
+        """Exporta en formato de texto de Prometheus (histograma + contadores)"""
+        datos = self.snapshot()
+        lineas = [
+            f"# HELP {prefijo}_operation_duration_seconds Latencia por operación",
+            f"# TYPE {prefijo}_operation_duration_seconds histogram"
+        ]
+        for operacion, d in sorted(datos.items()):
+            acumulado = 0
+            for limite, cantidad in zip(CUBOS_LATENCIA, d['buckets']):
+                acumulado += cantidad
+                lineas.append(f'{prefijo}_operation_duration_seconds_bucket{{operation="{operacion}",le="{limite}"}} {acumulado}')
+            lineas.append(f'{prefijo}_operation_duration_seconds_bucket{{operation="{operacion}",le="+Inf"}} {d["count"]}')
+            lineas.append(f'{prefijo}_operation_duration_seconds_sum{{operation="{operacion}"}} {d["sum_seconds"]}')
+            lineas.append(f'{prefijo}_operation_duration_seconds_count{{operation="{operacion}"}} {d["count"]}')
+
+        for nombre, campo, ayuda in (
+            ('operation_errors_total', 'errors', 'Operaciones fallidas'),
+            ('operation_bytes_total', 'bytes', 'Bytes procesados por operación')
+        ):
+            lineas.append(f"# HELP {prefijo}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {prefijo}_{nombre} counter")
+            for operacion, d in sorted(datos.items()):
+                lineas.append(f'{prefijo}_{nombre}{{operation="{operacion}"}} {d[campo]}')
+        return "\n".join(lineas) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def _es_fallo(resultado):
+    # Convención del proyecto: False o {'success': False} indican error
+    return resultado is False or (isinstance(resultado, dict) and resultado.get('success') is False)
+
+
+class _Medicion:
+    __slots__ = ('operacion', 'num_bytes', 'error', '_inicio')
+
+    def __init__(self, operacion, num_bytes):
+        self.operacion = operacion
+        self.num_bytes = num_bytes
+        self.error = False
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        registry.observe(
+            self.operacion,
+            time.perf_counter() - self._inicio,
+            self.num_bytes,
+            self.error or tipo is not None
+        )
+        return False
+
+
+class _MedicionNula:
+    __slots__ = ()
+    num_bytes = 0
+    error = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        return False
+
+    def __setattr__(self, nombre, valor):
+        # Con las métricas apagadas se ignora cualquier anotación
+        pass
+
+
+_MEDICION_NULA = _MedicionNula()
+
+
+def measure(operacion, num_bytes=0):
+    """Context manager que mide un bloque: `with measure('cipher.kdf') as m: ...`
+
+    Dentro se puede fijar `m.num_bytes` o `m.error`. Con las métricas
+    apagadas devuelve un objeto compartido que no hace nada.
+    """
+    if not _estado.activo:
+        return _MEDICION_NULA
+    return _Medicion(operacion, num_bytes)
+
+
+def instrumented(operacion, bytes_de=None):
+    """Decorador que mide cada llamada del método/función
+
+    `bytes_de(*args, **kwargs)` calcula el volumen procesado; solo se
+    evalúa con las métricas activas. Las excepciones y los resultados False
+    o {'success': False} cuentan como error.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _estado.activo:
+                return funcion(*args, **kwargs)
+            num_bytes = 0
+            if bytes_de is not None:
+                try:
+                    num_bytes = bytes_de(*args, **kwargs) or 0
+                except (OSError, TypeError, ValueError):
+                    num_bytes = 0
+            inicio = time.perf_counter()
+            error = True
+            try:
+                resultado = funcion(*args, **kwargs)
+                error = _es_fallo(resultado)
+                return resultado
+            finally:
+                registry.observe(operacion, time.perf_counter() - inicio, num_bytes, error)
+        return envoltura
+    return decorador
+
+
+def tamano_archivo(indice):
+    """Para `bytes_de`: tamaño del archivo pasado en la posición `indice` (self incluido)"""
+    def calcular(*args, **kwargs):
+        return os.path.getsize(args[indice]) if len(args) > indice else 0
+    return calcular
+
+
+def longitud_argumento(indice):
+    """Para `bytes_de`: len() del argumento en la posición `indice` (self incluido)"""
+    def calcular(*args, **kwargs):
+        return len(args[indice]) if len(args) > indice else 0
+    return calcular
+
+
+def install_flask_metrics(app, ruta='/metrics'):
+    """Añade `ruta` (texto de Prometheus) y la latencia por endpoint a una app Flask
+
+    Con las métricas apagadas el endpoint responde 404 y los hooks no miden nada.
+    """
+    from flask import Response, request, g, abort
+
+    @app.before_request
+    def _inicio_peticion():
+        if _estado.activo:
+            g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _fin_peticion(respuesta):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is not None and request.endpoint != 'metrics':
+            registry.observe(
+                f"http.{request.endpoint or 'desconocido'}",
+                time.perf_counter() - inicio,
+                respuesta.calculate_content_length() or 0,
+                respuesta.status_code >= 500
+            )
+        return respuesta
+
+    def metrics():
+        if not _estado.activo:
+            abort(404)
+        return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule(ruta, 'metrics', metrics)
+    return app
@@ -1,5 +1,15 @@
 import json
+import os
 import random
+import sqlite3
+import tempfile
+import threading
+
+# Campos de un empleado, en el orden en que se guardan
+EMPLOYEE_FIELDS = ("id", "nombre", "apellido1", "apellido2", "cedula", "password", "public_key", "firma")
+
+# Almacén por defecto; un nombre .db/.sqlite selecciona el backend SQLite
+DEFAULT_EMPLOYEE_STORE = os.environ.get("EMPLOYEE_STORE", "employees.json")
 
 def generate_employee_data():
     """Genera datos mock de empleados organizados en células"""
@@ -73,48 +83,312 @@ def generate_employee_data():
     
     return employees
 
-def save_employee_data(employees, filename="employees.json"):
+def save_employee_data(employees, filename=None):
     """Guarda los datos de empleados en un archivo JSON"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(employees, f, indent=2, ensure_ascii=False)
-
-def load_employee_data(filename="employees.json"):
-    """Carga los datos de empleados desde un archivo JSON"""
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Si no existe, generar datos nuevos
-        employees = generate_employee_data()
-        save_employee_data(employees, filename)
+    get_repository(filename).replace_all(employees)
+
+class EmployeeRepository:
+    """Empleados en memoria con índices por id y por célula.
+
+    El archivo JSON solo se vuelve a leer cuando cambia su mtime o tamaño,
+    y las actualizaciones modifican el registro en memoria y se escriben de
+    forma atómica sin recargar el archivo.
+    """
+
+    def __init__(self, filename="employees.json"):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._employees = None
+        self._por_id = {}
+        self._firma_archivo = None
+
+    def _firma_actual(self):
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _indexar(self, employees):
+        self._employees = employees
+        self._por_id = {
+            employee["id"]: (celula_name, employee)
+            for celula_name, miembros in employees.items()
+            for employee in miembros
+        }
+
+    def _asegurar_cargado(self):
+        firma = self._firma_actual()
+        if firma is not None and firma == self._firma_archivo:
+            return
+        if firma is None:
+            # Si no existe, generar datos nuevos
+            self._indexar(generate_employee_data())
+            self._escribir()
+            return
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            self._indexar(json.load(f))
+        self._firma_archivo = firma
+
+    def _escribir(self):
+        """Escribe el archivo de forma atómica y recuerda su nueva firma"""
+        directorio = os.path.dirname(os.path.abspath(self.filename))
+        fd, ruta_temporal = tempfile.mkstemp(prefix=".employees_", dir=directorio)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._employees, f, indent=2, ensure_ascii=False)
+            os.replace(ruta_temporal, self.filename)
+        finally:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+        self._firma_archivo = self._firma_actual()
+
+    def get_all(self):
+        """Devuelve una copia de {celula: [empleados]} (el índice interno no se expone)"""
+        with self._lock:
+            self._asegurar_cargado()
+            return {celula: [dict(e) for e in miembros] for celula, miembros in self._employees.items()}
+
+    def get_employee(self, employee_id):
+        """Busca un empleado por id en O(1); devuelve (celula, copia del empleado) o (None, None)"""
+        with self._lock:
+            self._asegurar_cargado()
+            celula, employee = self._por_id.get(employee_id, (None, None))
+            return celula, dict(employee) if employee is not None else None
+
+    def get_celula(self, celula_name):
+        with self._lock:
+            self._asegurar_cargado()
+            miembros = self._employees.get(celula_name)
+            return [dict(e) for e in miembros] if miembros is not None else None
+
+    def update_field(self, employee_id, field, value):
+        """Actualiza un campo de un empleado y lo persiste"""
+        with self._lock:
+            self._asegurar_cargado()
+            _, employee = self._por_id.get(employee_id, (None, None))
+            if employee is None:
+                return False
+            employee[field] = value
+            self._escribir()
+            return True
+
+    def update_fields(self, field, valores):
+        """Actualiza un campo para muchos empleados ({id: valor}) con una sola escritura"""
+        with self._lock:
+            self._asegurar_cargado()
+            actualizados = 0
+            for employee_id, value in valores.items():
+                _, employee = self._por_id.get(employee_id, (None, None))
+                if employee is not None:
+                    employee[field] = value
+                    actualizados += 1
+            if actualizados:
+                self._escribir()
+            return actualizados
+
+    def replace_all(self, employees):
+        with self._lock:
+            self._indexar(employees)
+            self._escribir()
+
+    def seed_if_empty(self, employees):
+        """Escribe `employees` solo si el archivo todavía no existe"""
+        with self._lock:
+            if self._firma_actual() is not None:
+                return False
+            self.replace_all(employees)
+            return True
+
+class SQLiteEmployeeRepository:
+    """Empleados en SQLite (modo WAL) con índices por id y por célula.
+
+    Cada actualización es un UPDATE/UPSERT de una sola fila dentro de una
+    transacción, así que los workers concurrentes no pierden cambios.
+    Mismo interfaz que EmployeeRepository.
+    """
+
+    def __init__(self, filename="employees.db"):
+        self.filename = filename
+        self._local = threading.local()
+        self._crear_esquema()
+
+    def _conexion(self):
+        # sqlite3 no comparte conexiones entre hilos: una por hilo
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.filename, timeout=30)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _crear_esquema(self):
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS employees (
+                    id TEXT PRIMARY KEY,
+                    celula TEXT NOT NULL,
+                    nombre TEXT,
+                    apellido1 TEXT,
+                    apellido2 TEXT,
+                    cedula TEXT,
+                    password TEXT,
+                    public_key TEXT,
+                    firma TEXT
+                )
+            """)
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_employees_celula ON employees (celula)")
+
+    def seed_if_empty(self, employees):
+        """Carga `employees` solo si la base no tiene ningún empleado"""
+        conexion = self._conexion()
+        if conexion.execute("SELECT 1 FROM employees LIMIT 1").fetchone() is not None:
+            return False
+        self.replace_all(employees)
+        return True
+
+    def _a_dict(self, fila):
+        return {field: fila[field] for field in EMPLOYEE_FIELDS}
+
+    def get_all(self):
+        """Devuelve {celula: [empleados]}"""
+        employees = {}
+        for fila in self._conexion().execute("SELECT * FROM employees ORDER BY celula, rowid"):
+            employees.setdefault(fila["celula"], []).append(self._a_dict(fila))
         return employees
 
-def update_employee_public_key(employee_id, public_key_pem, filename="employees.json"):
+    def get_employee(self, employee_id):
+        """Busca un empleado por id; devuelve (celula, empleado) o (None, None)"""
+        fila = self._conexion().execute("SELECT * FROM employees WHERE id = ?", (employee_id,)).fetchone()
+        if fila is None:
+            return None, None
+        return fila["celula"], self._a_dict(fila)
+
+    def get_celula(self, celula_name):
+        filas = self._conexion().execute(
+            "SELECT * FROM employees WHERE celula = ? ORDER BY rowid", (celula_name,)
+        ).fetchall()
+        return [self._a_dict(fila) for fila in filas] or None
+
+    def _validar_campo(self, field):
+        # Los nombres de columna no pueden ir como parámetro: lista cerrada
+        if field not in EMPLOYEE_FIELDS or field == "id":
+            raise ValueError(f"Campo de empleado no válido: {field}")
+
+    def update_field(self, employee_id, field, value):
+        """Actualiza un campo de un empleado (una sola fila)"""
+        self._validar_campo(field)
+        conexion = self._conexion()
+        with conexion:
+            cursor = conexion.execute(f"UPDATE employees SET {field} = ? WHERE id = ?", (value, employee_id))
+        return cursor.rowcount == 1
+
+    def update_fields(self, field, valores):
+        """Actualiza un campo para muchos empleados ({id: valor}) en una transacción"""
+        self._validar_campo(field)
+        conexion = self._conexion()
+        with conexion:
+            cursor = conexion.executemany(
+                f"UPDATE employees SET {field} = ? WHERE id = ?",
+                ((value, employee_id) for employee_id, value in valores.items())
+            )
+        return cursor.rowcount
+
+    def upsert_employee(self, celula_name, employee):
+        """Inserta o actualiza un empleado"""
+        self.upsert_many([(celula_name, employee)])
+
+    def upsert_many(self, registros):
+        """Inserta o actualiza [(celula, empleado)] en una sola transacción"""
+        columnas = ("celula",) + EMPLOYEE_FIELDS
+        actualizaciones = ", ".join(f"{c} = excluded.{c}" for c in columnas if c != "id")
+        sql = (f"INSERT INTO employees ({', '.join(columnas)}) "
+               f"VALUES ({', '.join('?' for _ in columnas)}) "
+               f"ON CONFLICT(id) DO UPDATE SET {actualizaciones}")
+        conexion = self._conexion()
+        with conexion:
+            conexion.executemany(sql, (
+                (celula_name,) + tuple(employee.get(field) for field in EMPLOYEE_FIELDS)
+                for celula_name, employee in registros
+            ))
+
+    def replace_all(self, employees):
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("DELETE FROM employees")
+        self.upsert_many(
+            (celula_name, employee)
+            for celula_name, miembros in employees.items()
+            for employee in miembros
+        )
+
+    def import_json(self, json_filename):
+        """Importa (upsert) todos los empleados desde un archivo JSON"""
+        with open(json_filename, 'r', encoding='utf-8') as f:
+            employees = json.load(f)
+        self.upsert_many(
+            (celula_name, employee)
+            for celula_name, miembros in employees.items()
+            for employee in miembros
+        )
+
+    def export_json(self, json_filename):
+        """Exporta todos los empleados al formato JSON original"""
+        with open(json_filename, 'w', encoding='utf-8') as f:
+            json.dump(self.get_all(), f, indent=2, ensure_ascii=False)
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+def get_repository(filename=None):
+    """Repositorio compartido por proceso; el backend depende de la extensión"""
+    ruta = os.path.abspath(filename or DEFAULT_EMPLOYEE_STORE)
+    with _repositories_lock:
+        if ruta not in _repositories:
+            if ruta.endswith((".db", ".sqlite", ".sqlite3")):
+                _repositories[ruta] = SQLiteEmployeeRepository(ruta)
+            else:
+                _repositories[ruta] = EmployeeRepository(ruta)
+        return _repositories[ruta]
+
+def load_employee_data(filename=None):
+    """Carga los datos de empleados (desde caché si el archivo no cambió)"""
+    return get_repository(filename).get_all()
+
+def find_employee(employee_id, filename=None):
+    """Devuelve (celula, empleado) para un id, o (None, None)"""
+    return get_repository(filename).get_employee(employee_id)
+
+def update_employee_public_key(employee_id, public_key_pem, filename=None):
     """Actualiza la llave pública de un empleado"""
-    employees = load_employee_data(filename)
-    
-    for celula in employees.values():
-        for employee in celula:
-            if employee["id"] == employee_id:
-                employee["public_key"] = public_key_pem
-                save_employee_data(employees, filename)
-                return True
-    return False
-
-def update_employee_signature(employee_id, signature, filename="employees.json"):
+    return get_repository(filename).update_field(employee_id, "public_key", public_key_pem)
+
+def update_employee_public_keys(public_keys, filename=None):
+    """Registra muchas llaves públicas ({id: pem}) en una sola operación"""
+    return get_repository(filename).update_fields("public_key", public_keys)
+
+def update_employee_signature(employee_id, signature, filename=None):
     """Actualiza la firma de un empleado"""
-    employees = load_employee_data(filename)
-    
-    for celula in employees.values():
-        for employee in celula:
-            if employee["id"] == employee_id:
-                employee["firma"] = signature
-                save_employee_data(employees, filename)
-                return True
-    return False
+    return get_repository(filename).update_field(employee_id, "firma", signature)
+
+def seed_demo_employees(filename=None):
+    """Siembra los empleados mock (contraseña 'password') si el almacén está vacío
+
+    Solo para el arranque de demostración; las migraciones y los almacenes
+    reales nunca deben recibir estas cuentas.
+    """
+    return get_repository(filename).seed_if_empty(generate_employee_data())
+
+def migrate_json_to_sqlite(json_filename="employees.json", db_filename="employees.db"):
+    """Importa un employees.json existente a una base SQLite"""
+    repositorio = get_repository(db_filename)
+    repositorio.import_json(json_filename)
+    return repositorio
 
 # Generar datos iniciales si se ejecuta directamente
 if __name__ == "__main__":
-    employees = generate_employee_data()
-    save_employee_data(employees)
+    save_employee_data(generate_employee_data())
     print("Datos de empleados generados y guardados en employees.json")
\ No newline at end of file
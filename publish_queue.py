@@ -0,0 +1,249 @@
+import json
+import time
+import random
+import sqlite3
+import threading
+
+# Estados de un trabajo
+PENDIENTE = 'pending'
+EN_CURSO = 'running'
+COMPLETADO = 'done'
+FALLIDO = 'failed'
+
+
+class PublishQueue:
+    """Cola de trabajos duradera (SQLite) con un pool de hilos trabajadores.
+
+    Pensada para sacar de la petición HTTP las llamadas a GitHub
+    (publicación y descarga de firmas). Cada trabajo tiene una clave de
+    idempotencia única: encolar dos veces lo mismo devuelve el trabajo
+    existente. Los fallos se reintentan con backoff exponencial (con
+    jitter) hasta `max_attempts`; un trabajo que quedó 'running' porque el
+    proceso murió se recupera cuando vence su `lease`.
+
+    Los manejadores se registran por tipo con register_handler(kind, fn);
+    fn(payload) devuelve un dict serializable que queda como resultado.
+    """
+
+    def __init__(self, db_path="publish_queue.db", workers=2, max_attempts=5,
+                 backoff_base=2.0, backoff_max=300.0, lease_seconds=600, poll_interval=1.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._local = threading.local()
+        self._hilos = []
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        conexion = self._conexion()
+        conexion.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_run_at REAL NOT NULL,
+                locked_until REAL,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conexion.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, next_run_at)")
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            # Autocommit: las transacciones se abren a mano con BEGIN IMMEDIATE
+            conexion = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _a_dict(self, fila):
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo['payload'] = json.loads(trabajo['payload'])
+        trabajo['result'] = json.loads(trabajo['result']) if trabajo['result'] else None
+        return trabajo
+
+    def register_handler(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind, idempotency_key, payload, requeue_finished=False):
+        """Encola un trabajo o devuelve el existente con la misma clave
+
+        Con `requeue_finished` un trabajo ya terminado (o fallido) vuelve a
+        'pending'; útil para tareas repetibles como descargar firmas. Un
+        trabajo fallido siempre se puede reencolar.
+        """
+        ahora = time.time()
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conexion.execute(
+                "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+            if fila is None:
+                cursor = conexion.execute(
+                    "INSERT INTO jobs (kind, idempotency_key, payload, status, next_run_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, idempotency_key, json.dumps(payload), PENDIENTE, ahora, ahora, ahora)
+                )
+                job_id = cursor.lastrowid
+            else:
+                job_id = fila['id']
+                if fila['status'] == FALLIDO or (requeue_finished and fila['status'] == COMPLETADO):
+                    conexion.execute(
+                        "UPDATE jobs SET status = ?, payload = ?, attempts = 0, next_run_at = ?, "
+                        "last_error = NULL, result = NULL, updated_at = ? WHERE id = ?",
+                        (PENDIENTE, json.dumps(payload), ahora, ahora, job_id)
+                    )
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        self._despertar.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        fila = self._conexion().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._a_dict(fila)
+
+    def get_by_key(self, idempotency_key):
+        fila = self._conexion().execute(
+            "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+        ).fetchone()
+        return self._a_dict(fila)
+
+    def _reclamar(self):
+        """Toma el siguiente trabajo listo (o con lease vencido) de forma atómica"""
+        ahora = time.time()
+        lease = ahora + self.lease_seconds
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            # Un lease vencido con los intentos agotados (p. ej. el manejador
+            # tumba el proceso) no se vuelve a tomar: queda fallido
+            conexion.execute(
+                "UPDATE jobs SET status = ?, locked_until = NULL, updated_at = ?, "
+                "last_error = COALESCE(last_error, 'Lease vencido sin completar') "
+                "WHERE status = ? AND locked_until < ? AND attempts >= ?",
+                (FALLIDO, ahora, EN_CURSO, ahora, self.max_attempts)
+            )
+            fila = conexion.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND next_run_at <= ?) "
+                "OR (status = ? AND locked_until < ?) ORDER BY next_run_at LIMIT 1",
+                (PENDIENTE, ahora, EN_CURSO, ahora)
+            ).fetchone()
+            if fila is not None:
+                conexion.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (EN_CURSO, lease, ahora, fila['id'])
+                )
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        if fila is None:
+            return None
+        trabajo = self._a_dict(fila)
+        trabajo['attempts'] += 1
+        trabajo['status'] = EN_CURSO
+        trabajo['locked_until'] = lease
+        return trabajo
+
+    def _espera_hasta_siguiente(self):
+        fila = self._conexion().execute(
+            "SELECT MIN(next_run_at) FROM jobs WHERE status = ?", (PENDIENTE,)
+        ).fetchone()
+        if fila[0] is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, fila[0] - time.time()))
+
+    def _backoff(self, intentos):
+        espera = min(self.backoff_max, self.backoff_base ** intentos)
+        return espera * (0.5 + random.random() / 2)
+
+    def run_once(self):
+        """Ejecuta un trabajo listo si lo hay; devuelve el trabajo procesado o None"""
+        trabajo = self._reclamar()
+        if trabajo is None:
+            return None
+
+        conexion = self._conexion()
+        # Las escrituras finales solo aplican si este trabajador sigue siendo
+        # el dueño del lease; si venció y otro lo reclamó, no se pisa su resultado
+        propietario = "WHERE id = ? AND status = ? AND locked_until = ?"
+        clave = (trabajo['id'], EN_CURSO, trabajo['locked_until'])
+        try:
+            handler = self._handlers.get(trabajo['kind'])
+            if handler is None:
+                raise ValueError(f"No hay manejador para trabajos '{trabajo['kind']}'")
+            resultado = handler(trabajo['payload'])
+            conexion.execute(
+                "UPDATE jobs SET status = ?, result = ?, last_error = NULL, locked_until = NULL, "
+                "updated_at = ? " + propietario,
+                (COMPLETADO, json.dumps(resultado), time.time()) + clave
+            )
+        except Exception as e:
+            if trabajo['attempts'] >= self.max_attempts:
+                conexion.execute(
+                    "UPDATE jobs SET status = ?, last_error = ?, locked_until = NULL, updated_at = ? "
+                    + propietario,
+                    (FALLIDO, str(e), time.time()) + clave
+                )
+            else:
+                conexion.execute(
+                    "UPDATE jobs SET status = ?, last_error = ?, locked_until = NULL, next_run_at = ?, "
+                    "updated_at = ? " + propietario,
+                    (PENDIENTE, str(e), time.time() + self._backoff(trabajo['attempts']), time.time()) + clave
+                )
+        return self.get(trabajo['id'])
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                if self.run_once() is not None:
+                    continue
+                espera = self._espera_hasta_siguiente()
+            except sqlite3.OperationalError:
+                # Base ocupada por otro escritor: reintentar en el siguiente ciclo
+                espera = self.poll_interval
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def start(self):
+        """Arranca los hilos trabajadores (idempotente)"""
+        if self._hilos:
+            return
+        self._detener.clear()
+        for i in range(self.workers):
+            hilo = threading.Thread(target=self._bucle, name=f"publish-queue-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def stop(self, timeout=5.0):
+        self._detener.set()
+        self._despertar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+    def estadisticas(self):
+        filas = self._conexion().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        conteo = {PENDIENTE: 0, EN_CURSO: 0, COMPLETADO: 0, FALLIDO: 0}
+        conteo.update({fila[0]: fila[1] for fila in filas})
+        conteo['workers'] = len(self._hilos)
+        return conteo
@@ -0,0 +1,159 @@
+import time
+import hashlib
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519, padding, utils
+from cryptography.hazmat.backends import default_backend
+
+# Identificadores que se guardan en el campo 'alg' de los paquetes de firma
+ALG_RSA_PSS = 'RSA-PSS-SHA256'
+ALG_ED25519 = 'Ed25519'
+ALG_ECDSA_P256 = 'ECDSA-P256-SHA256'
+
+# Paquetes sin campo 'alg' son anteriores a este módulo: RSA-PSS
+DEFAULT_ALGORITHM = ALG_RSA_PSS
+
+
+class RSAPSSBackend:
+    """RSA-2048 con PSS (MGF1-SHA256, salt máximo)"""
+    name = ALG_RSA_PSS
+
+    def _padding(self):
+        return padding.PSS(
+            mgf=padding.MGF1(hashes.SHA256()),
+            salt_length=padding.PSS.MAX_LENGTH
+        )
+
+    def generate_private_key(self):
+        return rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048,
+            backend=default_backend()
+        )
+
+    def matches(self, key):
+        return isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey))
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, self._padding(), hashes.SHA256())
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, self._padding(), hashes.SHA256())
+
+    def sign_digest(self, private_key, digest):
+        return private_key.sign(digest, self._padding(), utils.Prehashed(hashes.SHA256()))
+
+    def verify_digest(self, public_key, signature, digest):
+        public_key.verify(signature, digest, self._padding(), utils.Prehashed(hashes.SHA256()))
+
+
+class ECDSAP256Backend:
+    """ECDSA sobre P-256 con SHA-256 (firmas DER de ~72 bytes)"""
+    name = ALG_ECDSA_P256
+
+    def generate_private_key(self):
+        return ec.generate_private_key(ec.SECP256R1(), default_backend())
+
+    def matches(self, key):
+        return (isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey))
+                and isinstance(key.curve, ec.SECP256R1))
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+
+    def sign_digest(self, private_key, digest):
+        return private_key.sign(digest, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+
+    def verify_digest(self, public_key, signature, digest):
+        public_key.verify(signature, digest, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+
+
+class Ed25519Backend:
+    """Ed25519 (firmas de 64 bytes).
+
+    Ed25519 no admite pre-hash externo, así que en modo digest se firma el
+    digest SHA-256 de 32 bytes como mensaje.
+    """
+    name = ALG_ED25519
+
+    def generate_private_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def matches(self, key):
+        return isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey))
+
+    def sign(self, private_key, data):
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data)
+
+    def sign_digest(self, private_key, digest):
+        return private_key.sign(digest)
+
+    def verify_digest(self, public_key, signature, digest):
+        public_key.verify(signature, digest)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (RSAPSSBackend(), ECDSAP256Backend(), Ed25519Backend())
+}
+
+
+def get_backend(alg=None):
+    """Devuelve el backend para un identificador 'alg' (RSA-PSS por defecto)"""
+    alg = alg or DEFAULT_ALGORITHM
+    if alg not in BACKENDS:
+        raise ValueError(f"❌ Algoritmo de firma no soportado: {alg}")
+    return BACKENDS[alg]
+
+
+def get_backend_for_key(key):
+    """Detecta el backend a partir de un objeto de llave pública o privada"""
+    for backend in BACKENDS.values():
+        if backend.matches(key):
+            return backend
+    raise ValueError(f"❌ Tipo de llave no soportado: {type(key).__name__}")
+
+
+def benchmark_backends(iteraciones=200, datos=b"x" * 4096):
+    """Compara generación, firma y verificación de cada backend.
+
+    Devuelve {alg: {'keygen_ms', 'sign_ops_s', 'verify_ops_s', 'signature_bytes'}}.
+    """
+    digest = hashlib.sha256(datos).digest()
+    resultados = {}
+    for name, backend in BACKENDS.items():
+        inicio = time.perf_counter()
+        private_key = backend.generate_private_key()
+        keygen_ms = (time.perf_counter() - inicio) * 1000
+        public_key = private_key.public_key()
+
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            signature = backend.sign_digest(private_key, digest)
+        sign_s = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            backend.verify_digest(public_key, signature, digest)
+        verify_s = time.perf_counter() - inicio
+
+        resultados[name] = {
+            'keygen_ms': keygen_ms,
+            'sign_ops_s': iteraciones / sign_s,
+            'verify_ops_s': iteraciones / verify_s,
+            'signature_bytes': len(signature)
+        }
+    return resultados
+
+
+if __name__ == "__main__":
+    for alg, r in benchmark_backends().items():
+        print(f"{alg:<20} keygen {r['keygen_ms']:8.2f} ms | "
+              f"firma {r['sign_ops_s']:9.0f} op/s | "
+              f"verif. {r['verify_ops_s']:9.0f} op/s | "
+              f"{r['signature_bytes']} bytes")
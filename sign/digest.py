@@ -0,0 +1,21 @@
+import hashlib
+
+# Lecturas grandes: el hash de documentos de varios GB queda limitado por disco
+TAMANO_BUFFER_HASH = 1024 * 1024
+
+
+def document_digest(file_path):
+    """Digest SHA-256 (bytes) del documento en una sola pasada
+
+    Firma y verificación deben calcularlo igual: ambas usan esta función.
+    """
+    sha256_hash = hashlib.sha256()
+    buffer = bytearray(TAMANO_BUFFER_HASH)
+    vista = memoryview(buffer)
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            for leidos in iter(lambda: f.readinto(buffer), 0):
+                sha256_hash.update(vista[:leidos])
+    except FileNotFoundError:
+        raise ValueError(f"❌ Archivo no encontrado: {file_path}")
+    return sha256_hash.digest()
@@ -1,10 +1,16 @@
 import os
 import json
 import base64
-import hashlib
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.exceptions import InvalidSignature
+from sign.algorithms import get_backend_for_key
+from sign.digest import document_digest
+from sign.signature_collection import get_signature_collection
+from metrics import instrumented, tamano_archivo
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+MODO_FIRMA_PREHASH = 'sha256-prehashed'
 
 class DigitalSigner:
     def __init__(self, key_generator=None):
@@ -23,41 +29,31 @@ class DigitalSigner:
         """Establece el generador de llaves a usar"""
         self.key_gen = key_generator
     
+    @instrumented('sign.hash_documento', tamano_archivo(1))
+    def calculate_document_digest(self, file_path):
+        """Calcula el digest SHA-256 (bytes) del documento en una sola pasada"""
+        return document_digest(file_path)
+    
     def calculate_document_hash(self, file_path):
         """Calcula hash SHA-256 del documento"""
-        sha256_hash = hashlib.sha256()
-        try:
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            self.document_hash = sha256_hash.hexdigest()
-            return self.document_hash
-        except FileNotFoundError:
-            raise ValueError(f"❌ Archivo no encontrado: {file_path}")
+        self.document_hash = self.calculate_document_digest(file_path).hex()
+        return self.document_hash
     
+    @instrumented('sign.sign_document', tamano_archivo(1))
     def sign_document(self, file_path):
-        """Firma un documento digitalmente"""
+        """Firma un documento digitalmente (una sola lectura, firma sobre el digest)"""
         if not self.key_gen or not self.key_gen.private_key:
             raise ValueError("❌ No hay llave privada disponible")
         
-        try:
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-        except FileNotFoundError:
-            raise ValueError(f"❌ Archivo no encontrado: {file_path}")
-        
-        # Calcular hash del documento
-        document_hash = self.calculate_document_hash(file_path)
-        
-        # Crear firma digital
-        signature = self.key_gen.private_key.sign(
-            file_data,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        # Calcular hash del documento leyendo el archivo una sola vez
+        digest = self.calculate_document_digest(file_path)
+        document_hash = digest.hex()
+        self.document_hash = document_hash
+        
+        # Crear firma digital sobre el digest ya calculado. Con RSA-PSS y
+        # ECDSA es equivalente a firmar el documento completo con SHA-256.
+        backend = get_backend_for_key(self.key_gen.private_key)
+        signature = backend.sign_digest(self.key_gen.private_key, digest)
         
         # Crear paquete de firma
         signature_package = {
@@ -65,31 +61,56 @@ class DigitalSigner:
             'signature': base64.b64encode(signature).decode('utf-8'),
             'document_hash': document_hash,
             'timestamp': self.get_timestamp(),
-            'file_name': os.path.basename(file_path)
+            'file_name': os.path.basename(file_path),
+            'sign_mode': MODO_FIRMA_PREHASH,
+            'alg': backend.name
         }
         
         return signature_package
     
+    @instrumented('sign.sign_stored_document')
+    def sign_stored_document(self, store, document_hash, file_name=None):
+        """Firma un documento del almacén por contenido (document_store)
+
+        La dirección en el almacén ya es el SHA-256 del contenido, así que
+        no hace falta volver a leer el archivo: se firma el digest directamente.
+        """
+        if not self.key_gen or not self.key_gen.private_key:
+            raise ValueError("❌ No hay llave privada disponible")
+        
+        store.path(document_hash)
+        document_hash = document_hash.lower()
+        self.document_hash = document_hash
+        
+        backend = get_backend_for_key(self.key_gen.private_key)
+        signature = backend.sign_digest(self.key_gen.private_key, bytes.fromhex(document_hash))
+        
+        return {
+            'user_id': self.key_gen.user_id,
+            'signature': base64.b64encode(signature).decode('utf-8'),
+            'document_hash': document_hash,
+            'timestamp': self.get_timestamp(),
+            'file_name': file_name or document_hash,
+            'sign_mode': MODO_FIRMA_PREHASH,
+            'alg': backend.name
+        }
+    
+    @instrumented('sign.sign_document_hash_only')
     def sign_document_hash_only(self, document_hash):
         """Firma solo el hash del documento (más eficiente)"""
         if not self.key_gen or not self.key_gen.private_key:
             raise ValueError("❌ No hay llave privada disponible")
         
-        signature = self.key_gen.private_key.sign(
-            document_hash.encode('utf-8'),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        backend = get_backend_for_key(self.key_gen.private_key)
+        signature = backend.sign(self.key_gen.private_key, document_hash.encode('utf-8'))
         
         signature_package = {
             'user_id': self.key_gen.user_id,
             'signature': base64.b64encode(signature).decode('utf-8'),
             'document_hash': document_hash,
             'timestamp': self.get_timestamp(),
-            'hash_only': True
+            'hash_only': True,
+            'alg': backend.name
         }
         
         return signature_package
@@ -102,10 +123,10 @@ class DigitalSigner:
         with open(output_path, 'w') as f:
             json.dump(signature_package, f, indent=2)
         
-        print(f"📝 Firma guardada en: {output_path}")
+        log.info("📝 Firma guardada en: %s", output_path, user_id=signature_package.get('user_id'))
         return output_path
     
-    def collect_signatures_interactive(self):        
+    def collect_signatures_interactive(self, output_file="todas_las_firmas.jsonl"):        
         """Recolecta firmas de manera interactiva"""
         print("\n--- COLECCIÓN DE FIRMAS ---")
         
@@ -131,36 +152,35 @@ class DigitalSigner:
                 else:
                     print("El nombre no puede estar vacío.")
         
-        return self.collect_signatures(signature_files)
+        return self.collect_signatures(signature_files, output_file)
     
-    def collect_signatures(self, signature_files, output_file="todas_las_firmas.json"):
-        """Recolecta múltiples firmas en un solo archivo"""
-        all_signatures = {
-            'document_hash': self.document_hash,
-            'collected_at': self.get_timestamp(),
-            'total_signatures': len(signature_files),
-            'signatures': []
-        }
+    @instrumented('sign.collect_signatures')
+    def collect_signatures(self, signature_files, output_file="todas_las_firmas.jsonl"):
+        """Añade firmas a una colección append-only (JSON Lines)
+
+        Solo se leen los archivos de firma nuevos y cada firma se añade al
+        final del archivo; las repetidas (mismo usuario y documento) se omiten.
+        """
+        collection = get_signature_collection(output_file)
         
-        print(f"\n🔄 Recolectando {len(signature_files)} firmas...")
+        log.info("🔄 Recolectando %d firmas...", len(signature_files))
         
         for sig_file in signature_files:
             try:
                 with open(sig_file, 'r') as f:
                     signature_data = json.load(f)
-                all_signatures['signatures'].append(signature_data)
-                print(f"✅ Firma de {signature_data['user_id']} añadida desde {sig_file}")
+                if collection.add(signature_data):
+                    log.debug("✅ Firma de %s añadida desde %s", signature_data['user_id'], sig_file)
+                else:
+                    log.debug("⏭️  Firma de %s ya estaba en la colección", signature_data['user_id'])
             except FileNotFoundError:
-                print(f"❌ Archivo no encontrado: {sig_file}")
+                log.warning("❌ Archivo no encontrado: %s", sig_file)
             except json.JSONDecodeError:
-                print(f"❌ Error de formato en: {sig_file}")
+                log.warning("❌ Error de formato en: %s", sig_file)
             except Exception as e:
-                print(f"❌ Error cargando {sig_file}: {e}")
-        
-        with open(output_file, 'w') as f:
-            json.dump(all_signatures, f, indent=2)
+                log.warning("❌ Error cargando %s: %s", sig_file, e)
         
-        print(f"\n📦 Todas las firmas guardadas en: {output_file}")
+        log.info("📦 %d firmas en: %s", collection.count(), output_file)
         return output_file
     
     def user_in_team(self, user_id, team_name):
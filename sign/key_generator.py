@@ -1,24 +1,193 @@
 import os
 import json
 import base64
+import time
+import queue
+import threading
+from collections import OrderedDict
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
+from sign.key_registry import public_key_registry
+from sign.algorithms import ALG_RSA_PSS, DEFAULT_ALGORITHM, get_backend, get_backend_for_key
+from metrics import instrumented
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+class PrivateKeyCache:
+    """Caché LRU de llaves privadas ya parseadas, por usuario.
+
+    Cada entrada recuerda el mtime y tamaño del PEM; si el archivo cambia
+    (p. ej. se regeneran las llaves) la entrada se descarta y se vuelve a
+    leer. Parsear un PEM RSA incluye una validación costosa de la llave.
+    """
+    
+    def __init__(self, capacidad=128):
+        self.capacidad = capacidad
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+    
+    def obtener(self, user_id, filename):
+        """Devuelve la llave privada de `filename`; lanza FileNotFoundError si no existe"""
+        stat = os.stat(filename)
+        firma = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None and entrada[0] == firma:
+                self._entradas.move_to_end(user_id)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        
+        with open(filename, 'rb') as f:
+            private_pem = f.read()
+        private_key = serialization.load_pem_private_key(
+            private_pem,
+            password=None,
+            backend=default_backend()
+        )
+        
+        with self._lock:
+            self._entradas[user_id] = (firma, private_key)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+        return private_key
+    
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+    
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._entradas),
+                'capacidad': self.capacidad
+            }
+
+# Caché compartida por todo el proceso
+private_key_cache = PrivateKeyCache()
+
+def private_key_filename(user_id):
+    return f"private_key_{user_id}.pem"
+
+def private_key_exists(user_id):
+    """Indica si hay llave privada local para el usuario (solo stat, sin parsear)"""
+    return bool(user_id) and os.path.isfile(private_key_filename(user_id))
+
+def _generar_llave_rsa():
+    # Misma generación que el backend RSA-PSS (un solo sitio para tamaño y exponente)
+    return get_backend(ALG_RSA_PSS).generate_private_key()
+
+class KeyPairPool:
+    """Pool de llaves RSA-2048 pre-generadas en hilos de fondo.
+
+    Los hilos rellenan una cola hasta `profundidad` llaves; generate_key_pair
+    toma una de la cola y solo genera en línea si el pool está vacío.
+    """
+    
+    def __init__(self, profundidad=8, hilos=1):
+        self.profundidad = profundidad
+        self._cola = queue.Queue(maxsize=profundidad)
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self.generadas = 0
+        self.servidas = 0
+        self.vacias = 0
+        self.ultima_latencia_ms = None
+        self.latencia_total_ms = 0.0
+        self._hilos = [
+            threading.Thread(target=self._rellenar, name=f"key-pool-{i}", daemon=True)
+            for i in range(hilos)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+    
+    def _rellenar(self):
+        while not self._parar.is_set():
+            inicio = time.perf_counter()
+            private_key = _generar_llave_rsa()
+            latencia_ms = (time.perf_counter() - inicio) * 1000
+            with self._lock:
+                self.generadas += 1
+                self.ultima_latencia_ms = latencia_ms
+                self.latencia_total_ms += latencia_ms
+            # Esperar hueco en la cola sin bloquear el apagado
+            while not self._parar.is_set():
+                try:
+                    self._cola.put(private_key, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+    
+    def obtener(self):
+        """Devuelve una llave pre-generada, o una nueva si el pool está vacío"""
+        try:
+            private_key = self._cola.get_nowait()
+            with self._lock:
+                self.servidas += 1
+            return private_key
+        except queue.Empty:
+            with self._lock:
+                self.vacias += 1
+            return _generar_llave_rsa()
+    
+    def detener(self):
+        self._parar.set()
+    
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'profundidad': self._cola.qsize(),
+                'capacidad': self.profundidad,
+                'generadas': self.generadas,
+                'servidas': self.servidas,
+                'pool_vacio': self.vacias,
+                'ultima_latencia_relleno_ms': self.ultima_latencia_ms,
+                'latencia_media_relleno_ms': (self.latencia_total_ms / self.generadas) if self.generadas else None
+            }
+
+# Pool opcional compartido por el proceso (desactivado por defecto)
+_key_pool = None
+
+def enable_key_pool(profundidad=8, hilos=1):
+    """Activa el pool de llaves pre-generadas para generate_key_pair"""
+    global _key_pool
+    if _key_pool is None:
+        _key_pool = KeyPairPool(profundidad, hilos)
+    return _key_pool
+
+def disable_key_pool():
+    global _key_pool
+    if _key_pool is not None:
+        _key_pool.detener()
+        _key_pool = None
+
+def key_pool_stats():
+    """Métricas del pool (None si no está activo)"""
+    return _key_pool.estadisticas() if _key_pool is not None else None
 
 class KeyGenerator:
-    def __init__(self, user_id=None):
+    def __init__(self, user_id=None, algorithm=DEFAULT_ALGORITHM):
         self.private_key = None
         self.public_key = None
         self.user_id = user_id
+        self.algorithm = get_backend(algorithm).name
         self.team_public_keys = {}
     
+    @instrumented('keys.generate_key_pair')
     def generate_key_pair(self): 
-        self.private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
+        # Tomar una llave del pool si está activo (solo RSA); si no, generar en línea
+        if self.algorithm == ALG_RSA_PSS and _key_pool is not None:
+            self.private_key = _key_pool.obtener()
+        else:
+            self.private_key = get_backend(self.algorithm).generate_private_key()
         self.public_key = self.private_key.public_key()
         
         if self.user_id:
@@ -36,10 +205,11 @@ class KeyGenerator:
                 encryption_algorithm=serialization.NoEncryption()
             )
             
-            filename = f"private_key_{self.user_id}.pem"
+            filename = private_key_filename(self.user_id)
             with open(filename, 'wb') as f:
                 f.write(private_pem)
-            print(f"🔐 Llave privada guardada en: {filename}")
+            private_key_cache.invalidar(self.user_id)
+            log.info("🔐 Llave privada guardada en: %s", filename)
             
             # Guardar llave pública
             public_pem = self.public_key.public_bytes(
@@ -50,32 +220,30 @@ class KeyGenerator:
             public_filename = f"public_key_{self.user_id}.pem"
             with open(public_filename, 'wb') as f:
                 f.write(public_pem)
-            print(f"🔑 Llave pública guardada en: {public_filename}")
+            log.info("🔑 Llave pública guardada en: %s", public_filename)
             
             return True
         return False
     
+    @instrumented('keys.load_private_key')
     def load_private_key(self, user_id=None):
         user_id = user_id or self.user_id
         if not user_id:
             return False
             
-        filename = f"private_key_{user_id}.pem"
+        filename = private_key_filename(user_id)
         try:
-            with open(filename, 'rb') as f:
-                private_pem = f.read()
-            
-            self.private_key = serialization.load_pem_private_key(
-                private_pem,
-                password=None,
-                backend=default_backend()
-            )
-            self.public_key = self.private_key.public_key()
+            private_key = private_key_cache.obtener(user_id, filename)
+            # Si el tipo de llave no tiene backend (ValueError) no se toca el estado actual
+            algorithm = get_backend_for_key(private_key).name
+            self.private_key = private_key
+            self.public_key = private_key.public_key()
+            self.algorithm = algorithm
             self.user_id = user_id
-            print(f"✅ Llave privada cargada para usuario: {user_id}")
+            log.debug("✅ Llave privada cargada para usuario: %s", user_id)
             return True
         except FileNotFoundError:
-            print(f"❌ Archivo de llave no encontrado: {filename}")
+            log.warning("❌ Archivo de llave no encontrado: %s", filename)
             return False
     
     def get_public_key_pem(self):
@@ -88,17 +256,22 @@ class KeyGenerator:
     
     def add_team_member_public_key(self, member_id, public_key_pem):
         try:
-            public_key = serialization.load_pem_public_key(
-                public_key_pem.encode('utf-8'),
-                backend=default_backend()
-            )
+            # El registro parsea cada PEM una sola vez por proceso
+            public_key = public_key_registry.register(member_id, public_key_pem)
             self.team_public_keys[member_id] = public_key
-            print(f"✅ Llave pública de {member_id} agregada al equipo")
+            log.debug("✅ Llave pública de %s agregada al equipo", member_id)
             return True
         except Exception as e:
-            print(f"❌ Error cargando llave pública de {member_id}: {e}")
+            log.error("❌ Error cargando llave pública de %s: %s", member_id, e)
             return False
     
+    def get_team_member_by_fingerprint(self, fingerprint):
+        """Busca un miembro del equipo por huella SHA-256 de su llave pública"""
+        user_id, public_key = public_key_registry.get_by_fingerprint(fingerprint)
+        if user_id in self.team_public_keys:
+            return user_id, public_key
+        return None, None
+    
     def save_public_keys_to_file(self, filename="public_keys.json"):
         """Guarda todas las llaves públicas en un archivo"""
         data = {
@@ -117,36 +290,28 @@ class KeyGenerator:
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
         
-        print(f"📁 Llaves públicas guardadas en: {filename}")
+        log.info("📁 Llaves públicas guardadas en: %s", filename)
         return True
     
     def load_public_keys_from_file(self, filename="public_keys.json"):
         """Carga llaves públicas desde archivo"""
         try:
-            with open(filename, 'r') as f:
-                data = json.load(f)
+            # Solo se relee y parsea si el archivo cambió desde la última carga
+            data = public_key_registry.load_file(filename)
             
-            if data.get('public_key'):
-                self.public_key = serialization.load_pem_public_key(
-                    data['public_key'].encode('utf-8'),
-                    backend=default_backend()
-                )
+            if data['public_key']:
+                self.public_key = data['public_key']
             
-            self.team_public_keys = {}
-            for member_id, key_pem in data.get('team_public_keys', {}).items():
-                self.team_public_keys[member_id] = serialization.load_pem_public_key(
-                    key_pem.encode('utf-8'),
-                    backend=default_backend()
-                )
+            self.team_public_keys = dict(data['team_public_keys'])
             
-            self.user_id = data.get('user_id')
-            print(f"✅ Llaves públicas cargadas desde: {filename}")
+            self.user_id = data['user_id']
+            log.info("✅ Llaves públicas cargadas desde: %s", filename)
             return True
         except FileNotFoundError:
-            print(f"❌ Archivo de llaves públicas no encontrado: {filename}")
+            log.warning("❌ Archivo de llaves públicas no encontrado: %s", filename)
             return False
         except Exception as e:
-            print(f"❌ Error cargando llaves públicas: {e}")
+            log.error("❌ Error cargando llaves públicas: %s", e)
             return False
     
     def get_timestamp(self):
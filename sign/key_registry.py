@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import threading
+import weakref
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+
+def public_key_fingerprint(public_key):
+    """Huella SHA-256 (hex) del SubjectPublicKeyInfo en DER"""
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return hashlib.sha256(der).hexdigest()
+
+
+class PublicKeyRegistry:
+    """Registro de llaves públicas parseadas una sola vez.
+
+    Cada PEM se parsea la primera vez que se ve y queda indexado por
+    usuario y por huella SHA-256 del SPKI. Los archivos JSON de llaves
+    se releen solo cuando cambia su mtime o tamaño.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._por_pem = {}
+        self._por_usuario = {}
+        self._por_huella = {}
+        self._archivos = {}
+        self._rotation_listeners = []
+
+    def parse_pem(self, public_key_pem):
+        """Devuelve (llave, huella) para un PEM, parseándolo solo la primera vez"""
+        if isinstance(public_key_pem, bytes):
+            public_key_pem = public_key_pem.decode('utf-8')
+        with self._lock:
+            entrada = self._por_pem.get(public_key_pem)
+        if entrada is not None:
+            return entrada
+
+        public_key = serialization.load_pem_public_key(
+            public_key_pem.encode('utf-8'),
+            backend=default_backend()
+        )
+        entrada = (public_key, public_key_fingerprint(public_key))
+        with self._lock:
+            return self._por_pem.setdefault(public_key_pem, entrada)
+
+    def add_rotation_listener(self, callback, weak=False):
+        """Registra `callback(huella)` que se llama al rotar o revocar una llave
+
+        Con weak=True `callback` debe ser un método ligado y solo se guarda
+        una referencia débil: el listener desaparece al liberarse su objeto.
+        """
+        with self._lock:
+            self._rotation_listeners.append(weakref.WeakMethod(callback) if weak else (lambda: callback))
+
+    def _notificar_rotacion(self, huella):
+        with self._lock:
+            vivos = [(ref, ref()) for ref in self._rotation_listeners]
+            self._rotation_listeners = [ref for ref, callback in vivos if callback is not None]
+        for _, callback in vivos:
+            if callback is not None:
+                callback(huella)
+
+    def register(self, user_id, public_key_pem):
+        """Registra la llave de un usuario y devuelve el objeto de llave"""
+        public_key, huella = self.parse_pem(public_key_pem)
+        rotada = None
+        with self._lock:
+            anterior = self._por_usuario.get(user_id)
+            if anterior is not None and anterior[1] != huella:
+                self._por_huella.pop(anterior[1], None)
+                rotada = anterior[1]
+            self._por_usuario[user_id] = (public_key, huella)
+            self._por_huella[huella] = (user_id, public_key)
+        if rotada:
+            self._notificar_rotacion(rotada)
+        return public_key
+
+    def revoke(self, user_id):
+        """Revoca la llave registrada de un usuario"""
+        with self._lock:
+            anterior = self._por_usuario.pop(user_id, None)
+            if anterior is not None:
+                self._por_huella.pop(anterior[1], None)
+        if anterior is not None:
+            self._notificar_rotacion(anterior[1])
+        return anterior is not None
+
+    def get(self, user_id):
+        with self._lock:
+            entrada = self._por_usuario.get(user_id)
+        return entrada[0] if entrada else None
+
+    def get_fingerprint(self, user_id):
+        with self._lock:
+            entrada = self._por_usuario.get(user_id)
+        return entrada[1] if entrada else None
+
+    def get_by_fingerprint(self, huella):
+        """Devuelve (user_id, llave) para una huella, o (None, None)"""
+        with self._lock:
+            return self._por_huella.get(huella, (None, None))
+
+    def load_file(self, filename):
+        """Carga un archivo de llaves públicas (formato de save_public_keys_to_file).
+
+        Devuelve un dict con 'user_id', 'public_key' y 'team_public_keys'
+        (llaves ya parseadas). Si el archivo no cambió desde la última
+        lectura se devuelve el resultado en caché.
+        """
+        ruta = os.path.abspath(filename)
+        stat = os.stat(ruta)
+        firma = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entrada = self._archivos.get(ruta)
+            if entrada is not None and entrada[0] == firma:
+                return entrada[1]
+
+        with open(ruta, 'r') as f:
+            data = json.load(f)
+
+        resultado = {
+            'user_id': data.get('user_id'),
+            'public_key': self.parse_pem(data['public_key'])[0] if data.get('public_key') else None,
+            'team_public_keys': {
+                member_id: self.register(member_id, key_pem)
+                for member_id, key_pem in data.get('team_public_keys', {}).items()
+            }
+        }
+        with self._lock:
+            self._archivos[ruta] = (firma, resultado)
+        return resultado
+
+
+# Registro compartido por todo el proceso
+public_key_registry = PublicKeyRegistry()
@@ -0,0 +1,107 @@
+import os
+import json
+import threading
+
+
+class SignatureCollection:
+    """Colección de firmas append-only en formato JSON Lines.
+
+    Cada firma es una línea; añadir una firma es O(1) (una escritura al
+    final del archivo). Las firmas se de-duplican por (user_id,
+    document_hash) con un índice en memoria que se actualiza leyendo solo
+    los bytes nuevos del archivo, así que también ve lo que añadan otros
+    procesos.
+    """
+
+    def __init__(self, path="todas_las_firmas.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._claves = set()
+        self._offset = 0
+
+    def _clave(self, signature_package):
+        return (signature_package.get('user_id'), signature_package.get('document_hash'))
+
+    def _sincronizar(self):
+        """Indexa las líneas añadidas desde la última lectura"""
+        try:
+            tamano = os.path.getsize(self.path)
+        except FileNotFoundError:
+            self._claves.clear()
+            self._offset = 0
+            return
+        if tamano < self._offset:
+            # El archivo fue truncado o reemplazado: reindexar desde el inicio
+            self._claves.clear()
+            self._offset = 0
+        if tamano == self._offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            for linea in f:
+                if not linea.endswith(b'\n'):
+                    # Línea a medio escribir por otro proceso: se leerá después
+                    break
+                self._offset += len(linea)
+                if linea.strip():
+                    self._claves.add(self._clave(json.loads(linea)))
+
+    def add(self, signature_package):
+        """Añade una firma; devuelve False si ya existía para ese usuario y documento"""
+        linea = json.dumps(signature_package, separators=(',', ':'), ensure_ascii=False) + '\n'
+        with self._lock:
+            self._sincronizar()
+            clave = self._clave(signature_package)
+            if clave in self._claves:
+                return False
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(linea)
+            self._claves.add(clave)
+            self._offset += len(linea.encode('utf-8'))
+            return True
+
+    def count(self):
+        """Número de firmas distintas en la colección"""
+        with self._lock:
+            self._sincronizar()
+            return len(self._claves)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self.iter_signatures()
+
+    def iter_signatures(self, document_hash=None):
+        """Recorre las firmas de forma perezosa, sin cargar el archivo entero"""
+        vistas = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    if not linea.endswith('\n') or not linea.strip():
+                        continue
+                    signature_package = json.loads(linea)
+                    clave = self._clave(signature_package)
+                    if clave in vistas:
+                        continue
+                    vistas.add(clave)
+                    if document_hash is None or signature_package.get('document_hash') == document_hash:
+                        yield signature_package
+        except FileNotFoundError:
+            return
+
+
+_colecciones = {}
+_colecciones_lock = threading.Lock()
+
+def get_signature_collection(path="todas_las_firmas.jsonl"):
+    """Colección compartida por proceso para una ruta
+
+    Reutilizar la instancia conserva su índice y su offset, así que cada
+    nueva firma solo lee la cola del archivo en lugar de reindexarlo entero.
+    """
+    ruta = os.path.abspath(path)
+    with _colecciones_lock:
+        if ruta not in _colecciones:
+            _colecciones[ruta] = SignatureCollection(ruta)
+        return _colecciones[ruta]
@@ -1,82 +1,136 @@
 import os
 import json
 import base64
-import hashlib
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+import time
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.exceptions import InvalidSignature
 from sign.key_generator import KeyGenerator
+from sign.digest import document_digest
+from sign.algorithms import get_backend
+from sign.key_registry import public_key_fingerprint
+from sign.verification_cache import signature_digest
+from sign.signature_collection import get_signature_collection
+from metrics import instrumented, tamano_archivo
+from structured_logging import get_logger
+
+log = get_logger(__name__)
 
 class SignatureVerifier:
-    def __init__(self, key_generator=None):
+    def __init__(self, key_generator=None, verification_cache=None):
         self.key_gen = key_generator
+        # Opcional: VerificationCache para no repetir verificaciones ya hechas
+        self.verification_cache = verification_cache
+    
+    @instrumented('verify.hash_documento', tamano_archivo(1))
+    def calculate_document_digest(self, file_path):
+        """Calcula el digest SHA-256 (bytes) del documento en una sola pasada"""
+        return document_digest(file_path)
     
     def calculate_document_hash(self, file_path):
-        sha256_hash = hashlib.sha256()
-        try:
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return sha256_hash.hexdigest()
-        except FileNotFoundError:
-            raise ValueError(f"❌ Archivo no encontrado: {file_path}")
+        return self.calculate_document_digest(file_path).hex()
     
-    def verify_signature(self, signature_package, file_path):
-        """Verifica una firma individual"""
+    def _verificar_contra_digest(self, signature_package, digest):
+        """Verifica un paquete contra un digest ya calculado.
+
+        No imprime nada; devuelve (estado, error) con estado en VALID,
+        HASH_MISMATCH, KEY_NOT_FOUND, INVALID_SIGNATURE o ERROR.
+        """
         try:
             # Verificar integridad del documento
-            current_hash = self.calculate_document_hash(file_path)
-            if signature_package['document_hash'] != current_hash:
-                print("❌ ALERTA: El documento ha sido modificado después de la firma!")
-                return False
+            if signature_package['document_hash'] != digest.hex():
+                return 'HASH_MISMATCH', None
             
             # Obtener usuario y llave pública
             user_id = signature_package['user_id']
             if not self.key_gen or user_id not in self.key_gen.team_public_keys:
-                print(f"❌ Llave pública no encontrada para el usuario: {user_id}")
-                return False
+                return 'KEY_NOT_FOUND', None
             
             public_key = self.key_gen.team_public_keys[user_id]
             
-            # Leer documento
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
+            # El algoritmo viene en el paquete; los antiguos sin 'alg' son RSA-PSS
+            backend = get_backend(signature_package.get('alg'))
+            if not backend.matches(public_key):
+                return 'INVALID_SIGNATURE', None
             
+            # Consultar veredicto previo (documento, llave y firma son inmutables)
+            if self.verification_cache is not None:
+                clave_cache = (
+                    signature_package['document_hash'],
+                    public_key_fingerprint(public_key),
+                    signature_digest(
+                        signature_package['signature'],
+                        backend.name,
+                        'hash_only' if signature_package.get('hash_only', False) else 'digest'
+                    )
+                )
+                previo = self.verification_cache.get(*clave_cache)
+                if previo is not None:
+                    return ('VALID' if previo['valid'] else 'INVALID_SIGNATURE'), None
+            
+            status = self._verificar_firma(backend, public_key, signature_package, digest)
+            if self.verification_cache is not None:
+                self.verification_cache.put(*clave_cache, status == 'VALID')
+            return status, None
+            
+        except Exception as e:
+            return 'ERROR', str(e)
+    
+    @instrumented('verify.firma')
+    def _verificar_firma(self, backend, public_key, signature_package, digest):
+        """Verificación criptográfica: VALID o INVALID_SIGNATURE"""
+        try:
             # Verificar firma
             signature = base64.b64decode(signature_package['signature'])
             
             if signature_package.get('hash_only', False):
                 # Verificar firma del hash
-                public_key.verify(
+                backend.verify(
+                    public_key,
                     signature,
-                    signature_package['document_hash'].encode('utf-8'),
-                    padding.PSS(
-                        mgf=padding.MGF1(hashes.SHA256()),
-                        salt_length=padding.PSS.MAX_LENGTH
-                    ),
-                    hashes.SHA256()
+                    signature_package['document_hash'].encode('utf-8')
                 )
             else:
-                # Verificar firma del documento completo
-                public_key.verify(
-                    signature,
-                    file_data,
-                    padding.PSS(
-                        mgf=padding.MGF1(hashes.SHA256()),
-                        salt_length=padding.PSS.MAX_LENGTH
-                    ),
-                    hashes.SHA256()
-                )
+                # Verificar firma del documento completo sobre el digest ya
+                # calculado. Vale tanto para paquetes 'sha256-prehashed' como
+                # para los antiguos sin 'sign_mode' (firmados sobre el archivo
+                # completo): con PSS-SHA256 ambas firmas son equivalentes.
+                backend.verify_digest(public_key, signature, digest)
             
-            print(f"✅ Firma de {user_id} verificada correctamente")
-            return True
+            return 'VALID'
             
         except InvalidSignature:
-            print(f"❌ Firma inválida de {signature_package.get('user_id', 'desconocido')}")
-            return False
+            return 'INVALID_SIGNATURE'
+    
+    @instrumented('verify.verify_signature', tamano_archivo(2))
+    def verify_signature(self, signature_package, file_path):
+        """Verifica una firma individual (el documento se lee una sola vez)"""
+        user_id = signature_package.get('user_id', 'desconocido')
+        try:
+            digest = self.calculate_document_digest(file_path)
         except Exception as e:
-            print(f"❌ Error verificando firma de {signature_package.get('user_id', 'desconocido')}: {e}")
+            log.error("❌ Error verificando firma de %s: %s", user_id, e)
             return False
+        
+        status, error = self._verificar_contra_digest(signature_package, digest)
+        if status == 'VALID':
+            log.info("✅ Firma de %s verificada correctamente", user_id)
+        elif status == 'HASH_MISMATCH':
+            log.warning("❌ ALERTA: El documento ha sido modificado después de la firma!", user_id=user_id)
+        elif status == 'KEY_NOT_FOUND':
+            log.warning("❌ Llave pública no encontrada para el usuario: %s", user_id)
+        elif status == 'INVALID_SIGNATURE':
+            log.warning("❌ Firma inválida de %s", user_id)
+        else:
+            log.error("❌ Error verificando firma de %s: %s", user_id, error)
+        return status == 'VALID'
+    
+    def create_session(self, file_path):
+        """Crea una sesión que calcula el hash del documento una sola vez"""
+        return VerificationSession(self, file_path)
+    
+    def verify_signatures_concurrent(self, signature_packages, file_path, max_workers=8):
+        """Verifica muchas firmas en paralelo (la verificación RSA libera el GIL)"""
+        return self.create_session(file_path).verify_all(signature_packages, max_workers)
     
     def verify_signatures_interactive(self, file_path):
         """Verificación interactiva de múltiples firmas"""
@@ -86,9 +140,9 @@ class SignatureVerifier:
             print("❌ El documento no existe.")
             return False
         
-        # Verificar integridad del documento primero
-        document_hash = self.calculate_document_hash(file_path)
-        print(f"🔍 Hash del documento: {document_hash}")
+        # Verificar integridad del documento primero (se calcula una sola vez)
+        session = self.create_session(file_path)
+        print(f"🔍 Hash del documento: {session.document_hash}")
         
         while True:
             try:
@@ -126,32 +180,24 @@ class SignatureVerifier:
                 with open(sig_file, 'r') as f:
                     signature_package = json.load(f)
                 
-                # Verificar si el hash coincide
-                if signature_package.get('document_hash') != document_hash:
+                # Verificar hash y firma contra el digest de la sesión
+                result = session.verify(signature_package)
+                if result['status'] == 'HASH_MISMATCH':
                     print(f"❌ {sig_file}: Hash no coincide con el documento")
-                    invalid_signatures += 1
-                    verification_results.append({
-                        'file': sig_file,
-                        'user': signature_package.get('user_id', 'desconocido'),
-                        'status': 'HASH_MISMATCH'
-                    })
-                    continue
+                elif result['status'] == 'VALID':
+                    print(f"✅ Firma de {result['user_id']} verificada correctamente")
+                else:
+                    print(f"❌ {sig_file}: {result['status']}")
                 
-                # Verificar firma
-                if self.verify_signature(signature_package, file_path):
+                if result['valid']:
                     valid_signatures += 1
-                    verification_results.append({
-                        'file': sig_file,
-                        'user': signature_package.get('user_id', 'desconocido'),
-                        'status': 'VALID'
-                    })
                 else:
                     invalid_signatures += 1
-                    verification_results.append({
-                        'file': sig_file,
-                        'user': signature_package.get('user_id', 'desconocido'),
-                        'status': 'INVALID_SIGNATURE'
-                    })
+                verification_results.append({
+                    'file': sig_file,
+                    'user': result['user_id'],
+                    'status': result['status']
+                })
                     
             except FileNotFoundError:
                 print(f"❌ Archivo de firma no encontrado: {sig_file}")
@@ -197,25 +243,86 @@ class SignatureVerifier:
             print(f"\n⚠️  Solo {valid_signatures} de {num_firmas} firmas son válidas.")
             return False
     
+    @instrumented('verify.verify_collected_signatures', tamano_archivo(2))
     def verify_collected_signatures(self, collected_file, file_path):
-        """Verifica firmas desde un archivo recolectado"""
+        """Verifica firmas desde un archivo recolectado y devuelve un reporte.
+
+        El documento se lee una sola vez para todas las firmas.
+        """
         try:
-            with open(collected_file, 'r') as f:
-                collected_data = json.load(f)
-            
-            print(f"\n🔍 Verificando {collected_data['total_signatures']} firmas recolectadas...")
-            
-            valid_count = 0
-            for signature in collected_data['signatures']:
-                if self.verify_signature(signature, file_path):
-                    valid_count += 1
+            session = self.create_session(file_path)
+            if collected_file.endswith('.jsonl'):
+                # Colección append-only: se lee de forma perezosa, solo este documento
+                signatures = get_signature_collection(collected_file).iter_signatures(session.document_hash)
+            else:
+                # Formato agregado anterior (un único JSON con 'signatures')
+                with open(collected_file, 'r') as f:
+                    signatures = json.load(f)['signatures']
             
-            print(f"\n📊 Resultado: {valid_count}/{collected_data['total_signatures']} firmas válidas")
-            return valid_count == collected_data['total_signatures']
+            return session.verify_all(signatures)
             
         except Exception as e:
-            print(f"❌ Error verificando firmas recolectadas: {e}")
-            return False
+            return {
+                'document_hash': None,
+                'total_signatures': 0,
+                'valid_signatures': 0,
+                'invalid_signatures': 0,
+                'all_valid': False,
+                'results': [],
+                'error': str(e)
+            }
+
+class VerificationSession:
+    """Verificación de muchas firmas sobre un mismo documento.
+
+    El digest SHA-256 se calcula al crear la sesión y se reutiliza para
+    comparar `document_hash` y verificar cada firma RSA-PSS.
+    """
+    
+    def __init__(self, verifier, file_path):
+        self.verifier = verifier
+        self.file_path = file_path
+        self.digest = verifier.calculate_document_digest(file_path)
+        self.document_hash = self.digest.hex()
+    
+    def verify(self, signature_package):
+        """Verifica un paquete de firma y devuelve su resultado estructurado"""
+        inicio = time.perf_counter()
+        status, error = self.verifier._verificar_contra_digest(signature_package, self.digest)
+        result = {
+            'user_id': signature_package.get('user_id', 'desconocido'),
+            'status': status,
+            'valid': status == 'VALID',
+            'timestamp': signature_package.get('timestamp'),
+            'duration_ms': (time.perf_counter() - inicio) * 1000
+        }
+        if error:
+            result['error'] = error
+        return result
+    
+    def verify_all(self, signature_packages, max_workers=1):
+        """Verifica una lista de paquetes y devuelve un reporte
+
+        Con `max_workers` > 1 las firmas se reparten en un pool de hilos
+        acotado; los resultados conservan el orden de entrada.
+        """
+        inicio = time.perf_counter()
+        signature_packages = list(signature_packages)
+        if max_workers > 1 and len(signature_packages) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(signature_packages))) as executor:
+                results = list(executor.map(self.verify, signature_packages))
+        else:
+            results = [self.verify(package) for package in signature_packages]
+        valid_count = sum(1 for r in results if r['valid'])
+        return {
+            'document_hash': self.document_hash,
+            'total_signatures': len(results),
+            'valid_signatures': valid_count,
+            'invalid_signatures': len(results) - valid_count,
+            'all_valid': bool(results) and valid_count == len(results),
+            'elapsed_ms': (time.perf_counter() - inicio) * 1000,
+            'results': results
+        }
 
 # Función interactiva para verificación
 def verificar_firmas_interactive():
@@ -0,0 +1,211 @@
+import time
+import sqlite3
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from sign.key_registry import public_key_registry
+
+# Cada cuántas escrituras se comprueba el límite de tamaño (COUNT es O(n))
+INTERVALO_PODA = 1000
+
+
+def signature_digest(signature_b64, alg, mode):
+    """Identificador de una firma concreta: SHA-256 de (alg, modo, firma)"""
+    h = hashlib.sha256()
+    for parte in (alg or '', mode, signature_b64):
+        parte = parte.encode('utf-8')
+        h.update(len(parte).to_bytes(4, 'big'))
+        h.update(parte)
+    return h.hexdigest()
+
+
+class VerificationCache:
+    """Caché persistente de veredictos de verificación de firmas.
+
+    La clave es (document_hash, huella de la llave pública, digest de la
+    firma): una firma inmutable sobre un documento inmutable con la misma
+    llave siempre da el mismo resultado. Se guarda en SQLite (acotada a
+    `max_entradas`, expulsando las más antiguas) con una capa LRU en memoria
+    para que repetir una consulta cueste microsegundos.
+
+    Revocar o rotar una llave borra sus entradas e incrementa su generación
+    en la propia base (tabla key_generations). Cada veredicto guarda la
+    generación vigente cuando empezó su verificación y solo se acepta si
+    coincide con la actual, así que una revocación hecha por otro proceso
+    se respeta aunque aquí siga en memoria o llegue un put tardío.
+    """
+
+    def __init__(self, db_path="verification_cache.db", max_entradas=100000, max_memoria=10000):
+        self.db_path = db_path
+        self.max_entradas = max_entradas
+        self.max_memoria = max_memoria
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.aciertos = 0
+        self.fallos = 0
+        self._escrituras_sin_podar = 0
+        self._crear_esquema()
+        # Todas las instancias (no solo la compartida) se enteran de rotaciones locales
+        public_key_registry.add_rotation_listener(self.invalidate_key, weak=True)
+
+    def _crear_esquema(self):
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS verifications (
+                    document_hash TEXT NOT NULL,
+                    key_fingerprint TEXT NOT NULL,
+                    signature_digest TEXT NOT NULL,
+                    valid INTEGER NOT NULL,
+                    verified_at REAL NOT NULL,
+                    generation INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (document_hash, key_fingerprint, signature_digest)
+                )
+            """)
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_verifications_key ON verifications (key_fingerprint)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_verifications_time ON verifications (verified_at)")
+            columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(verifications)")]
+            if "generation" not in columnas:
+                # Bases creadas antes de existir la generación: sus filas quedan en la generación 0
+                conexion.execute("ALTER TABLE verifications ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS key_generations (
+                    key_fingerprint TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+            """)
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.db_path, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _generacion(self, conexion, key_fingerprint):
+        """Generación vigente de una llave (0 si nunca se revocó ni rotó)"""
+        fila = conexion.execute(
+            "SELECT generation FROM key_generations WHERE key_fingerprint = ?", (key_fingerprint,)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    def _generaciones_vistas(self):
+        # Generación observada en cada fallo de get(), por hilo, para el put() que le sigue
+        vistas = getattr(self._local, "vistas", None)
+        if vistas is None or len(vistas) > self.max_memoria:
+            vistas = self._local.vistas = {}
+        return vistas
+
+    def _recordar(self, clave, valor):
+        with self._lock:
+            self._memoria[clave] = valor
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def get(self, document_hash, key_fingerprint, sig_digest):
+        """Devuelve {'valid', 'verified_at'} o None si no hay veredicto vigente"""
+        clave = (document_hash, key_fingerprint, sig_digest)
+        conexion = self._conexion()
+        generacion = self._generacion(conexion, key_fingerprint)
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                if entrada[0] == generacion:
+                    self._memoria.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                # Otro proceso revocó o rotó la llave desde que se guardó
+                del self._memoria[clave]
+
+        fila = conexion.execute(
+            "SELECT valid, verified_at FROM verifications "
+            "WHERE document_hash = ? AND key_fingerprint = ? AND signature_digest = ? AND generation = ?",
+            clave + (generacion,)
+        ).fetchone()
+        if fila is None:
+            self._generaciones_vistas()[clave] = generacion
+            with self._lock:
+                self.fallos += 1
+            return None
+        valor = {'valid': bool(fila[0]), 'verified_at': fila[1]}
+        self._recordar(clave, (generacion, valor))
+        with self._lock:
+            self.aciertos += 1
+        return valor
+
+    def put(self, document_hash, key_fingerprint, sig_digest, valid):
+        """Guarda un veredicto criptográfico definitivo
+
+        Se guarda con la generación que vio el get() fallido previo: si la
+        llave se revocó mientras tanto, el veredicto nace ya caducado.
+        """
+        clave = (document_hash, key_fingerprint, sig_digest)
+        valor = {'valid': bool(valid), 'verified_at': time.time()}
+        conexion = self._conexion()
+        generacion = self._generaciones_vistas().pop(clave, None)
+        if generacion is None:
+            generacion = self._generacion(conexion, key_fingerprint)
+        with conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO verifications VALUES (?, ?, ?, ?, ?, ?)",
+                clave + (int(valor['valid']), valor['verified_at'], generacion)
+            )
+        with self._lock:
+            self._escrituras_sin_podar += 1
+            podar = self._escrituras_sin_podar >= INTERVALO_PODA
+            if podar:
+                self._escrituras_sin_podar = 0
+        if podar:
+            self._podar()
+        self._recordar(clave, (generacion, valor))
+
+    def _podar(self):
+        """Expulsa las entradas más antiguas si se supera `max_entradas`"""
+        conexion = self._conexion()
+        with conexion:
+            total = conexion.execute("SELECT COUNT(*) FROM verifications").fetchone()[0]
+            if total > self.max_entradas:
+                conexion.execute(
+                    "DELETE FROM verifications WHERE rowid IN "
+                    "(SELECT rowid FROM verifications ORDER BY verified_at LIMIT ?)",
+                    (total - self.max_entradas,)
+                )
+
+    def invalidate_key(self, key_fingerprint):
+        """Invalida los veredictos de una llave (revocación o rotación) para todos los procesos"""
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute(
+                "INSERT INTO key_generations VALUES (?, 1) "
+                "ON CONFLICT(key_fingerprint) DO UPDATE SET generation = generation + 1",
+                (key_fingerprint,)
+            )
+            conexion.execute("DELETE FROM verifications WHERE key_fingerprint = ?", (key_fingerprint,))
+        with self._lock:
+            for clave in [c for c in self._memoria if c[1] == key_fingerprint]:
+                del self._memoria[clave]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'en_memoria': len(self._memoria)
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_verification_cache(db_path="verification_cache.db"):
+    """Caché compartida por el proceso; se invalida sola al rotar llaves en el registro"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = VerificationCache(db_path)
+        return _default_cache
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import logging
+import threading
+
+# Fachada de logging para sign/ y cipher/ sobre el módulo logging estándar.
+#   log = get_logger(__name__)
+#   log.debug("Archivo '%s' cifrado en: %s", origen, destino, bytes=tamano)
+# El mensaje se formatea solo si el nivel está activo (los argumentos van
+# aparte, nunca en f-strings) y los campos con nombre se emiten como
+# claves propias en JSON. Configuración por entorno:
+#   OFICINA_LOG_LEVEL=DEBUG|INFO|WARNING|ERROR   (por defecto INFO)
+#   OFICINA_LOG_FORMAT=text|json                 (por defecto text)
+
+RAIZ = "oficina"
+_configurado = False
+_config_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por evento: ts, level, logger, msg y los campos extra"""
+
+    def format(self, record):
+        evento = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        campos = getattr(record, 'campos', None)
+        if campos:
+            evento.update(campos)
+        if record.exc_info:
+            evento['exc'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Solo el mensaje (como los antiguos print) y, si los hay, los campos al final"""
+
+    def format(self, record):
+        texto = record.getMessage()
+        campos = getattr(record, 'campos', None)
+        if campos:
+            texto += " (" + " ".join(f"{k}={v}" for k, v in campos.items()) + ")"
+        if record.exc_info:
+            texto += "\n" + self.formatException(record.exc_info)
+        return texto
+
+
+class _SalidaPerezosa(logging.StreamHandler):
+    """StreamHandler que resuelve sys.stderr al emitir, no al configurarse
+
+    Así respeta las redirecciones posteriores (pytest, contextlib.redirect_stderr).
+    """
+
+    def __init__(self, stream=None):
+        logging.Handler.__init__(self)
+        self._fija = stream
+
+    @property
+    def stream(self):
+        return self._fija or sys.stderr
+
+    @stream.setter
+    def stream(self, valor):
+        self._fija = valor
+
+
+def configure_logging(level=None, json_output=None, stream=None, propagate=True):
+    """(Re)configura la salida de todos los loggers del proyecto
+
+    Con `propagate` (por defecto) los eventos llegan también a los handlers
+    de la aplicación anfitriona y a `caplog` de pytest.
+    """
+    global _configurado
+    if level is None:
+        level = os.environ.get('OFICINA_LOG_LEVEL', 'INFO')
+    if json_output is None:
+        json_output = os.environ.get('OFICINA_LOG_FORMAT', 'text').lower() == 'json'
+
+    with _config_lock:
+        raiz = logging.getLogger(RAIZ)
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        handler = _SalidaPerezosa(stream)
+        handler.setFormatter(JsonFormatter() if json_output else TextFormatter())
+        raiz.addHandler(handler)
+        raiz.setLevel(level.upper() if isinstance(level, str) else level)
+        raiz.propagate = propagate
+        _configurado = True
+
+
+class StructuredLogger:
+    """Logger con campos con nombre; el trabajo solo se hace si el nivel está activo"""
+
+    __slots__ = ('_logger',)
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, nivel, mensaje, args, campos, exc_info=False):
+        if self._logger.isEnabledFor(nivel):
+            self._logger.log(
+                nivel, mensaje, *args,
+                extra={'campos': campos} if campos else None,
+                exc_info=exc_info,
+                stacklevel=3
+            )
+
+    def is_enabled(self, nivel):
+        return self._logger.isEnabledFor(nivel)
+
+    def debug(self, mensaje, *args, **campos):
+        self._log(logging.DEBUG, mensaje, args, campos)
+
+    def info(self, mensaje, *args, **campos):
+        self._log(logging.INFO, mensaje, args, campos)
+
+    def warning(self, mensaje, *args, **campos):
+        self._log(logging.WARNING, mensaje, args, campos)
+
+    def error(self, mensaje, *args, **campos):
+        self._log(logging.ERROR, mensaje, args, campos)
+
+    def exception(self, mensaje, *args, **campos):
+        self._log(logging.ERROR, mensaje, args, campos, exc_info=True)
+
+
+def get_logger(nombre):
+    """Logger bajo el espacio 'oficina' (configura la salida la primera vez)"""
+    if not _configurado:
+        configure_logging()
+    if not nombre.startswith(RAIZ + "."):
+        nombre = f"{RAIZ}.{nombre}"
+    return StructuredLogger(logging.getLogger(nombre))
+
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
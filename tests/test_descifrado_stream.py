@@ -0,0 +1,44 @@
+import os
+
+from cryptography.fernet import Fernet
+
+from cipher.Cifrado_doc import DocumentEncryptor
+from cipher.Descifrado_doc import DocumentDecryptor
+
+
+def test_archivo_manipulado_aborta_sin_dejar_salida(tmp_path):
+    clave = Fernet.generate_key()
+    original = tmp_path / "doc.bin"
+    original.write_bytes(os.urandom(3 * 1024 * 1024))
+    cifrado = tmp_path / "doc.enc"
+    assert DocumentEncryptor().cifrar_archivo(str(original), str(cifrado), clave)
+    datos = bytearray(cifrado.read_bytes())
+    datos[-100] ^= 0x01
+    cifrado.write_bytes(bytes(datos))
+    salida = tmp_path / "doc.out"
+
+    assert not DocumentDecryptor().descifrar_archivo(str(cifrado), str(salida), clave)
+    assert sorted(os.listdir(tmp_path)) == ["doc.bin", "doc.enc"]
+
+
+def test_descifrar_archivo_acepta_tokens_fernet_heredados(tmp_path):
+    clave = Fernet.generate_key()
+    datos = os.urandom(200000)
+    entrada = tmp_path / "antiguo.enc"
+    entrada.write_bytes(Fernet(clave).encrypt(datos))
+    salida = tmp_path / "antiguo.bin"
+
+    assert DocumentDecryptor().descifrar_archivo(str(entrada), str(salida), clave)
+    assert salida.read_bytes() == datos
+
+
+def test_token_fernet_manipulado_no_deja_salida(tmp_path):
+    clave = Fernet.generate_key()
+    token = bytearray(Fernet(clave).encrypt(b"contenido heredado" * 100))
+    token[len(token) // 2] = ord('A') if token[len(token) // 2] != ord('A') else ord('B')
+    entrada = tmp_path / "antiguo.enc"
+    entrada.write_bytes(bytes(token))
+    salida = tmp_path / "antiguo.bin"
+
+    assert not DocumentDecryptor().descifrar_archivo(str(entrada), str(salida), clave)
+    assert sorted(os.listdir(tmp_path)) == ["antiguo.enc"]
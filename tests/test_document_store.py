@@ -0,0 +1,50 @@
+import os
+
+from document_store import DocumentStore
+from cipher.Cifrado_doc import DocumentEncryptor
+from cipher.Descifrado_doc import DocumentDecryptor
+from sign.key_generator import KeyGenerator
+from sign.digital_signer import DigitalSigner
+from sign.signature_verifier import SignatureVerifier
+
+
+def test_firma_desde_el_almacen_verifica_contra_el_contenido(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = DocumentStore(str(tmp_path / "almacen"))
+    contenido = os.urandom(50000)
+    document_hash = store.put_bytes(contenido)
+    (tmp_path / "doc.bin").write_bytes(contenido)
+
+    key_gen = KeyGenerator('ana')
+    key_gen.generate_key_pair()
+    key_gen.team_public_keys['ana'] = key_gen.public_key
+
+    paquete = DigitalSigner(key_gen).sign_stored_document(store, document_hash, "doc.bin")
+
+    assert paquete['document_hash'] == document_hash
+    assert SignatureVerifier(key_gen).verify_signature(paquete, str(tmp_path / "doc.bin"))
+
+
+def test_cifrado_desde_el_almacen_queda_en_el_almacen_y_no_se_reemplaza(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = DocumentStore(str(tmp_path / "almacen"))
+    contenido = b"contrato " * 1000
+    document_hash = store.put_bytes(contenido)
+    encryptor = DocumentEncryptor()
+
+    resultado = encryptor.encrypt_stored_document(store, document_hash, "clave-1")
+
+    assert resultado['success']
+    assert resultado['encrypted_path'] == store.path_for(document_hash) + '.enc'
+    assert os.listdir(tmp_path) == ["almacen"]
+
+    cifrado_original = open(resultado['encrypted_path'], 'rb').read()
+    segundo = encryptor.encrypt_stored_document(store, document_hash, "clave-2")
+    assert not segundo['success']
+    assert open(resultado['encrypted_path'], 'rb').read() == cifrado_original
+
+    descifrado = DocumentDecryptor().decrypt_document(
+        resultado['encrypted_path'], resultado['metadata_path'], "clave-1"
+    )
+    assert descifrado['success']
+    assert open(descifrado['decrypted_path'], 'rb').read() == contenido
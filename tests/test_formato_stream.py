@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from cipher import formato_stream
+from cipher.Cifrado_doc import DocumentEncryptor
+from cipher.Descifrado_doc import DocumentDecryptor
+
+TAMANO_CHUNK = 64
+
+
+def _cifrar(datos, clave, tamano_chunk=TAMANO_CHUNK):
+    salida = io.BytesIO()
+    DocumentEncryptor().cifrar_stream(io.BytesIO(datos), salida, clave, tamano_chunk)
+    return salida.getvalue()
+
+
+def _descifrar(cifrado, clave):
+    salida = io.BytesIO()
+    DocumentDecryptor().descifrar_stream(io.BytesIO(cifrado), salida, clave)
+    return salida.getvalue()
+
+
+def _chunks(cifrado):
+    """Separa un cifrado en (cabecera, [chunk con su prefijo de longitud])"""
+    file_in = io.BytesIO(cifrado)
+    cabecera = formato_stream.leer_cabecera(file_in)[0]
+    chunks = []
+    longitud = formato_stream.leer_longitud(file_in)
+    while longitud is not None:
+        chunks.append(formato_stream.empaquetar_longitud(longitud) + file_in.read(longitud))
+        longitud = formato_stream.leer_longitud(file_in)
+    return cabecera, chunks
+
+
+@pytest.mark.parametrize("tamano", [0, 1, TAMANO_CHUNK, TAMANO_CHUNK * 3, TAMANO_CHUNK * 3 + 5])
+def test_ida_y_vuelta(tamano):
+    clave = Fernet.generate_key()
+    datos = os.urandom(tamano)
+
+    cifrado = _cifrar(datos, clave)
+
+    assert len(cifrado) == formato_stream.tamano_cifrado_esperado(tamano, TAMANO_CHUNK)
+    assert _descifrar(cifrado, clave) == datos
+
+
+def test_truncar_el_chunk_final_se_detecta():
+    clave = Fernet.generate_key()
+    cabecera, chunks = _chunks(_cifrar(os.urandom(TAMANO_CHUNK * 3), clave))
+
+    # Sin el último chunk, el penúltimo pasaría por final y su nonce ya no coincide
+    with pytest.raises(InvalidToken):
+        _descifrar(cabecera + b"".join(chunks[:-1]), clave)
+
+
+def test_reordenar_chunks_se_detecta():
+    clave = Fernet.generate_key()
+    cabecera, chunks = _chunks(_cifrar(os.urandom(TAMANO_CHUNK * 3), clave))
+
+    with pytest.raises(InvalidToken):
+        _descifrar(cabecera + chunks[1] + chunks[0] + chunks[2], clave)
+
+
+def test_alterar_la_cabecera_se_detecta():
+    clave = Fernet.generate_key()
+    cifrado = bytearray(_cifrar(os.urandom(100), clave))
+    # Último byte del prefijo de nonce: la cabecera va como datos asociados
+    cifrado[formato_stream.TAMANO_CABECERA - 1] ^= 0x01
+
+    with pytest.raises(InvalidToken):
+        _descifrar(bytes(cifrado), clave)
+
+
+def test_clave_incorrecta_no_descifra():
+    cifrado = _cifrar(b"confidencial", Fernet.generate_key())
+
+    with pytest.raises(InvalidToken):
+        _descifrar(cifrado, Fernet.generate_key())
@@ -0,0 +1,41 @@
+import json
+
+from mock_data import get_repository, migrate_json_to_sqlite, seed_demo_employees
+
+
+def test_migracion_solo_importa_los_empleados_del_json(tmp_path):
+    origen = tmp_path / "employees.json"
+    origen.write_text(json.dumps({
+        "celula_X": [{
+            "id": "x1", "nombre": "Xim", "apellido1": "A", "apellido2": "B",
+            "cedula": "1234", "password": "secreta", "public_key": None, "firma": None
+        }]
+    }), encoding="utf-8")
+
+    repositorio = migrate_json_to_sqlite(str(origen), str(tmp_path / "employees.db"))
+
+    empleados = repositorio.get_all()
+    assert list(empleados) == ["celula_X"]
+    assert [e["id"] for e in empleados["celula_X"]] == ["x1"]
+    assert repositorio.get_employee("emp_001") == (None, None)
+
+
+def test_siembra_demo_solo_en_base_vacia(tmp_path):
+    ruta = str(tmp_path / "demo.db")
+
+    assert get_repository(ruta).get_all() == {}
+    assert seed_demo_employees(ruta) is True
+    assert seed_demo_employees(ruta) is False
+    assert get_repository(ruta).get_employee("emp_001")[0] == "celula_A"
+
+
+def test_repositorio_json_entrega_copias(tmp_path):
+    repositorio = get_repository(str(tmp_path / "employees.json"))
+    repositorio.replace_all({"celula_X": [{"id": "x1", "nombre": "Xim", "public_key": None}]})
+
+    repositorio.get_all()["celula_X"][0]["public_key"] = "alterada"
+    repositorio.get_employee("x1")[1]["nombre"] = "Otro"
+    repositorio.get_celula("celula_X").clear()
+
+    assert repositorio.get_employee("x1")[1] == {"id": "x1", "nombre": "Xim", "public_key": None}
+    assert len(repositorio.get_celula("celula_X")) == 1
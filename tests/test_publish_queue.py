@@ -0,0 +1,43 @@
+from publish_queue import PublishQueue, COMPLETADO, FALLIDO
+
+
+def _vencer_lease(cola, job_id):
+    cola._conexion().execute("UPDATE jobs SET locked_until = 0 WHERE id = ?", (job_id,))
+
+
+def test_trabajador_con_lease_vencido_no_pisa_el_resultado(tmp_path):
+    cola = PublishQueue(str(tmp_path / "cola.db"))
+    llamadas = []
+
+    def handler(payload):
+        llamadas.append(payload)
+        if len(llamadas) == 1:
+            # Mientras el primer trabajador sigue ocupado su lease vence y otro lo reclama
+            _vencer_lease(cola, job['id'])
+            cola.run_once()
+            return {'quien': 'lento'}
+        return {'quien': 'rapido'}
+
+    cola.register_handler('publish', handler)
+    job = cola.enqueue('publish', 'publish:equipo:abc', {'n': 1})
+    cola.run_once()
+
+    final = cola.get(job['id'])
+    assert final['status'] == COMPLETADO
+    assert final['result'] == {'quien': 'rapido'}
+    assert final['attempts'] == 2
+
+
+def test_lease_vencido_con_intentos_agotados_queda_fallido(tmp_path):
+    cola = PublishQueue(str(tmp_path / "cola.db"), max_attempts=1)
+    cola.register_handler('publish', lambda payload: {'ok': True})
+    job = cola.enqueue('publish', 'publish:equipo:abc', {})
+
+    # El proceso "muere" tras tomar el trabajo: nunca llega a completarlo
+    assert cola._reclamar()['id'] == job['id']
+    _vencer_lease(cola, job['id'])
+
+    assert cola.run_once() is None
+    final = cola.get(job['id'])
+    assert final['status'] == FALLIDO
+    assert final['attempts'] == 1
@@ -0,0 +1,39 @@
+import json
+
+import sign.signature_collection as signature_collection
+from sign.digital_signer import DigitalSigner
+
+
+def _firma(tmp_path, user_id):
+    ruta = tmp_path / f"firma_{user_id}.json"
+    ruta.write_text(json.dumps({'user_id': user_id, 'document_hash': 'abc', 'signature': 'c2ln'}))
+    return str(ruta)
+
+
+def test_segunda_recoleccion_no_reparsea_lineas_anteriores(tmp_path, monkeypatch):
+    salida = str(tmp_path / "firmas.jsonl")
+    signer = DigitalSigner()
+    signer.collect_signatures([_firma(tmp_path, 'ana'), _firma(tmp_path, 'luis')], salida)
+
+    # Otro proceso añade una firma entre las dos recolecciones
+    with open(salida, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'user_id': 'eva', 'document_hash': 'abc'}) + '\n')
+
+    parseadas = []
+    json_real = signature_collection.json
+
+    class JsonEspia:
+        dumps = staticmethod(json_real.dumps)
+
+        @staticmethod
+        def loads(linea):
+            parseadas.append(linea)
+            return json_real.loads(linea)
+
+    monkeypatch.setattr(signature_collection, 'json', JsonEspia)
+    signer.collect_signatures([_firma(tmp_path, 'ana'), _firma(tmp_path, 'marta')], salida)
+
+    # Solo se lee la línea ajena; las dos primeras ya estaban indexadas
+    assert len(parseadas) == 1
+    assert json_real.loads(parseadas[0])['user_id'] == 'eva'
+    assert signature_collection.get_signature_collection(salida).count() == 4
@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from cipher import formato_sobre
+from cipher.cifradollave import KeyEncryptor
+from cipher.decifradollave import KeyDecryptor
+from sign.key_registry import public_key_fingerprint
+
+
+@pytest.fixture(scope="module")
+def llaves():
+    return {nombre: rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            for nombre in ("ana", "luis", "intrusa")}
+
+
+def _crear(tmp_path, llaves, contenido):
+    documento = tmp_path / "informe.bin"
+    documento.write_bytes(contenido)
+    sobre = tmp_path / "informe.sobre"
+    destinatarios = {nombre: llaves[nombre].public_key() for nombre in ("ana", "luis")}
+    resultado = KeyEncryptor().crear_sobre(str(documento), str(sobre), destinatarios)
+    assert resultado['success'], resultado
+    assert resultado['recipients'] == ["ana", "luis"]
+    return sobre
+
+
+def test_cada_destinatario_abre_el_sobre(tmp_path, llaves):
+    contenido = os.urandom(300000)
+    sobre = _crear(tmp_path, llaves, contenido)
+
+    for nombre in ("ana", "luis"):
+        salida = tmp_path / f"para_{nombre}.bin"
+        resultado = KeyDecryptor().abrir_sobre(str(sobre), llaves[nombre], str(salida))
+        assert resultado['success'], resultado
+        assert salida.read_bytes() == contenido
+
+
+def test_alterar_el_indice_invalida_el_sobre(tmp_path, llaves):
+    sobre = _crear(tmp_path, llaves, b"acta de la reunion" * 500)
+    with open(sobre, 'rb') as f:
+        indice, _ = formato_sobre.leer_indice(f)
+        payload = f.read()
+
+    # Renombrar a un destinatario conserva su ranura pero cambia el índice
+    for ranura in indice['recipients'].values():
+        ranura['user_id'] = 'otro_' + ranura['user_id']
+    alterado = io.BytesIO()
+    formato_sobre.escribir_indice(alterado, indice['recipients'])
+    sobre.write_bytes(alterado.getvalue() + payload)
+
+    salida = tmp_path / "salida.bin"
+    resultado = KeyDecryptor().abrir_sobre(str(sobre), llaves["ana"], str(salida))
+    assert not resultado['success']
+    assert not salida.exists()
+
+
+def test_ranura_se_localiza_por_huella(tmp_path, llaves):
+    sobre = _crear(tmp_path, llaves, b"presupuesto")
+    with open(sobre, 'rb') as f:
+        indice, _ = formato_sobre.leer_indice(f)
+    decryptor = KeyDecryptor()
+
+    assert set(indice['recipients']) == {
+        public_key_fingerprint(llaves[nombre].public_key()) for nombre in ("ana", "luis")
+    }
+    assert decryptor.buscar_ranura(indice, llaves["ana"])['user_id'] == "ana"
+    assert decryptor.buscar_ranura(indice, llaves["luis"])['user_id'] == "luis"
+    assert decryptor.buscar_ranura(indice, llaves["intrusa"]) is None
+
+
+def test_quien_no_es_destinatario_no_abre_el_sobre(tmp_path, llaves):
+    sobre = _crear(tmp_path, llaves, b"presupuesto")
+    salida = tmp_path / "salida.bin"
+
+    resultado = KeyDecryptor().abrir_sobre(str(sobre), llaves["intrusa"], str(salida))
+
+    assert not resultado['success']
+    assert "destinataria" in resultado['error']
+    assert not salida.exists()
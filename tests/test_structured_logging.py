@@ -0,0 +1,27 @@
+import io
+import logging
+import contextlib
+
+from structured_logging import configure_logging, get_logger
+
+
+def test_caplog_recibe_los_eventos_del_proyecto(caplog):
+    configure_logging(level="INFO")
+    log = get_logger("cipher.prueba")
+
+    with caplog.at_level(logging.INFO, logger="oficina"):
+        log.info("Archivo %s cifrado", "a.pdf", bytes=10)
+
+    assert [r.getMessage() for r in caplog.records] == ["Archivo a.pdf cifrado"]
+    assert caplog.records[0].name == "oficina.cipher.prueba"
+
+
+def test_la_salida_se_resuelve_al_emitir():
+    configure_logging(level="INFO")
+    log = get_logger("cipher.prueba")
+
+    salida = io.StringIO()
+    with contextlib.redirect_stderr(salida):
+        log.warning("Clave incorrecta")
+
+    assert salida.getvalue() == "Clave incorrecta\n"
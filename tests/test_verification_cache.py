@@ -0,0 +1,50 @@
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from sign.key_registry import public_key_registry
+from sign.verification_cache import VerificationCache
+
+
+def _pem():
+    llave = ec.generate_private_key(ec.SECP256R1()).public_key()
+    return llave.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode('utf-8')
+
+
+def test_revocacion_en_otro_proceso_invalida_la_memoria(tmp_path):
+    ruta = str(tmp_path / "cache.db")
+    proceso_a = VerificationCache(ruta)
+    proceso_b = VerificationCache(ruta)
+
+    proceso_a.put('doc', 'huella', 'firma', True)
+    assert proceso_a.get('doc', 'huella', 'firma')['valid']
+
+    proceso_b.invalidate_key('huella')
+
+    assert proceso_a.get('doc', 'huella', 'firma') is None
+
+
+def test_veredicto_tardio_tras_revocar_no_se_acepta(tmp_path):
+    ruta = str(tmp_path / "cache.db")
+    proceso_a = VerificationCache(ruta)
+    proceso_b = VerificationCache(ruta)
+
+    # A empieza a verificar, B revoca la llave y A guarda su veredicto después
+    assert proceso_a.get('doc', 'huella', 'firma') is None
+    proceso_b.invalidate_key('huella')
+    proceso_a.put('doc', 'huella', 'firma', True)
+
+    assert proceso_b.get('doc', 'huella', 'firma') is None
+    assert proceso_a.get('doc', 'huella', 'firma') is None
+
+
+def test_toda_instancia_escucha_las_revocaciones_del_registro(tmp_path):
+    cache = VerificationCache(str(tmp_path / "cache.db"))
+    public_key_registry.register('usuario_revocado', _pem())
+    huella = public_key_registry.get_fingerprint('usuario_revocado')
+    cache.put('doc', huella, 'firma', True)
+
+    public_key_registry.revoke('usuario_revocado')
+
+    assert cache.get('doc', huella, 'firma') is None